@@ -1,9 +1,13 @@
+import logging
+import time
 from base64 import b64encode
 from enum import Enum
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
+import rdflib
 import yaml
+from cachetools import TLRUCache
 from langchain.agents import create_agent
 from langchain_core.language_models import BaseChatModel
 from langchain_core.tools import BaseTool
@@ -12,22 +16,37 @@ from langgraph.graph.state import CompiledStateGraph
 from langgraph.types import Checkpointer
 from pydantic import BaseModel, Field, SecretStr, model_validator
 from pydantic_settings import BaseSettings
-from ttyg.graphdb import GraphDB
-from ttyg.tools import (
-    AutocompleteSearchTool,
-    BaseGraphDBTool,
-    OntologySchemaAndVocabularyTool,
-    RetrievalQueryTool,
-    SparqlQueryTool,
-)
+from rdflib import Graph
+from ttyg.tools import BaseGraphDBTool, OntologySchemaAndVocabularyTool
 
+from talk2powersystemllm.graphdb import (
+    AsyncGraphDB,
+    CachingGraphDB,
+    TracingGraphDB,
+)
+from talk2powersystemllm.middleware import (
+    HistoryCompactionMiddleware,
+    RelevantSchemaMiddleware,
+    ToolCallConcurrencyMiddleware,
+    TracingMiddleware,
+)
+from talk2powersystemllm.ontology_schema import SchemaIndex, minify_schema
+from talk2powersystemllm.sparql_cache import SparqlResultCache
+from talk2powersystemllm.startup_cache import PhaseTimer, StartupCache
 from talk2powersystemllm.tools import (
-    CogniteSession,
+    AsyncAutocompleteSearchTool,
+    AsyncRetrievalQueryTool,
+    AsyncSparqlQueryTool,
     GraphicsTool,
     NowTool,
-    RetrieveDataPointsTool,
-    RetrieveTimeSeriesTool,
+    validate_graphics_sparql_query_template,
 )
+from talk2powersystemllm.tracing import is_tracing_enabled
+
+if TYPE_CHECKING:
+    from talk2powersystemllm.tools import CogniteSession
+
+logger = logging.getLogger(__name__)
 
 
 class GraphDBSettings(BaseSettings):
@@ -39,6 +58,7 @@ class GraphDBSettings(BaseSettings):
     repository_id: str
     connect_timeout: int = Field(default=2, ge=1)
     read_timeout: int = Field(default=10, ge=1)
+    max_concurrent_requests: int = Field(default=8, ge=1)
     username: str | None = None
     password: SecretStr | None = None
 
@@ -53,6 +73,9 @@ class GraphDBSettings(BaseSettings):
 
 class OntologySchemaSettings(BaseModel):
     file_path: Path
+    minify: bool = False
+    relevance_pruning: bool = False
+    core_terms: list[str] = []
 
 
 class AutocompleteSearchSettings(BaseModel):
@@ -72,6 +95,13 @@ class RetrievalSearchSettings(BaseModel):
     sparql_query_template: str
 
 
+class SparqlCacheSettings(BaseModel):
+    max_size: int = Field(default=64 * 1024 * 1024, ge=1)
+    max_entry_size: int = Field(default=1024 * 1024, ge=1)
+    redis: bool = False
+    redis_ttl: int = Field(default=86400, ge=1)
+
+
 class CogniteSettings(BaseSettings):
     model_config = {
         "env_prefix": "COGNITE_",
@@ -86,6 +116,16 @@ class CogniteSettings(BaseSettings):
     tenant_id: str | None = None
     token_file_path: Path | None = None
     obo_client_secret: SecretStr | None = None
+    obo_agents_cache_size: int = Field(default=256, ge=1)
+    obo_token_expiry_margin: int = Field(default=300, ge=0)
+    obo_token_cache_size: int = Field(default=256, ge=1)
+    obo_token_expiry_margin_seconds: int = Field(default=300, ge=0)
+    obo_token_cache_redis: bool = False
+    obo_token_encryption_key: SecretStr | None = None
+    max_result_tokens: int = Field(default=4000, ge=100)
+    max_series_per_request: int = Field(default=10, ge=1)
+    max_concurrent_requests: int = Field(default=4, ge=1)
+    max_fetch_bytes: int = Field(default=256 * 1024 * 1024, ge=1024 * 1024)
 
     @model_validator(mode="after")
     def check_credentials(self) -> "CogniteSettings":
@@ -106,6 +146,9 @@ class CogniteSettings(BaseSettings):
         if self.client_id and not self.client_secret:
             raise ValueError("'client_secret' is required!")
 
+        if self.obo_token_cache_redis and not self.obo_token_encryption_key:
+            raise ValueError("'obo_token_encryption_key' is required!")
+
         if (self.interactive_client_id or self.client_id) and not self.tenant_id:
             raise ValueError("'tenant_id' is required!")
         return self
@@ -117,6 +160,9 @@ class ToolsSettings(BaseModel):
     display_graphics: DisplayGraphicsSettings | None = None
     retrieval_search: RetrievalSearchSettings | None = None
     cognite: CogniteSettings | None = None
+    sparql_cache: SparqlCacheSettings | None = None
+    parallel_tool_calls: bool = False
+    max_parallel_tool_calls: int = Field(default=4, ge=1)
 
 
 class LLMType(Enum):
@@ -140,6 +186,7 @@ class LLMSettings(BaseSettings):
     seed: int | None = None
     reasoning_effort: str | None = None
     timeout: int = Field(default=120, gt=0.0)
+    prompt_cache_key: str | None = None
     api_key: SecretStr
 
     @model_validator(mode="after")
@@ -153,6 +200,11 @@ class LLMSettings(BaseSettings):
             if not self.hugging_face_endpoint:
                 raise ValueError("hugging_face_endpoint is required!")
 
+        if self.type == LLMType.hugging_face and self.prompt_cache_key:
+            raise ValueError(
+                "`prompt_cache_key` is supported only by OpenAI and Azure OpenAI."
+            )
+
         if self.use_responses_api and self.seed is not None:
             raise ValueError(
                 "`seed` is not supported by the Responses API. "
@@ -166,23 +218,150 @@ class PromptsSettings(BaseModel):
     assistant_instructions: str
 
 
+class HistoryCompactionSettings(BaseModel):
+    token_threshold: int = Field(default=16000, ge=1)
+    keep_last_turns: int = Field(default=1, ge=1)
+    preview_chars: int = Field(default=500, ge=0)
+
+
 class Talk2PowerSystemAgentSettings(BaseSettings):
     graphdb: GraphDBSettings
     llm: LLMSettings
     tools: ToolsSettings
     prompts: PromptsSettings
+    history_compaction: HistoryCompactionSettings | None = None
+
+
+class AgentsCache:
+    """
+    Bounded cache of compiled agents keyed by user identity.
+
+    An entry is evicted `expiry_margin` seconds before the expiry of the OBO token,
+    with which the agent's Cognite session was created.
+    """
+
+    def __init__(self, maxsize: int, expiry_margin: int, timer=time.time):
+        self.__expiry_margin = expiry_margin
+        self.__cache = TLRUCache(maxsize=maxsize, ttu=self.__ttu, timer=timer)
+        self.hits = 0
+        self.misses = 0
+
+    def __ttu(
+        self, _key: str, value: tuple[float, CompiledStateGraph], _now: float
+    ) -> float:
+        expires_at, _ = value
+        return expires_at - self.__expiry_margin
+
+    @staticmethod
+    def get_user_key_and_expiry(
+        obo_token: str | None,
+    ) -> tuple[str | None, float | None]:
+        """
+        Returns the user identity and the expiry timestamp of the OBO token.
+        The token is issued by Entra ID for our confidential application,
+        so its signature is not verified here.
+        """
+        if not obo_token:
+            return None, None
+
+        # imported only if OBO authentication is enabled
+        from jose import JWTError, jwt
+
+        try:
+            claims = jwt.get_unverified_claims(obo_token)
+        except JWTError:
+            logger.warning("Can't decode the Cognite OBO token")
+            return None, None
+
+        user_id = claims.get("oid") or claims.get("sub")
+        expires_at = claims.get("exp")
+        if not user_id or not expires_at:
+            return None, None
+        return f"{claims.get('tid', '')}:{user_id}", float(expires_at)
+
+    def get(self, key: str) -> CompiledStateGraph | None:
+        value = self.__cache.get(key)
+        if value:
+            self.hits += 1
+            return value[1]
+        self.misses += 1
+        return None
+
+    def put(self, key: str, expires_at: float, agent: CompiledStateGraph) -> None:
+        self.__cache[key] = (expires_at, agent)
+
+    @property
+    def info(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": self.__cache.currsize,
+            "maxsize": int(self.__cache.maxsize),
+        }
+
+
+def load_agent_config(path_to_yaml_config: Path) -> dict[str, Any]:
+    config_path = Path(path_to_yaml_config).resolve()
+
+    # Resolve paths relative to config file
+    with open(config_path, "r", encoding="utf-8") as f:
+        config = yaml.safe_load(f.read())
+
+    ontology_schema_config = config["tools"]["ontology_schema"]
+    rel_path = ontology_schema_config["file_path"]
+    abs_path = config_path.parent / rel_path
+    ontology_schema_config["file_path"] = str(abs_path.resolve())
+    return config
+
+
+def get_ontology_schema(
+    settings: OntologySchemaSettings, startup_cache: StartupCache
+) -> str:
+    """
+    Returns the ontology schema serialized in turtle, minified if configured.
+    """
+
+    def serialize() -> str:
+        schema_graph = Graph().parse(settings.file_path, format="turtle")
+        if settings.minify:
+            schema_graph = minify_schema(schema_graph)
+        return schema_graph.serialize(format="turtle")
+
+    return startup_cache.get_or_create(
+        "ontology_schema",
+        [settings.file_path.read_bytes(), str(settings.minify), rdflib.__version__],
+        serialize,
+    )
+
+
+def validate_graphics_tool_template(startup_cache: StartupCache) -> None:
+    sparql_query_template = GraphicsTool.model_fields["sparql_query_template"].default
+    startup_cache.get_or_create(
+        "graphics_tool_template",
+        [sparql_query_template, rdflib.__version__],
+        lambda: validate_graphics_sparql_query_template(sparql_query_template),
+    )
+    GraphicsTool.validated_sparql_query_templates.add(sparql_query_template)
 
 
 class Talk2PowerSystemAgentFactory:
     instructions: str
+    startup_cache: StartupCache
+    startup_phases: dict[str, float]
+    schema_index: SchemaIndex | None
+    ontology_schema_and_vocabulary_tool: OntologySchemaAndVocabularyTool | None
     model: BaseChatModel
     checkpointer: Checkpointer | None = None
-    graphdb_client: GraphDB
-    cognite_session: CogniteSession | None
+    graphdb_client: TracingGraphDB
+    tools_graphdb_client: TracingGraphDB
+    async_graphdb_client: AsyncGraphDB
+    sparql_cache: SparqlResultCache | None
+    cognite_session: "CogniteSession | None"
     tools: list[BaseTool]
     tools_metadata: dict[str, dict[str, Any]]
     tool_name_to_gdb_repository_id: dict[str, str]
     advanced_tools: set[str]
+    agents_cache: AgentsCache | None
     __agent: CompiledStateGraph | None
     __settings: Talk2PowerSystemAgentSettings
 
@@ -190,26 +369,26 @@ class Talk2PowerSystemAgentFactory:
         self,
         path_to_yaml_config: Path,
         checkpointer: Checkpointer | None = None,
+        startup_cache: StartupCache | None = None,
     ):
-        self.__init_settings(path_to_yaml_config)
+        self.startup_cache = startup_cache or StartupCache()
+        timer = PhaseTimer("Agent factory initialization")
+        with timer.phase("settings"):
+            self.__init_settings(path_to_yaml_config)
         self.checkpointer = checkpointer
-        self.__init_model()
-        self.__init_graphdb()
-        self.__init_instructions()
-        self.__init_tools()
+        with timer.phase("model"):
+            self.__init_model()
+        with timer.phase("graphdb"):
+            self.__init_graphdb()
+        with timer.phase("instructions"):
+            self.__init_instructions()
+        with timer.phase("tools"):
+            self.__init_tools()
+        timer.log_report()
+        self.startup_phases = timer.phases
 
     def __init_settings(self, path_to_yaml_config: Path) -> None:
-        config_path = Path(path_to_yaml_config).resolve()
-
-        # Resolve paths relative to config file
-        with open(config_path, "r", encoding="utf-8") as f:
-            config = yaml.safe_load(f.read())
-
-        ontology_schema_config = config["tools"]["ontology_schema"]
-        rel_path = ontology_schema_config["file_path"]
-        abs_path = config_path.parent / rel_path
-        ontology_schema_config["file_path"] = str(abs_path.resolve())
-
+        config = load_agent_config(path_to_yaml_config)
         self.__settings = Talk2PowerSystemAgentSettings(**config)
 
     def __init_graphdb(self) -> None:
@@ -230,15 +409,33 @@ class Talk2PowerSystemAgentFactory:
             kwargs.update(
                 {"auth_header": f"Basic {basic_auth_token(graphdb_settings)}"}
             )
-        self.graphdb_client = GraphDB(**kwargs)
+        self.graphdb_client = TracingGraphDB(**kwargs)
+
+        self.sparql_cache = None
+        self.tools_graphdb_client = self.graphdb_client
+        sparql_cache_settings = self.__settings.tools.sparql_cache
+        if sparql_cache_settings:
+            self.sparql_cache = SparqlResultCache(
+                max_size=sparql_cache_settings.max_size,
+                max_entry_size=sparql_cache_settings.max_entry_size,
+                redis_ttl=sparql_cache_settings.redis_ttl,
+            )
+            self.tools_graphdb_client = CachingGraphDB(
+                cache=self.sparql_cache, **kwargs
+            )
+
+        self.async_graphdb_client = AsyncGraphDB(
+            self.graphdb_client, max_workers=graphdb_settings.max_concurrent_requests
+        )
 
     def __init_tools(self) -> None:
         tools_settings = self.__settings.tools
         self.tools: list[BaseTool] = []
         self.tools_metadata: dict[str, dict[str, Any]] = dict()
 
-        sparql_query_tool = SparqlQueryTool(
-            graph=self.graphdb_client,
+        sparql_query_tool = AsyncSparqlQueryTool(
+            graph=self.tools_graphdb_client,
+            async_graph=self.async_graphdb_client,
             graphdb_repository_id=self.graphdb_repository_id,
         )
         self.tools.append(sparql_query_tool)
@@ -254,8 +451,9 @@ class Talk2PowerSystemAgentFactory:
                     "sparql_query_template": autocomplete_search_settings.sparql_query_template,
                 }
             )
-        autocomplete_search_tool = AutocompleteSearchTool(
-            graph=self.graphdb_client,
+        autocomplete_search_tool = AsyncAutocompleteSearchTool(
+            graph=self.tools_graphdb_client,
+            async_graph=self.async_graphdb_client,
             graphdb_repository_id=self.graphdb_repository_id,
             **autocomplete_search_kwargs,
         )
@@ -266,8 +464,10 @@ class Talk2PowerSystemAgentFactory:
             "sparql_query_template": autocomplete_search_tool.sparql_query_template,
         }
 
+        validate_graphics_tool_template(self.startup_cache)
         display_graphics_tool = GraphicsTool(
-            graph=self.graphdb_client,
+            graph=self.tools_graphdb_client,
+            async_graph=self.async_graphdb_client,
             graphdb_repository_id=self.graphdb_repository_id,
         )
         self.tools.append(display_graphics_tool)
@@ -282,8 +482,9 @@ class Talk2PowerSystemAgentFactory:
         }
         if sample_sparql_queries_enabled:
             retrieval_search_settings = tools_settings.retrieval_search
-            retrieval_query_tool = RetrievalQueryTool(
-                graph=self.graphdb_client,
+            retrieval_query_tool = AsyncRetrievalQueryTool(
+                graph=self.tools_graphdb_client,
+                async_graph=self.async_graphdb_client,
                 graphdb_repository_id=retrieval_search_settings.graphdb_repository_id,
                 connector_name=retrieval_search_settings.connector_name,
                 name=retrieval_search_settings.name,
@@ -299,6 +500,15 @@ class Talk2PowerSystemAgentFactory:
             )
         self.tools_metadata["sample_sparql_queries"] = sample_sparql_queries_meta
 
+        ontology_schema_settings = tools_settings.ontology_schema
+        if ontology_schema_settings.relevance_pruning:
+            # the instructions contain only the relevant part of the schema,
+            # so the LLM can fetch the full schema, if it needs it
+            self.tools.append(self.ontology_schema_and_vocabulary_tool)
+        self.tools_metadata["ontology_schema_and_vocabulary"] = {
+            "enabled": ontology_schema_settings.relevance_pruning
+        }
+
         now_tool = NowTool()
         self.tools.append(now_tool)
         self.tools_metadata["now"] = {"enabled": True}
@@ -308,6 +518,7 @@ class Talk2PowerSystemAgentFactory:
         cognite_meta: dict[str, Any] = {"enabled": cognite_enabled}
 
         self.cognite_session = None
+        self.agents_cache = None
         self.__agent = None
         if cognite_enabled:
             cognite_meta.update(
@@ -324,31 +535,15 @@ class Talk2PowerSystemAgentFactory:
                 or cognite_settings.token_file_path
             ):
                 self.cognite_session = self.__init_cognite()
-                self.tools.append(
-                    RetrieveTimeSeriesTool(cognite_session=self.cognite_session)
-                )
-                self.tools.append(
-                    RetrieveDataPointsTool(cognite_session=self.cognite_session)
-                )
-                model_with_tools = self.model.bind_tools(
-                    self.tools, parallel_tool_calls=False
-                )
-                self.__agent = create_agent(
-                    model=model_with_tools,
-                    tools=self.tools,
-                    system_prompt=self.instructions,
-                    checkpointer=self.checkpointer,
+                self.tools.extend(self.__create_cognite_tools(self.cognite_session))
+                self.__agent = self.__create_agent(self.tools)
+            else:
+                self.agents_cache = AgentsCache(
+                    maxsize=cognite_settings.obo_agents_cache_size,
+                    expiry_margin=cognite_settings.obo_token_expiry_margin,
                 )
         else:
-            model_with_tools = self.model.bind_tools(
-                self.tools, parallel_tool_calls=False
-            )
-            self.__agent = create_agent(
-                model=model_with_tools,
-                tools=self.tools,
-                system_prompt=self.instructions,
-                checkpointer=self.checkpointer,
-            )
+            self.__agent = self.__create_agent(self.tools)
 
         self.tools_metadata["retrieve_data_points"] = cognite_meta
         self.tools_metadata["retrieve_time_series"] = cognite_meta
@@ -364,15 +559,77 @@ class Talk2PowerSystemAgentFactory:
             if isinstance(tool, BaseGraphDBTool) and tool.name != sparql_query_tool.name
         }
 
+    def __create_agent(self, tools: list[BaseTool]) -> CompiledStateGraph:
+        tools_settings = self.__settings.tools
+        middleware = []
+        if is_tracing_enabled():
+            # the outermost, so the spans include the waits for the other middleware
+            middleware.append(TracingMiddleware())
+        if tools_settings.parallel_tool_calls:
+            middleware.append(
+                ToolCallConcurrencyMiddleware(tools_settings.max_parallel_tool_calls)
+            )
+        if self.schema_index:
+            middleware.append(
+                RelevantSchemaMiddleware(
+                    self.__settings.prompts.assistant_instructions, self.schema_index
+                )
+            )
+        history_compaction_settings = self.__settings.history_compaction
+        if history_compaction_settings:
+            middleware.append(
+                HistoryCompactionMiddleware(
+                    history_compaction_settings.token_threshold,
+                    history_compaction_settings.keep_last_turns,
+                    history_compaction_settings.preview_chars,
+                )
+            )
+        model_kwargs = {}
+        if self.__settings.llm.prompt_cache_key:
+            model_kwargs["prompt_cache_key"] = self.__settings.llm.prompt_cache_key
+        model_with_tools = self.model.bind_tools(
+            tools,
+            parallel_tool_calls=tools_settings.parallel_tool_calls,
+            **model_kwargs,
+        )
+        return create_agent(
+            model=model_with_tools,
+            tools=tools,
+            system_prompt=self.instructions,
+            middleware=middleware,
+            checkpointer=self.checkpointer,
+        )
+
     def __init_instructions(self) -> None:
         settings = self.__settings
-        ontology_schema_and_vocabulary_tool = OntologySchemaAndVocabularyTool(
-            graph=self.graphdb_client,
-            ontology_schema_file_path=settings.tools.ontology_schema.file_path,
-        )
+        ontology_schema_settings = settings.tools.ontology_schema
+
+        self.schema_index = None
+        self.ontology_schema_and_vocabulary_tool = None
+        if ontology_schema_settings.relevance_pruning:
+            self.ontology_schema_and_vocabulary_tool = OntologySchemaAndVocabularyTool(
+                graph=self.tools_graphdb_client,
+                ontology_schema_file_path=ontology_schema_settings.file_path,
+            )
+            schema_graph = self.ontology_schema_and_vocabulary_tool.schema_graph
+            if ontology_schema_settings.minify:
+                schema_graph = minify_schema(schema_graph)
+            self.schema_index = SchemaIndex(
+                schema_graph, ontology_schema_settings.core_terms
+            )
+            # the middleware injects the relevant part of the schema on each turn,
+            # here only the core terms are used
+            ontology_schema = self.schema_index.render("")
+        else:
+            # the schema is parsed and serialized only if it's not in the cache
+            ontology_schema = get_ontology_schema(
+                ontology_schema_settings, self.startup_cache
+            )
+        logger.info(f"Ontology schema has {len(ontology_schema)} characters")
+
         self.instructions = f"""{settings.prompts.assistant_instructions}""".replace(
             "{ontology_schema}",
-            ontology_schema_and_vocabulary_tool.schema_graph.serialize(format="turtle"),
+            ontology_schema,
         )
 
     def __init_model(self) -> None:
@@ -414,7 +671,10 @@ class Talk2PowerSystemAgentFactory:
                 api_key=llm_settings.api_key,
             )
 
-    def __init_cognite(self, obo_token: str | None = None) -> CogniteSession:
+    def __init_cognite(self, obo_token: str | None = None) -> "CogniteSession":
+        # the Cognite SDK is imported only if Cognite is enabled, as it's slow
+        from talk2powersystemllm.tools import CogniteSession
+
         cognite_settings = self.cognite_settings
         return CogniteSession(
             base_url=cognite_settings.base_url,
@@ -428,23 +688,46 @@ class Talk2PowerSystemAgentFactory:
             obo_token=obo_token,
         )
 
+    def __create_cognite_tools(
+        self, cognite_session: "CogniteSession"
+    ) -> list[BaseTool]:
+        from talk2powersystemllm.tools import (
+            RetrieveDataPointsTool,
+            RetrieveTimeSeriesTool,
+        )
+
+        cognite_settings = self.cognite_settings
+        return [
+            RetrieveTimeSeriesTool(
+                cognite_session=cognite_session,
+                max_result_tokens=cognite_settings.max_result_tokens,
+            ),
+            RetrieveDataPointsTool(
+                cognite_session=cognite_session,
+                max_result_tokens=cognite_settings.max_result_tokens,
+                max_series_per_request=cognite_settings.max_series_per_request,
+                max_concurrent_requests=cognite_settings.max_concurrent_requests,
+                max_fetch_bytes=cognite_settings.max_fetch_bytes,
+            ),
+        ]
+
     def get_agent(self, cognite_obo_token: str | None = None) -> CompiledStateGraph:
         if self.__agent:
             return self.__agent
-        else:
-            tools = self.tools
-            cognite_session = self.__init_cognite(cognite_obo_token)
-            tools = tools + [
-                RetrieveTimeSeriesTool(cognite_session=cognite_session),
-                RetrieveDataPointsTool(cognite_session=cognite_session),
-            ]
-            model_with_tools = self.model.bind_tools(tools, parallel_tool_calls=False)
-            return create_agent(
-                model=model_with_tools,
-                tools=tools,
-                system_prompt=self.instructions,
-                checkpointer=self.checkpointer,
-            )
+
+        user_key, expires_at = AgentsCache.get_user_key_and_expiry(cognite_obo_token)
+        if user_key:
+            agent = self.agents_cache.get(user_key)
+            if agent:
+                return agent
+
+        cognite_session = self.__init_cognite(cognite_obo_token)
+        agent = self.__create_agent(
+            self.tools + self.__create_cognite_tools(cognite_session)
+        )
+        if user_key:
+            self.agents_cache.put(user_key, expires_at, agent)
+        return agent
 
     @property
     def graphdb_base_url(self) -> str:
@@ -462,6 +745,10 @@ class Talk2PowerSystemAgentFactory:
     def sample_sparql_queries_settings(self) -> RetrievalSearchSettings:
         return self.__settings.tools.retrieval_search
 
+    @property
+    def sparql_cache_settings(self) -> SparqlCacheSettings | None:
+        return self.__settings.tools.sparql_cache
+
     @property
     def cognite_enabled(self) -> bool:
         return bool(self.__settings.tools.cognite)
@@ -2,12 +2,17 @@ from .auth import AuthConfig
 from .models import (
     ChatRequest,
     ChatResponse,
+    ChatStreamEvent,
     ExplainRequest,
     ExplainResponse,
     Graphic,
     Message,
+    MessageDelta,
     QueryMethod,
+    StreamError,
     SvgGraphic,
+    ToolCallEnd,
+    ToolCallStart,
     Usage,
     VizGraphGraphic,
 )
@@ -31,12 +36,17 @@ __all__ = [
     "AuthConfig",
     "ChatRequest",
     "ChatResponse",
+    "ChatStreamEvent",
     "ExplainRequest",
     "ExplainResponse",
     "Graphic",
     "Message",
+    "MessageDelta",
     "QueryMethod",
+    "StreamError",
     "SvgGraphic",
+    "ToolCallEnd",
+    "ToolCallStart",
     "Usage",
     "VizGraphGraphic",
     "AboutAgentInfo",
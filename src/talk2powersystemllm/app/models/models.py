@@ -1,3 +1,4 @@
+from enum import Enum
 from typing import Annotated, Literal, Union
 
 from pydantic import BaseModel, Field
@@ -12,6 +13,10 @@ class Usage(BaseModel):
     completion_tokens: int = Field(alias="completionTokens")
     prompt_tokens: int = Field(alias="promptTokens")
     total_tokens: int = Field(alias="totalTokens")
+    cached_prompt_tokens: int | None = Field(default=None, alias="cachedPromptTokens")
+    compacted_prompt_tokens: int | None = Field(
+        default=None, alias="compactedPromptTokens"
+    )
 
 
 class SvgGraphic(BaseModel):
@@ -40,6 +45,38 @@ class ChatResponse(BaseModel):
     usage: Usage
 
 
+class ChatStreamEvent(Enum):
+    DELTA = "delta"
+    TOOL_CALL_START = "toolCallStart"
+    TOOL_CALL_END = "toolCallEnd"
+    GRAPHIC = "graphic"
+    MESSAGE = "message"
+    DONE = "done"
+    ERROR = "error"
+
+
+class MessageDelta(BaseModel):
+    id: str
+    delta: str
+
+
+class ToolCallStart(BaseModel):
+    id: str
+    name: str
+    args: dict
+
+
+class ToolCallEnd(BaseModel):
+    id: str
+    name: str | None = None
+    status: str
+
+
+class StreamError(BaseModel):
+    message: str
+    request_id: str | None = Field(default=None, alias="requestId")
+
+
 class ExplainRequest(BaseModel):
     conversation_id: str = Field(alias="conversationId")
     message_id: str = Field(alias="messageId")
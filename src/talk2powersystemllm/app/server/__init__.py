@@ -0,0 +1,4 @@
+from .startup_profiler import start_startup_profiler_from_env
+
+# before the application modules are imported, so that their imports are profiled
+start_startup_profiler_from_env()
@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Literal
 
 from pydantic import Field, SecretStr, model_validator
 from pydantic_settings import BaseSettings
@@ -36,6 +37,17 @@ class SecuritySettings(BaseSettings):
         description="Indicates how many seconds to cache the public keys and the issuer "
         "obtained from the OpenID Configuration endpoint.",
     )
+    jwks_refresh_min_interval: int = Field(
+        default=60,
+        ge=1,
+        description="Minimum number of seconds between the refreshes of the public keys "
+        "triggered by tokens signed with an unknown key.",
+    )
+    verified_tokens_cache_size: int = Field(
+        default=1024,
+        ge=1,
+        description="Maximum number of verified tokens cached until they expire.",
+    )
 
     authority: str | None = Field(
         default=None,
@@ -111,6 +123,27 @@ class RedisSettings(BaseSettings):
     ttl_refresh_on_read: bool = Field(
         default=True, description="Redis Refresh TTL on read"
     )
+    checkpoint_compression: Literal["zstd", "zlib"] | None = Field(
+        default=None,
+        description="Compression of the serialized checkpoint values. "
+        "None disables the compression.",
+    )
+    checkpoint_compression_min_size: int = Field(
+        default=1024,
+        ge=0,
+        description="Minimum size in bytes of the checkpoint values to compress",
+    )
+    checkpoint_offload_threshold: int | None = Field(
+        default=None,
+        ge=1,
+        description="Size in bytes of the tool results stored in separate keys, "
+        "referenced from the checkpoints. None disables the offloading.",
+    )
+    checkpoint_stats: bool = Field(
+        default=False,
+        description="Count the checkpoints and the bytes stored per conversation "
+        "in Redis. Adds a write to each checkpoint operation.",
+    )
 
 
 class AppSettings(BaseSettings):
@@ -128,7 +161,28 @@ class AppSettings(BaseSettings):
     about_refresh_interval: int = Field(
         default=30, ge=1, description="The __about endpoint refresh interval in seconds"
     )
+    event_loop_monitor_interval: float = Field(
+        default=0.5,
+        gt=0,
+        description="Interval in seconds, in which the event loop lag and "
+        "the resident memory of each worker are recorded in the metrics",
+    )
     trouble_md_path: Path = "/code/trouble.md"
+    startup_cache_dir: Path | None = Field(
+        default=None,
+        description="Directory with the artifacts derived at startup, "
+        "precomputed at build time by the build_startup_cache script. "
+        "If not set, the artifacts are derived on each startup.",
+    )
+    tracing_exporter: Literal["otlp", "console", "file"] | None = Field(
+        default=None,
+        description="Exporter of the OpenTelemetry spans. None disables the tracing.",
+    )
+    tracing_file: Path | None = Field(
+        default=None,
+        description="File, where the spans are written as JSON lines, "
+        "if the tracing exporter is 'file'.",
+    )
     docs_url: str = "/docs"
     root_path: str = "/"
     logging_yaml_file: Path = "/code/logging.yaml"
@@ -136,3 +190,9 @@ class AppSettings(BaseSettings):
     pyproject_toml_path: Path = "/code/pyproject.toml"
     diagrams_path: Path = "/code/diagrams/"
     frontend_context_path: str = "/"
+
+    @model_validator(mode="after")
+    def check_tracing_file(self) -> "AppSettings":
+        if self.tracing_exporter == "file" and not self.tracing_file:
+            raise ValueError("'tracing_file' is required for the 'file' exporter!")
+        return self
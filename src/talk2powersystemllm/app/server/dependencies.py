@@ -1,7 +1,6 @@
 import logging
 from typing import Annotated, Optional
 
-from cachetools import TTLCache
 from fastapi import (
     Depends,
     Header,
@@ -13,7 +12,7 @@ from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
 from talk2powersystemllm.agent import Talk2PowerSystemAgentFactory
 from talk2powersystemllm.app.server.config import AppSettings
-from talk2powersystemllm.app.server.services import verify_jwt
+from talk2powersystemllm.app.server.services import ExplainIndex, JwtVerifier
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +25,10 @@ def get_llm_callbacks(request: Request) -> list:
     return request.app.state.callbacks
 
 
+def get_explain_index(request: Request) -> ExplainIndex | None:
+    return getattr(request.app.state, "explain_index", None)
+
+
 def get_msal_app(request: Request):
     return getattr(request.app.state, "confidential_app", None)
 
@@ -38,13 +41,13 @@ def get_security_scheme() -> HTTPBearer:
     return HTTPBearer(auto_error=False)
 
 
-def get_jwks_cache(request: Request) -> TTLCache:
-    return getattr(request.app.state, "jwks_cache", None)
+def get_jwt_verifier(request: Request) -> JwtVerifier | None:
+    return getattr(request.app.state, "jwt_verifier", None)
 
 
 async def conditional_security(
     settings: Annotated[AppSettings, Depends(get_settings)],
-    jwks_cache: Annotated[TTLCache, Depends(get_jwks_cache)],
+    jwt_verifier: Annotated[JwtVerifier | None, Depends(get_jwt_verifier)],
     credentials: Optional[HTTPAuthorizationCredentials] = Security(
         get_security_scheme()
     ),
@@ -52,7 +55,7 @@ async def conditional_security(
     if settings.security.enabled:
         if not credentials:
             raise HTTPException(status_code=401, detail="Not authenticated")
-        return verify_jwt(settings, jwks_cache, credentials.credentials)
+        return await jwt_verifier.verify(credentials.credentials)
     return None
 
 
@@ -68,29 +71,8 @@ async def get_cognite_obo_token(
     if not authorization:
         raise HTTPException(status_code=401, detail="Authorization header missing")
 
-    confidential_app = request.app.state.confidential_app
-    scopes = request.app.state.cognite_scopes
-
-    result = confidential_app.acquire_token_silent(scopes, account=None)
-    if result and "access_token" in result:
-        return result["access_token"]
-
-    logger.debug("Acquiring new Cognite token via OBO flow.")
-    result = confidential_app.acquire_token_on_behalf_of(
-        user_assertion=authorization,
-        scopes=scopes,
-    )
-
-    if "access_token" not in result:
-        error_desc = result.get(
-            "error_description", result.get("error", "Unknown MSAL Error")
-        )
-        logger.error(f"MSAL OBO Error: {error_desc}")
-        raise HTTPException(
-            status_code=401, detail=f"Failed to acquire Cognite token: {error_desc}"
-        )
-
-    return result["access_token"]
+    obo_token_provider = request.app.state.obo_token_provider
+    return await obo_token_provider.get_token(authorization)
 
 
 async def get_chat_agent(
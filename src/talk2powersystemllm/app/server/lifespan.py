@@ -1,26 +1,36 @@
+import asyncio
 import logging
 from contextlib import asynccontextmanager
+from importlib.metadata import version as get_pkg_version
 from pathlib import Path
 
-import markdown
-import msal
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from cachetools import TTLCache
 from fastapi import FastAPI
-from langgraph.checkpoint.redis import AsyncRedisSaver
 from redis.asyncio import Redis, RedisCluster
 
 from talk2powersystemllm.agent import Talk2PowerSystemAgentFactory
+from talk2powersystemllm.app.server.metrics import (
+    MetricsCallbackHandler,
+    monitor_event_loop,
+)
 from talk2powersystemllm.app.server.services import (
     CogniteHealthchecker,
+    ExplainIndex,
     GraphDBHealthchecker,
     HealthChecks,
+    JwksCache,
+    JwtVerifier,
     LLMHealthchecker,
+    OboTokenProvider,
     RedisHealthchecker,
     create_redis_client,
+    create_redis_saver,
+    create_sync_redis_client,
     update_about_info,
     update_gtg_info,
 )
+from talk2powersystemllm.app.server.startup_profiler import finish_startup_profiler
+from talk2powersystemllm.startup_cache import PhaseTimer, StartupCache
 
 logger = logging.getLogger(__name__)
 
@@ -30,24 +40,34 @@ async def lifespan(fastapi_app: FastAPI):
     logger.info("Starting the application")
 
     settings = fastapi_app.state.settings
+    startup_cache = StartupCache(settings.startup_cache_dir)
+    fastapi_app.state.startup_cache = startup_cache
+    timer = PhaseTimer("Application startup")
 
     async with (
         create_redis_client(settings.redis) as redis_client,
-        AsyncRedisSaver.from_conn_string(
-            redis_client=redis_client,
-            ttl={
-                "default_ttl": settings.redis.ttl,
-                "refresh_on_read": settings.redis.ttl_refresh_on_read,
-            },
-        ) as redis_saver,
+        create_redis_saver(settings.redis, redis_client) as redis_saver,
     ):
-        await redis_saver.asetup()
-
-        agent_factory = Talk2PowerSystemAgentFactory(
-            settings.agent_config,
-            checkpointer=redis_saver,
-        )
+        with timer.phase("redis"):
+            await redis_saver.asetup()
+
+        with timer.phase("agent_factory"):
+            agent_factory = Talk2PowerSystemAgentFactory(
+                settings.agent_config,
+                checkpointer=redis_saver,
+                startup_cache=startup_cache,
+            )
         fastapi_app.state.agent_factory = agent_factory
+        fastapi_app.state.explain_index = ExplainIndex(
+            redis_client,
+            agent_factory,
+            ttl=settings.redis.ttl * 60,
+            refresh_on_read=settings.redis.ttl_refresh_on_read,
+        )
+
+        sparql_cache = agent_factory.sparql_cache
+        if sparql_cache and agent_factory.sparql_cache_settings.redis:
+            sparql_cache.redis_client = create_sync_redis_client(settings.redis)
 
         health_checks_registry = await create_health_checks_registry(
             fastapi_app, agent_factory, redis_client
@@ -55,28 +75,63 @@ async def lifespan(fastapi_app: FastAPI):
         fastapi_app.state.health_checks_registry = health_checks_registry
 
         if settings.security.enabled:
-            fastapi_app.state.jwks_cache = TTLCache(
-                maxsize=1, ttl=settings.security.ttl
+            fastapi_app.state.jwt_verifier = JwtVerifier(
+                settings.security,
+                JwksCache(
+                    settings.security.oidc_discovery_url,
+                    ttl=settings.security.ttl,
+                    min_refresh_interval=settings.security.jwks_refresh_min_interval,
+                ),
+                cache_size=settings.security.verified_tokens_cache_size,
             )
             if (
                 agent_factory.cognite_enabled
                 and agent_factory.cognite_settings.obo_client_secret
             ):
+                # imported only if the Cognite OBO flow is enabled
+                import msal
+
                 fastapi_app.state.confidential_app = msal.ConfidentialClientApplication(
                     settings.security.client_id,
                     authority=settings.security.authority,
                     client_credential=agent_factory.cognite_settings.obo_client_secret.get_secret_value(),
                 )
-                fastapi_app.state.cognite_scopes = [
-                    f"{agent_factory.cognite_settings.base_url}/.default"
-                ]
+                cognite_settings = agent_factory.cognite_settings
+                fastapi_app.state.obo_token_provider = OboTokenProvider(
+                    fastapi_app.state.confidential_app,
+                    scopes=[f"{cognite_settings.base_url}/.default"],
+                    maxsize=cognite_settings.obo_token_cache_size,
+                    expiry_margin=cognite_settings.obo_token_expiry_margin_seconds,
+                    redis_client=(
+                        redis_client if cognite_settings.obo_token_cache_redis else None
+                    ),
+                    encryption_key=cognite_settings.obo_token_encryption_key,
+                )
 
         scheduler = await create_scheduler(fastapi_app, settings)
+        event_loop_monitor = asyncio.create_task(
+            monitor_event_loop(settings.event_loop_monitor_interval)
+        )
 
-        await update_gtg_info(fastapi_app)
-        await update_about_info(fastapi_app)
-        fastapi_app.state.trouble_html = get_trouble_html(settings.trouble_md_path)
+        with timer.phase("gtg"):
+            await update_gtg_info(fastapi_app)
+        with timer.phase("about"):
+            await update_about_info(fastapi_app)
+        with timer.phase("trouble"):
+            fastapi_app.state.trouble_html = get_trouble_html(
+                settings.trouble_md_path, startup_cache
+            )
 
+        timer.log_report()
+        logger.info(
+            f"Startup cache hits: {startup_cache.hits}, misses: {startup_cache.misses}"
+        )
+        finish_startup_profiler(
+            {
+                "Application startup": timer.phases,
+                "Agent factory initialization": agent_factory.startup_phases,
+            }
+        )
         logger.info("Application is running")
 
         yield
@@ -84,6 +139,14 @@ async def lifespan(fastapi_app: FastAPI):
         logger.info("Destroying the application")
         scheduler.shutdown()
         logger.info("Scheduler is stopped")
+        event_loop_monitor.cancel()
+        agent_factory.async_graphdb_client.shutdown()
+        if sparql_cache and sparql_cache.redis_client:
+            sparql_cache.redis_client.close()
+        tracer_provider = getattr(fastapi_app.state, "tracer_provider", None)
+        if tracer_provider:
+            # exports the remaining spans
+            tracer_provider.shutdown()
 
 
 async def create_health_checks_registry(
@@ -97,7 +160,10 @@ async def create_health_checks_registry(
     if agent_factory.cognite_session:
         health_checks_registry.add(CogniteHealthchecker(agent_factory.cognite_session))
     llm_health_check = LLMHealthchecker(redis_client)
-    fastapi_app.state.callbacks = [llm_health_check]
+    fastapi_app.state.callbacks = [
+        llm_health_check,
+        MetricsCallbackHandler(agent_factory.tool_name_to_gdb_repository),
+    ]
     health_checks_registry.add(llm_health_check)
     return health_checks_registry
 
@@ -121,11 +187,22 @@ async def create_scheduler(fastapi_app: FastAPI, settings) -> AsyncIOScheduler:
     return scheduler
 
 
-def get_trouble_html(trouble_md_path: Path):
+def get_trouble_html(
+    trouble_md_path: Path, startup_cache: StartupCache | None = None
+) -> str:
     with open(trouble_md_path, "r", encoding="utf-8") as trouble_md_file:
         trouble_md_text = trouble_md_file.read()
+
+    def render() -> str:
+        # imported only if the rendered document is not in the startup cache
+        import markdown
+
         return markdown.markdown(
             trouble_md_text,
             extensions=["toc", "fenced_code"],
             extension_configs={"toc": {"title": "Table of Contents"}},
         )
+
+    return (startup_cache or StartupCache()).get_or_create(
+        "trouble_html", [trouble_md_text, get_pkg_version("markdown")], render
+    )
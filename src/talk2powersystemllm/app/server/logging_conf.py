@@ -1,20 +1,158 @@
+import atexit
+import json
 import logging
 import logging.config as logging_config
+import logging.handlers
+import random
+import zlib
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Any
 
 import yaml
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
 
 from talk2powersystemllm.app.server.middleware import CTX_REQUEST
 
+# the attributes of every log record, the others are passed with `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
 
 def config_logger(logging_yaml: Path) -> None:
     with open(logging_yaml, "r") as f:
         config = yaml.safe_load(f.read())
         logging_config.dictConfig(config)
+    for name in logging.getHandlerNames():
+        handler = logging.getHandlerByName(name)
+        listener = getattr(handler, "listener", None)
+        if isinstance(handler, logging.handlers.QueueHandler) and listener:
+            listener.start()
+            # writes the remaining records on exit
+            atexit.register(listener.stop)
 
 
 class XRequestIdFilter(logging.Filter):
     def filter(self, record) -> bool:
-        request = CTX_REQUEST.get()
-        record.x_request_id = request
+        # set in the thread of the caller, if the record is passed through a queue
+        if getattr(record, "x_request_id", None) is None:
+            record.x_request_id = CTX_REQUEST.get()
         return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps `rate` of the verbose records, i.e. logged with `extra={"verbose": True}`,
+    and all other records.
+    The verbose records of a request are either all kept or all dropped,
+    so the sampled requests can be followed from start to end.
+    """
+
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record) -> bool:
+        if not getattr(record, "verbose", False) or self.rate >= 1:
+            return True
+        request_id = getattr(record, "x_request_id", None) or CTX_REQUEST.get()
+        if request_id is None:
+            return random.random() < self.rate
+        return zlib.crc32(request_id.encode("utf-8")) / 0xFFFFFFFF < self.rate
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Passes the records to the handlers in the thread of a `QueueListener`,
+    so the callers don't wait for the formatting and the I/O.
+    Unlike `QueueHandler`, the records are not formatted in the thread
+    of the caller, because the queue is in the same process.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+    return f"{text[:max_chars]}... ({len(text)} characters)"
+
+
+def preview(value: Any, max_chars: int) -> Any:
+    """
+    Returns a JSON serializable summary of the value, where the texts are truncated
+    to `max_chars` characters, and the artifacts of the tool messages are replaced
+    with their types.
+    """
+    if isinstance(value, BaseMessage):
+        summary = {
+            "type": value.type,
+            "id": value.id,
+            "content": _truncate(value.text, max_chars),
+        }
+        if isinstance(value, AIMessage) and value.tool_calls:
+            summary["tool_calls"] = [
+                {
+                    "name": tool_call["name"],
+                    "args": _truncate(
+                        json.dumps(tool_call["args"], ensure_ascii=False), max_chars
+                    ),
+                }
+                for tool_call in value.tool_calls
+            ]
+        if isinstance(value, ToolMessage):
+            summary["name"] = value.name
+            summary["status"] = value.status
+            if value.artifact is not None:
+                summary["artifact"] = type(value.artifact).__name__
+        return summary
+    if isinstance(value, dict):
+        return {str(key): preview(item, max_chars) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [preview(item, max_chars) for item in value]
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return _truncate(value, max_chars) if isinstance(value, str) else value
+    return _truncate(str(value), max_chars)
+
+
+class LazyPreview:
+    """
+    Log argument, which is summarized with `preview` only if the record is emitted.
+    """
+
+    def __init__(self, value: Any, max_chars: int):
+        self.value = value
+        self.max_chars = max_chars
+
+    def render(self) -> Any:
+        return preview(self.value, self.max_chars)
+
+    def __str__(self) -> str:
+        return json.dumps(self.render(), ensure_ascii=False, default=str)
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats the records as JSON lines with the time, the level, the logger, the thread,
+    the request id, the message, the exception and the fields passed with `extra`.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc)
+            .isoformat(timespec="milliseconds")
+            .replace("+00:00", "Z"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "x_request_id": getattr(record, "x_request_id", None),
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and key not in entry:
+                entry[key] = value.render() if isinstance(value, LazyPreview) else value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
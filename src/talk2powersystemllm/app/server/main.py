@@ -12,6 +12,7 @@ from talk2powersystemllm.app.server.lifespan import lifespan
 from talk2powersystemllm.app.server.logging_conf import config_logger
 from talk2powersystemllm.app.server.middleware import setup_middleware
 from talk2powersystemllm.app.server.routers import all_routers
+from talk2powersystemllm.tracing import configure_tracing
 
 
 @lru_cache
@@ -48,6 +49,12 @@ def create_app() -> FastAPI:
     settings = get_settings()
 
     config_logger(settings.logging_yaml_file)
+    tracer_provider = None
+    if settings.tracing_exporter:
+        # before the lifespan, so the agent is created with the tracing middleware
+        tracer_provider = configure_tracing(
+            settings.tracing_exporter, settings.tracing_file
+        )
 
     version, dependencies = get_version_and_dependencies(settings.pyproject_toml_path)
 
@@ -67,6 +74,7 @@ def create_app() -> FastAPI:
 
     fastapi_app.state.settings = settings
     fastapi_app.state.dependencies = dependencies
+    fastapi_app.state.tracer_provider = tracer_provider
 
     for router in all_routers:
         fastapi_app.include_router(router)
@@ -0,0 +1,316 @@
+import asyncio
+import os
+import time
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+NAMESPACE = "talk2powersystem"
+
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TOKENS_BUCKETS = (100, 500, 1000, 2000, 5000, 10000, 20000, 50000, 100000)
+BYTES_BUCKETS = (1e3, 1e4, 1e5, 5e5, 1e6, 5e6, 1e7)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Duration of the HTTP requests until the response starts",
+    ["method", "route", "status"],
+    namespace=NAMESPACE,
+    buckets=LATENCY_BUCKETS,
+)
+CHAT_DURATION = Histogram(
+    "chat_duration_seconds",
+    "Duration of the chat requests, including the streaming of the response",
+    ["endpoint"],
+    namespace=NAMESPACE,
+    buckets=LATENCY_BUCKETS,
+)
+AGENT_STEP_DURATION = Histogram(
+    "agent_step_duration_seconds",
+    "Duration of the steps of the agent graph",
+    ["node"],
+    namespace=NAMESPACE,
+    buckets=LATENCY_BUCKETS,
+)
+TOOL_CALL_DURATION = Histogram(
+    "tool_call_duration_seconds",
+    "Duration of the tool calls",
+    ["tool", "repository", "status"],
+    namespace=NAMESPACE,
+    buckets=LATENCY_BUCKETS,
+)
+LLM_CALL_DURATION = Histogram(
+    "llm_call_duration_seconds",
+    "Duration of the LLM calls",
+    ["model", "status"],
+    namespace=NAMESPACE,
+    buckets=LATENCY_BUCKETS,
+)
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    "llm_time_to_first_token_seconds",
+    "Time to the first token of the streamed LLM calls",
+    ["model"],
+    namespace=NAMESPACE,
+    buckets=LATENCY_BUCKETS,
+)
+LLM_TOKENS = Histogram(
+    "llm_tokens",
+    "Number of tokens per LLM call",
+    ["model", "type"],
+    namespace=NAMESPACE,
+    buckets=TOKENS_BUCKETS,
+)
+CHECKPOINT_DURATION = Histogram(
+    "checkpoint_operation_duration_seconds",
+    "Duration of the reads and writes of the checkpoints in Redis",
+    ["operation"],
+    namespace=NAMESPACE,
+    buckets=LATENCY_BUCKETS,
+)
+CHECKPOINT_BYTES = Histogram(
+    "checkpoint_operation_bytes",
+    "Bytes of the values read and written with the checkpoints in Redis",
+    ["operation"],
+    namespace=NAMESPACE,
+    buckets=BYTES_BUCKETS,
+)
+HEALTHCHECK_DURATION = Histogram(
+    "healthcheck_duration_seconds",
+    "Duration of the health checks",
+    ["healthcheck"],
+    namespace=NAMESPACE,
+    buckets=LATENCY_BUCKETS,
+)
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds",
+    "Delay of the callbacks scheduled on the event loop of the worker",
+    namespace=NAMESPACE,
+    buckets=LAG_BUCKETS,
+)
+# a sample per worker process, labelled with its pid in the multiprocess mode
+WORKER_RESIDENT_MEMORY = Gauge(
+    "worker_resident_memory_bytes",
+    "Resident memory of the worker process",
+    namespace=NAMESPACE,
+    multiprocess_mode="all",
+)
+
+
+def get_resident_memory() -> int | None:
+    """
+    Returns the resident memory of the current process in bytes,
+    or None if it can't be read, i.e. outside Linux.
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+async def monitor_event_loop(interval: float) -> None:
+    """
+    Records how late the event loop of the worker wakes up after sleeping
+    `interval` seconds, and the resident memory of the worker, until cancelled.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(loop.time() - start - interval, 0))
+        resident_memory = get_resident_memory()
+        if resident_memory is not None:
+            WORKER_RESIDENT_MEMORY.set(resident_memory)
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    Records the durations of the agent steps, the tool calls and the LLM calls,
+    the time to the first token and the number of tokens of the LLM calls.
+    """
+
+    # the handler only records numbers, so it doesn't need a worker thread
+    run_inline = True
+
+    def __init__(self, tool_name_to_gdb_repository: dict[str, str]):
+        super().__init__()
+        self.tool_name_to_gdb_repository = tool_name_to_gdb_repository
+        self.__steps: dict[UUID, tuple[float, str]] = {}
+        self.__tool_calls: dict[UUID, tuple[float, str]] = {}
+        self.__llm_calls: dict[UUID, tuple[float, str]] = {}
+        self.__first_tokens: set[UUID] = set()
+
+    def on_chain_start(
+        self,
+        serialized: dict[str, Any],
+        inputs: dict[str, Any],
+        *,
+        run_id: UUID,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        node = (metadata or {}).get("langgraph_node")
+        # the nested runnables of a node have the same metadata
+        if node and kwargs.get("name") == node:
+            self.__steps[run_id] = (time.perf_counter(), node)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self.__end_step(run_id)
+
+    def on_chain_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self.__end_step(run_id)
+
+    def __end_step(self, run_id: UUID) -> None:
+        step = self.__steps.pop(run_id, None)
+        if step:
+            start, node = step
+            AGENT_STEP_DURATION.labels(node).observe(time.perf_counter() - start)
+
+    def on_tool_start(
+        self,
+        serialized: dict[str, Any],
+        input_str: str,
+        *,
+        run_id: UUID,
+        **kwargs: Any,
+    ) -> None:
+        name = (serialized or {}).get("name") or kwargs.get("name") or "unknown"
+        self.__tool_calls[run_id] = (time.perf_counter(), name)
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        status = getattr(output, "status", "success")
+        self.__end_tool_call(run_id, status)
+
+    def on_tool_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self.__end_tool_call(run_id, "error")
+
+    def __end_tool_call(self, run_id: UUID, status: str) -> None:
+        tool_call = self.__tool_calls.pop(run_id, None)
+        if tool_call:
+            start, name = tool_call
+            TOOL_CALL_DURATION.labels(
+                name, self.tool_name_to_gdb_repository.get(name, ""), status
+            ).observe(time.perf_counter() - start)
+
+    def on_chat_model_start(
+        self,
+        serialized: dict[str, Any],
+        messages: list,
+        *,
+        run_id: UUID,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        model = (metadata or {}).get("ls_model_name") or "unknown"
+        self.__llm_calls[run_id] = (time.perf_counter(), model)
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        llm_call = self.__llm_calls.get(run_id)
+        if llm_call and run_id not in self.__first_tokens:
+            self.__first_tokens.add(run_id)
+            start, model = llm_call
+            LLM_TIME_TO_FIRST_TOKEN.labels(model).observe(time.perf_counter() - start)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        model = self.__end_llm_call(run_id, "success")
+        if model is None:
+            return
+        for generations in response.generations:
+            for generation in generations:
+                usage_metadata = getattr(
+                    getattr(generation, "message", None), "usage_metadata", None
+                )
+                if usage_metadata:
+                    LLM_TOKENS.labels(model, "input").observe(
+                        usage_metadata["input_tokens"]
+                    )
+                    LLM_TOKENS.labels(model, "output").observe(
+                        usage_metadata["output_tokens"]
+                    )
+
+    def on_llm_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self.__end_llm_call(run_id, "error")
+
+    def __end_llm_call(self, run_id: UUID, status: str) -> str | None:
+        self.__first_tokens.discard(run_id)
+        llm_call = self.__llm_calls.pop(run_id, None)
+        if llm_call is None:
+            return None
+        start, model = llm_call
+        LLM_CALL_DURATION.labels(model, status).observe(time.perf_counter() - start)
+        return model
+
+
+class AppStateCollector(Collector):
+    """
+    Exposes the statistics of the caches of the application as gauges.
+    """
+
+    def __init__(self, state):
+        self.state = state
+
+    def collect(self):
+        gauge = GaugeMetricFamily(
+            f"{NAMESPACE}_cache",
+            "Statistics of the caches of the application",
+            labels=["cache", "stat"],
+        )
+        for cache, info in self.__get_caches_info().items():
+            for stat, value in info.items():
+                gauge.add_metric([cache, stat], float(value))
+        yield gauge
+
+    def __get_caches_info(self) -> dict[str, dict[str, int | float]]:
+        caches = {}
+        agent_factory = getattr(self.state, "agent_factory", None)
+        if agent_factory is not None:
+            if agent_factory.agents_cache:
+                caches["agents"] = agent_factory.agents_cache.info
+            if agent_factory.sparql_cache:
+                caches["sparql"] = agent_factory.sparql_cache.info
+        for cache, attribute in (
+            ("startup", "startup_cache"),
+            ("explain", "explain_index"),
+            ("obo_tokens", "obo_token_provider"),
+        ):
+            value = getattr(self.state, attribute, None)
+            if value is not None:
+                caches[cache] = value.info
+        return caches
+
+
+def generate_metrics(state) -> bytes:
+    """
+    Returns the metrics in the Prometheus text format.
+    If the environment variable `PROMETHEUS_MULTIPROC_DIR` is set, the metrics
+    of all worker processes are aggregated, except for the cache statistics,
+    which are of the current worker.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    app_state_registry = CollectorRegistry()
+    app_state_registry.register(AppStateCollector(state))
+    return generate_latest(registry) + generate_latest(app_state_registry)
@@ -1,8 +1,12 @@
+import time
 import uuid
 from contextvars import ContextVar
 
 from fastapi import FastAPI, Request
 
+from talk2powersystemllm.app.server.metrics import HTTP_REQUEST_DURATION
+from talk2powersystemllm.tracing import set_attributes, span
+
 CTX_REQUEST: ContextVar[str | None] = ContextVar("request", default=None)
 
 
@@ -12,8 +16,43 @@ def setup_middleware(fastapi_app: FastAPI):
         request_id = request.headers.get("X-Request-Id", str(uuid.uuid4()))
         token = CTX_REQUEST.set(request_id)
         try:
-            response = await call_next(request)
+            with span(
+                f"{request.method} {request.url.path}",
+                {
+                    "http.request.method": request.method,
+                    "url.path": request.url.path,
+                    "request.id": request_id,
+                },
+            ) as current_span:
+                response = await call_next(request)
+                route = request.scope.get("route")
+                if current_span and route:
+                    current_span.update_name(f"{request.method} {route.path}")
+                set_attributes(
+                    current_span,
+                    {
+                        "http.route": route.path if route else None,
+                        "http.response.status_code": response.status_code,
+                    },
+                )
             response.headers["X-Request-Id"] = request_id
             return response
         finally:
             CTX_REQUEST.reset(token)
+
+    @fastapi_app.middleware("http")
+    async def record_request_duration(request: Request, call_next):
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            route = request.scope.get("route")
+            HTTP_REQUEST_DURATION.labels(
+                request.method,
+                # the path template, e.g. /rest/chat/diagrams/{filename}
+                route.path if route else "unmatched",
+                str(status),
+            ).observe(time.perf_counter() - start)
@@ -1,6 +1,6 @@
 import logging
 import time
-from typing import Annotated
+from typing import Annotated, AsyncIterator
 
 from fastapi import (
     APIRouter,
@@ -10,14 +10,18 @@ from fastapi import (
     Request,
 )
 from langgraph.graph.state import CompiledStateGraph
-from starlette.responses import FileResponse
+from pydantic import BaseModel
+from starlette.responses import FileResponse, StreamingResponse
 
 from talk2powersystemllm.agent import Talk2PowerSystemAgentFactory
 from talk2powersystemllm.app.models import (
     ChatRequest,
     ChatResponse,
+    ChatStreamEvent,
     ExplainRequest,
     ExplainResponse,
+    Graphic,
+    StreamError,
     SvgGraphic,
     VizGraphGraphic,
 )
@@ -26,13 +30,18 @@ from talk2powersystemllm.app.server.dependencies import (
     conditional_security,
     get_agent_factory,
     get_chat_agent,
+    get_explain_index,
     get_llm_callbacks,
     get_settings,
 )
+from talk2powersystemllm.app.server.metrics import CHAT_DURATION
+from talk2powersystemllm.app.server.middleware import CTX_REQUEST
 from talk2powersystemllm.app.server.services import (
+    ExplainIndex,
     get_or_create_conversation,
     get_query_methods,
     run_agent_loop,
+    stream_agent_loop,
 )
 from talk2powersystemllm.tools import user_datetime_ctx
 
@@ -115,6 +124,7 @@ async def conversations(
     x_user_datetime: Annotated[str | None, Header()] = None,
     authorization: Annotated[str | None, Header()] = None,
     callbacks: list = Depends(get_llm_callbacks),
+    explain_index: ExplainIndex | None = Depends(get_explain_index),
 ) -> ChatResponse:
     user_datetime_ctx.set(x_user_datetime)
     conversation_id = await get_or_create_conversation(chat_request, agent)
@@ -122,23 +132,129 @@ async def conversations(
     start = time.time()
     try:
         chat_response = await run_agent_loop(
-            agent, conversation_id, chat_request.question, callbacks
+            agent,
+            conversation_id,
+            chat_request.question,
+            callbacks,
+            explain_index=explain_index,
         )
 
         for message in chat_response.messages:
             if message.graphics:
                 for g in message.graphics:
-                    if isinstance(g, SvgGraphic):
-                        g.url = build_diagram_image_url(request, g.url)
-                    elif isinstance(g, VizGraphGraphic):
-                        g.url = build_gdb_visual_graph_url(agent_factory, g.url)
+                    resolve_graphic_url(request, agent_factory, g)
 
         return chat_response
 
     finally:
-        logger.info(
-            f"Conversation {conversation_id}: Elapsed {time.time() - start:.2f}s"
-        )
+        elapsed = time.time() - start
+        CHAT_DURATION.labels("conversations").observe(elapsed)
+        logger.info(f"Conversation {conversation_id}: Elapsed {elapsed:.2f}s")
+
+
+# noinspection PyUnusedLocal
+@router.post(
+    "/conversations/stream",
+    summary="Starts a new conversation or adds message to an existing conversation "
+    "and streams the agent output as Server-Sent Events",
+    description="Emits `delta` events with the answer tokens, `toolCallStart` and "
+    "`toolCallEnd` events for the tool calls, `graphic` events for the diagrams, "
+    "`message` events with each final message and its usage, and a final `done` event "
+    "with the same body as the response of `POST /rest/chat/conversations`. "
+    "If the agent fails after the stream has started, an `error` event is emitted "
+    "with a generic message and the request id, under which the error is logged.",
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "description": "Stream of Server-Sent Events",
+            "content": {"text/event-stream": {}},
+        },
+        400: {
+            "description": "Conversation not found",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "message": 'Conversation with id "thread_bf9b14ec-cf63-4cd7-975a-42fc8dfbb2ab" not found.'
+                    },
+                }
+            },
+        },
+        401: {
+            "description": "Unauthorized",
+            "content": {
+                "application/json": {
+                    "example": {"detail": "Not authenticated"},
+                }
+            },
+        },
+    },
+)
+async def conversations_stream(
+    agent: Annotated[CompiledStateGraph, Depends(get_chat_agent)],
+    agent_factory: Annotated[Talk2PowerSystemAgentFactory, Depends(get_agent_factory)],
+    request: Request,
+    chat_request: ChatRequest,
+    x_request_id: Annotated[str | None, Header()] = None,
+    x_user_datetime: Annotated[str | None, Header()] = None,
+    authorization: Annotated[str | None, Header()] = None,
+    callbacks: list = Depends(get_llm_callbacks),
+    explain_index: ExplainIndex | None = Depends(get_explain_index),
+) -> StreamingResponse:
+    conversation_id = await get_or_create_conversation(chat_request, agent)
+    # the response body is streamed after the request middleware has returned
+    request_id = CTX_REQUEST.get()
+
+    async def server_sent_events() -> AsyncIterator[str]:
+        user_datetime_ctx.set(x_user_datetime)
+        CTX_REQUEST.set(request_id)
+        start = time.time()
+        try:
+            async for event, payload in stream_agent_loop(
+                agent,
+                conversation_id,
+                chat_request.question,
+                callbacks,
+                stream_tokens=True,
+                explain_index=explain_index,
+            ):
+                # The graphics in the `message` and `done` events are the same objects
+                # as the ones already sent with the `graphic` events.
+                if event == ChatStreamEvent.GRAPHIC:
+                    resolve_graphic_url(request, agent_factory, payload)
+                yield to_server_sent_event(event, payload)
+        except Exception:
+            logger.exception(f"Conversation {conversation_id}: Streaming failed")
+            yield to_server_sent_event(
+                ChatStreamEvent.ERROR,
+                StreamError(
+                    message="The agent failed to answer the question",
+                    requestId=request_id,
+                ),
+            )
+        finally:
+            elapsed = time.time() - start
+            CHAT_DURATION.labels("conversations_stream").observe(elapsed)
+            logger.info(f"Conversation {conversation_id}: Elapsed {elapsed:.2f}s")
+
+    return StreamingResponse(
+        server_sent_events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def to_server_sent_event(event: ChatStreamEvent, payload: BaseModel) -> str:
+    data = payload.model_dump_json(by_alias=True, exclude_none=True)
+    return f"event: {event.value}\ndata: {data}\n\n"
+
+
+def resolve_graphic_url(
+    request: Request, agent_factory: Talk2PowerSystemAgentFactory, graphic: Graphic
+) -> None:
+    if isinstance(graphic, SvgGraphic):
+        graphic.url = build_diagram_image_url(request, graphic.url)
+    elif isinstance(graphic, VizGraphGraphic):
+        graphic.url = build_gdb_visual_graph_url(agent_factory, graphic.url)
 
 
 def build_diagram_image_url(request: Request, filename: str) -> str:
@@ -192,12 +308,15 @@ def build_gdb_visual_graph_url(
 async def explain(
     explain_request: ExplainRequest,
     agent_factory: Annotated[Talk2PowerSystemAgentFactory, Depends(get_agent_factory)],
+    explain_index: Annotated[ExplainIndex | None, Depends(get_explain_index)],
     x_request_id: Annotated[str | None, Header()] = None,
 ) -> ExplainResponse:
     conversation_id = explain_request.conversation_id
     message_id = explain_request.message_id
 
-    query_methods = await get_query_methods(agent_factory, conversation_id, message_id)
+    query_methods = await get_query_methods(
+        agent_factory, conversation_id, message_id, explain_index
+    )
 
     return ExplainResponse(
         conversationId=conversation_id,
@@ -0,0 +1,22 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Header, Request, Response
+from prometheus_client import CONTENT_TYPE_LATEST
+
+from talk2powersystemllm.app.server.metrics import generate_metrics
+
+router = APIRouter(tags=["Metrics"])
+
+
+# noinspection PyUnusedLocal
+@router.get(
+    "/metrics",
+    summary="Returns the metrics of the application in the Prometheus text format",
+    response_class=Response,
+)
+async def metrics(
+    request: Request, x_request_id: Annotated[str | None, Header()] = None
+):
+    return Response(
+        content=generate_metrics(request.app.state), media_type=CONTENT_TYPE_LATEST
+    )
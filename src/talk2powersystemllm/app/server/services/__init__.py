@@ -1,6 +1,11 @@
 from .about_service import update_about_info
-from .auth_service import verify_jwt
-from .chat_service import get_or_create_conversation, run_agent_loop
+from .auth_service import JwksCache, JwtVerifier
+from .chat_service import (
+    get_or_create_conversation,
+    run_agent_loop,
+    stream_agent_loop,
+)
+from .explain_index import ExplainIndex
 from .explain_service import get_query_methods
 from .gtg_service import update_gtg_info
 from .healthchecks import (
@@ -10,13 +15,21 @@ from .healthchecks import (
     LLMHealthchecker,
     RedisHealthchecker,
 )
-from .redis_service import create_redis_client
+from .obo_token_provider import OboTokenProvider
+from .redis_service import (
+    create_redis_client,
+    create_redis_saver,
+    create_sync_redis_client,
+)
 
 __all__ = [
     "update_about_info",
-    "verify_jwt",
+    "JwksCache",
+    "JwtVerifier",
     "get_or_create_conversation",
     "run_agent_loop",
+    "stream_agent_loop",
+    "ExplainIndex",
     "get_query_methods",
     "update_gtg_info",
     "CogniteHealthchecker",
@@ -24,5 +37,8 @@ __all__ = [
     "HealthChecks",
     "LLMHealthchecker",
     "RedisHealthchecker",
+    "OboTokenProvider",
     "create_redis_client",
+    "create_redis_saver",
+    "create_sync_redis_client",
 ]
@@ -6,7 +6,6 @@ import yaml
 from fastapi import FastAPI
 from importlib_resources import files
 from rdflib import Namespace, Variable
-from ttyg.graphdb import GraphDB
 
 from talk2powersystemllm.agent import Talk2PowerSystemAgentFactory
 from talk2powersystemllm.app.models import (
@@ -18,6 +17,7 @@ from talk2powersystemllm.app.models import (
     AboutLLMInfo,
     AboutOntologyInfo,
 )
+from talk2powersystemllm.graphdb import AsyncGraphDB
 
 logger = logging.getLogger(__name__)
 
@@ -51,13 +51,29 @@ async def update_about_info(fastapi_app: FastAPI) -> None:
                 agent=get_about_agent(fastapi_app),
                 backend=get_about_backend(fastapi_app),
             )
+
+        update_sparql_cache_version(fastapi_app, datasets, graphdb)
     except Exception:
         logger.exception("Failed to update about info")
 
 
+def update_sparql_cache_version(
+    fastapi_app: FastAPI, datasets: list[AboutDatasetInfo], graphdb: AboutGraphDBInfo
+) -> None:
+    sparql_cache = fastapi_app.state.agent_factory.sparql_cache
+    if not sparql_cache:
+        return
+
+    dataset_dates = sorted(f"{dataset.uri}={dataset.date}" for dataset in datasets)
+    sparql_cache.update_version(
+        "|".join([str(graphdb.number_of_triples), *dataset_dates])
+    )
+    logger.info(f"SPARQL cache {sparql_cache.info}")
+
+
 async def get_about_ontologies(fastapi_app: FastAPI) -> list[AboutOntologyInfo]:
     agent_factory = fastapi_app.state.agent_factory
-    query_results, _ = agent_factory.graphdb_client.eval_sparql_query(
+    query_results, _ = await agent_factory.async_graphdb_client.eval_sparql_query(
         agent_factory.graphdb_repository_id, ONTOLOGIES_QUERY, validation=False
     )
     ontologies: list[AboutOntologyInfo] = []
@@ -81,7 +97,7 @@ async def get_about_ontologies(fastapi_app: FastAPI) -> list[AboutOntologyInfo]:
 
 async def get_about_datasets(fastapi_app: FastAPI) -> list[AboutDatasetInfo]:
     agent_factory = fastapi_app.state.agent_factory
-    query_results, _ = agent_factory.graphdb_client.eval_sparql_query(
+    query_results, _ = await agent_factory.async_graphdb_client.eval_sparql_query(
         agent_factory.graphdb_repository_id, DATASETS_QUERY, validation=False
     )
     datasets: list[AboutDatasetInfo] = []
@@ -102,11 +118,19 @@ async def get_about_datasets(fastapi_app: FastAPI) -> list[AboutDatasetInfo]:
 
 async def get_about_graphdb(fastapi_app: FastAPI) -> AboutGraphDBInfo:
     agent_factory: Talk2PowerSystemAgentFactory = fastapi_app.state.agent_factory
-    graphdb_client: GraphDB = agent_factory.graphdb_client
+    graphdb_client: AsyncGraphDB = agent_factory.async_graphdb_client
     graphdb_repository_id: str = agent_factory.graphdb_repository_id
 
-    query_results, _ = graphdb_client.eval_sparql_query(
-        graphdb_repository_id, GRAPHDB_QUERY, validation=False
+    (
+        (query_results, _),
+        autocomplete_status,
+        rdf_rank_status,
+    ) = await asyncio.gather(
+        graphdb_client.eval_sparql_query(
+            graphdb_repository_id, GRAPHDB_QUERY, validation=False
+        ),
+        graphdb_client.get_autocomplete_status(graphdb_repository_id),
+        graphdb_client.get_rdf_rank_status(graphdb_repository_id),
     )
     onto = Namespace("http://www.ontotext.com/")
 
@@ -120,10 +144,8 @@ async def get_about_graphdb(fastapi_app: FastAPI) -> AboutGraphDBInfo:
         version=get_object(onto.SI_has_Revision),
         numberOfExplicitTriples=get_object(onto.SI_number_of_explicit_triples),
         numberOfTriples=get_object(onto.SI_number_of_triples),
-        autocompleteIndexStatus=graphdb_client.get_autocomplete_status(
-            graphdb_repository_id
-        ),
-        rdfRankStatus=graphdb_client.get_rdf_rank_status(graphdb_repository_id),
+        autocompleteIndexStatus=autocomplete_status,
+        rdfRankStatus=rdf_rank_status,
     )
 
 
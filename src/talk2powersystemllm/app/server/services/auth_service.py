@@ -1,72 +1,202 @@
+import asyncio
+import hashlib
 import logging
+import time
 
-import requests
-from cachetools import TTLCache
+import httpx
+from cachetools import TLRUCache
 from fastapi import HTTPException
-from jose import ExpiredSignatureError, JWTError, jwt
-from jose.exceptions import JWTClaimsError
 
-from talk2powersystemllm.app.server.config import AppSettings
+from talk2powersystemllm.app.server.config import SecuritySettings
+from talk2powersystemllm.tracing import set_attributes, span
 
 logger = logging.getLogger(__name__)
 
 
-def get_jwks_uri(settings: AppSettings) -> str:
-    try:
-        oid_config = requests.get(settings.security.oidc_discovery_url)
-        oid_config.raise_for_status()
-    except requests.exceptions.HTTPError:
-        logger.exception(
-            f"Failed to fetch OpenID Configuration from url {settings.security.oidc_discovery_url}"
-        )
-        raise HTTPException(
-            status_code=500, detail="Fail to fetch OpenID Configuration"
-        )
+class JwksCache:
+    """
+    The public keys of the issuer, obtained from the OpenID Configuration endpoint,
+    indexed by key id.
+
+    Only one fetch runs at a time, and the concurrent requests wait for it.
+    After `ttl` seconds the keys are refreshed in the background, while the stale keys
+    are still used. An unknown key id triggers a refresh, at most once every
+    `min_refresh_interval` seconds, in case the issuer has rotated the keys.
+    """
+
+    def __init__(
+        self,
+        oidc_discovery_url: str,
+        ttl: int,
+        min_refresh_interval: int,
+        timer=time.monotonic,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self.oidc_discovery_url = oidc_discovery_url
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.__timer = timer
+        self.__transport = transport
+        self.__jwks_uri: str | None = None
+        self.__keys: dict[str, dict] = {}
+        self.__fetched_at: float | None = None
+        self.__refresh_started_at: float | None = None
+        self.__refresh_task: asyncio.Task | None = None
 
-    json_response_body = oid_config.json()
-    if "jwks_uri" not in json_response_body:
-        raise HTTPException(
-            status_code=500, detail="jwks_uri not found in the OpenID Configuration"
+    async def get_key(self, kid: str | None) -> dict:
+        if self.__fetched_at is None:
+            await self.refresh()
+        elif self.__timer() - self.__fetched_at >= self.ttl and self.__can_refresh():
+            self.__start_refresh()
+
+        key = self.__keys.get(kid)
+        if key is None and self.__can_refresh():
+            logger.info(f"Unknown key id {kid}, refreshing the issuer keys")
+            await self.refresh()
+            key = self.__keys.get(kid)
+        if key is None:
+            raise HTTPException(status_code=401, detail=f"Unknown key id {kid}")
+        return key
+
+    async def refresh(self) -> None:
+        """
+        Fetches the keys, or waits for the fetch in progress.
+        """
+        # shielded, so a cancelled request doesn't cancel the fetch for the others
+        await asyncio.shield(self.__start_refresh())
+
+    def __can_refresh(self) -> bool:
+        return (
+            self.__refresh_started_at is None
+            or self.__timer() - self.__refresh_started_at >= self.min_refresh_interval
         )
 
-    return json_response_body["jwks_uri"]
+    def __start_refresh(self) -> asyncio.Task:
+        if self.__refresh_task is None or self.__refresh_task.done():
+            self.__refresh_started_at = self.__timer()
+            self.__refresh_task = asyncio.create_task(self.__fetch())
+            self.__refresh_task.add_done_callback(self.__log_background_error)
+        return self.__refresh_task
 
+    def __log_background_error(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() and self.__fetched_at:
+            logger.warning(
+                f"Failed to refresh the issuer keys, using the stale keys: "
+                f"{task.exception()}"
+            )
 
-def get_jwks_keys(settings: AppSettings, jwks_cache: TTLCache) -> dict:
-    if "keys" in jwks_cache:
-        return jwks_cache["keys"]
+    async def __fetch(self) -> None:
+        with span("jwks.fetch") as current_span:
+            async with httpx.AsyncClient(
+                timeout=10, transport=self.__transport
+            ) as client:
+                if self.__jwks_uri is None:
+                    self.__jwks_uri = await self.__get_jwks_uri(client)
+                set_attributes(current_span, {"url.full": self.__jwks_uri})
+                try:
+                    response = await client.get(self.__jwks_uri)
+                    response.raise_for_status()
+                except httpx.HTTPError:
+                    logger.exception(
+                        f"Failed to get issuer keys from {self.__jwks_uri}"
+                    )
+                    # the keys may have moved, so the discovery is repeated
+                    self.__jwks_uri = None
+                    raise HTTPException(
+                        status_code=500, detail="Fail to get issuer keys"
+                    )
 
-    jwks_uri = get_jwks_uri(settings)
-    try:
-        response = requests.get(jwks_uri)
-        response.raise_for_status()
+            self.__keys = {key.get("kid"): key for key in response.json()["keys"]}
+            set_attributes(current_span, {"jwks.keys": len(self.__keys)})
+        self.__fetched_at = self.__timer()
 
-        keys = response.json()
+    async def __get_jwks_uri(self, client: httpx.AsyncClient) -> str:
+        try:
+            oid_config = await client.get(self.oidc_discovery_url)
+            oid_config.raise_for_status()
+        except httpx.HTTPError:
+            logger.exception(
+                f"Failed to fetch OpenID Configuration from url {self.oidc_discovery_url}"
+            )
+            raise HTTPException(
+                status_code=500, detail="Fail to fetch OpenID Configuration"
+            )
 
-        jwks_cache["keys"] = keys  # Save to the injected cache
-        return keys
-    except requests.exceptions.HTTPError:
-        logger.exception(f"Failed to get issuer keys from {jwks_uri}")
-        raise HTTPException(status_code=500, detail="Fail to get issuer keys")
+        json_response_body = oid_config.json()
+        if "jwks_uri" not in json_response_body:
+            raise HTTPException(
+                status_code=500, detail="jwks_uri not found in the OpenID Configuration"
+            )
 
+        return json_response_body["jwks_uri"]
 
-def verify_jwt(settings: AppSettings, jwks_cache: TTLCache, token: str):
-    jwks_keys = get_jwks_keys(settings, jwks_cache)
-    try:
-        return jwt.decode(
-            token,
-            jwks_keys,
-            audience=settings.security.audience,
-            issuer=settings.security.issuer,
-        )
-    except ExpiredSignatureError as e:
-        logger.warning("Expired Signature", exc_info=e)
-        raise HTTPException(status_code=401, detail=f"Expired Signature: {str(e)}")
-    except JWTClaimsError as e:
-        logger.warning("Any claim is invalid in any way", exc_info=e)
-        raise HTTPException(
-            status_code=401, detail=f"Any claim is invalid in any way: {str(e)}"
+
+class JwtVerifier:
+    """
+    Verifies the security tokens with the keys from the `JwksCache`.
+    The claims of the verified tokens are cached by token hash until they expire,
+    so the repeated requests with the same token skip the signature verification.
+    """
+
+    def __init__(
+        self,
+        security_settings: SecuritySettings,
+        jwks_cache: JwksCache,
+        cache_size: int,
+        timer=time.time,
+    ):
+        self.security_settings = security_settings
+        self.jwks_cache = jwks_cache
+        self.__verified_tokens = TLRUCache(
+            maxsize=cache_size, ttu=self.__ttu, timer=timer
         )
-    except JWTError as e:
-        logger.warning("Signature is invalid", exc_info=e)
-        raise HTTPException(status_code=401, detail=f"Signature is invalid: {str(e)}")
+
+    @staticmethod
+    def __ttu(_key: str, claims: dict, _now: float) -> float:
+        return claims["exp"]
+
+    async def verify(self, token: str) -> dict:
+        token_hash = hashlib.sha256(token.encode("utf-8")).hexdigest()
+        claims = self.__verified_tokens.get(token_hash)
+        if claims is not None:
+            return claims
+
+        claims = await self.__verify(token)
+        if isinstance(claims.get("exp"), (int, float)):
+            self.__verified_tokens[token_hash] = claims
+        return claims
+
+    async def __verify(self, token: str) -> dict:
+        # imported only if security is enabled
+        from jose import ExpiredSignatureError, JWTError, jwt
+        from jose.exceptions import JWTClaimsError
+
+        try:
+            kid = jwt.get_unverified_header(token).get("kid")
+        except JWTError as e:
+            logger.warning("Signature is invalid", exc_info=e)
+            raise HTTPException(
+                status_code=401, detail=f"Signature is invalid: {str(e)}"
+            )
+
+        key = await self.jwks_cache.get_key(kid)
+        try:
+            return jwt.decode(
+                token,
+                key,
+                audience=self.security_settings.audience,
+                issuer=self.security_settings.issuer,
+            )
+        except ExpiredSignatureError as e:
+            logger.warning("Expired Signature", exc_info=e)
+            raise HTTPException(status_code=401, detail=f"Expired Signature: {str(e)}")
+        except JWTClaimsError as e:
+            logger.warning("Any claim is invalid in any way", exc_info=e)
+            raise HTTPException(
+                status_code=401, detail=f"Any claim is invalid in any way: {str(e)}"
+            )
+        except JWTError as e:
+            logger.warning("Signature is invalid", exc_info=e)
+            raise HTTPException(
+                status_code=401, detail=f"Signature is invalid: {str(e)}"
+            )
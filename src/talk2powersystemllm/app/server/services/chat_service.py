@@ -1,22 +1,35 @@
 import logging
 import uuid
+from typing import AsyncIterator
 
+from langchain_core.messages import AIMessageChunk, AnyMessage
 from langchain_core.runnables import RunnableConfig
 from langgraph.graph.state import CompiledStateGraph
+from pydantic import BaseModel
 
 from talk2powersystemllm.app.models import (
     ChatResponse,
+    ChatStreamEvent,
     Graphic,
     Message,
+    MessageDelta,
     SvgGraphic,
+    ToolCallEnd,
+    ToolCallStart,
     Usage,
     VizGraphGraphic,
 )
 from talk2powersystemllm.app.server.exceptions import ConversationNotFound
+from talk2powersystemllm.app.server.logging_conf import LazyPreview
+from talk2powersystemllm.app.server.services.explain_index import ExplainIndex
+from talk2powersystemllm.middleware import COMPACTED_PROMPT_TOKENS
 from talk2powersystemllm.tools import GraphDBVisualGraphArtifact, SvgArtifact
 
 logger = logging.getLogger(__name__)
 
+# characters of the texts in the logged outputs of the agent
+LOG_PREVIEW_CHARS = 500
+
 
 async def get_or_create_conversation(chat_request, agent: CompiledStateGraph) -> str:
     conversation_id = chat_request.conversation_id
@@ -33,23 +46,89 @@ async def get_or_create_conversation(chat_request, agent: CompiledStateGraph) ->
     return conversation_id
 
 
+def get_text_content(raw_content: str | list) -> str:
+    if isinstance(raw_content, str):
+        return raw_content
+    elif isinstance(raw_content, list):
+        return "".join(
+            [
+                content["text"]
+                for content in raw_content
+                if isinstance(content, dict) and content.get("type") == "text"
+            ]
+        )
+    return ""
+
+
 async def run_agent_loop(
-    agent: CompiledStateGraph, conversation_id: str, question: str, callbacks: list
+    agent: CompiledStateGraph,
+    conversation_id: str,
+    question: str,
+    callbacks: list,
+    explain_index: ExplainIndex | None = None,
 ) -> ChatResponse:
+    chat_response = None
+    async for event, payload in stream_agent_loop(
+        agent, conversation_id, question, callbacks, explain_index=explain_index
+    ):
+        if event == ChatStreamEvent.DONE:
+            chat_response = payload
+    return chat_response
+
+
+async def stream_agent_loop(
+    agent: CompiledStateGraph,
+    conversation_id: str,
+    question: str,
+    callbacks: list,
+    stream_tokens: bool = False,
+    explain_index: ExplainIndex | None = None,
+) -> AsyncIterator[tuple[ChatStreamEvent, BaseModel]]:
+    """
+    Runs the agent and yields the events as they happen.
+    The last event is always `ChatStreamEvent.DONE` with the complete `ChatResponse`.
+    Token deltas are yielded only if `stream_tokens` is True,
+    because this requires streaming from the LLM.
+    The explanations of the final messages are stored in the `explain_index`.
+    """
     messages: list[Message] = []
     graphics: list[Graphic] = []
+    explain_span: list[AnyMessage] = []
+    explain_spans: dict[str, list[AnyMessage]] = {}
     sum_input_tokens, sum_output_tokens, sum_total_tokens = 0, 0, 0
+    sum_cached_input_tokens = sum_compacted_input_tokens = 0
 
     runnable_config = RunnableConfig(
         configurable={"thread_id": conversation_id},
         callbacks=callbacks,
     )
     input_ = {"messages": [{"role": "user", "content": question}]}
+    stream_mode = ["updates", "messages"] if stream_tokens else ["updates"]
     logger.info(f'Conversation {conversation_id}: Input "{question}"')
     # noinspection PyTypeChecker
-    async for output in agent.astream(input_, runnable_config, stream_mode="updates"):
+    async for mode, output in agent.astream(
+        input_, runnable_config, stream_mode=stream_mode
+    ):
+        if mode == "messages":
+            message_chunk, metadata = output
+            if metadata.get("langgraph_node") == "model" and isinstance(
+                message_chunk, AIMessageChunk
+            ):
+                delta = get_text_content(message_chunk.content)
+                if delta:
+                    yield ChatStreamEvent.DELTA, MessageDelta(
+                        id=message_chunk.id, delta=delta
+                    )
+            continue
+
         output = dict(output)
-        logger.info(f"Conversation {conversation_id}: Output {output}")
+        # formatted only if emitted, with the tool outputs truncated
+        logger.info(
+            "Conversation %s: Output %s",
+            conversation_id,
+            LazyPreview(output, LOG_PREVIEW_CHARS),
+            extra={"conversation_id": conversation_id, "verbose": True},
+        )
 
         if "model" in output and "messages" in output["model"]:
             for ai_message in output["model"]["messages"]:
@@ -57,66 +136,93 @@ async def run_agent_loop(
                 sum_input_tokens += usage_metadata["input_tokens"]
                 sum_output_tokens += usage_metadata["output_tokens"]
                 sum_total_tokens += usage_metadata["total_tokens"]
+                sum_cached_input_tokens += usage_metadata.get(
+                    "input_token_details", {}
+                ).get("cache_read", 0)
+                sum_compacted_input_tokens += ai_message.response_metadata.get(
+                    COMPACTED_PROMPT_TOKENS, 0
+                )
 
-                raw_content = ai_message.content
-                text_content = ""
-                if isinstance(raw_content, str):
-                    text_content = raw_content
-                elif isinstance(raw_content, list):
-                    text_content = "".join(
-                        [
-                            content["text"]
-                            for content in raw_content
-                            if content.get("type") == "text"
-                        ]
-                    )
-
+                text_content = get_text_content(ai_message.content)
                 has_tools = bool(ai_message.tool_calls)
 
                 if text_content and not has_tools:
-                    messages.append(
-                        Message(
-                            id=ai_message.id,
-                            message=text_content,
-                            usage=Usage(
-                                promptTokens=sum_input_tokens,
-                                completionTokens=sum_output_tokens,
-                                totalTokens=sum_total_tokens,
-                            ),
-                            graphics=graphics if graphics else None,
-                        )
+                    message = Message(
+                        id=ai_message.id,
+                        message=text_content,
+                        usage=Usage(
+                            promptTokens=sum_input_tokens,
+                            completionTokens=sum_output_tokens,
+                            totalTokens=sum_total_tokens,
+                            cachedPromptTokens=sum_cached_input_tokens or None,
+                            compactedPromptTokens=sum_compacted_input_tokens or None,
+                        ),
+                        graphics=graphics if graphics else None,
                     )
+                    messages.append(message)
+                    explain_spans[ai_message.id] = explain_span
+                    explain_span = []
+                    yield ChatStreamEvent.MESSAGE, message
                     sum_input_tokens = sum_output_tokens = sum_total_tokens = 0
+                    sum_cached_input_tokens = sum_compacted_input_tokens = 0
                     graphics = []
-                elif text_content and has_tools:
-                    logger.info(
-                        f"Conversation {conversation_id}: Model Thought: {text_content}"
+                else:
+                    explain_span.append(ai_message)
+                    if text_content:
+                        logger.info(
+                            f"Conversation {conversation_id}: "
+                            f"Model Thought: {text_content}"
+                        )
+
+                for tool_call in ai_message.tool_calls:
+                    yield ChatStreamEvent.TOOL_CALL_START, ToolCallStart(
+                        id=tool_call["id"],
+                        name=tool_call["name"],
+                        args=tool_call["args"],
                     )
 
         elif "tools" in output and "messages" in output["tools"]:
             for tool_message in output["tools"]["messages"]:
+                explain_span.append(tool_message)
+                yield ChatStreamEvent.TOOL_CALL_END, ToolCallEnd(
+                    id=tool_message.tool_call_id,
+                    name=tool_message.name,
+                    status=tool_message.status,
+                )
+
+                graphic = None
                 if tool_message.status == "success" and tool_message.artifact:
                     if isinstance(tool_message.artifact, SvgArtifact):
-                        graphics.append(
-                            SvgGraphic(type="svg", url=tool_message.artifact.link)
-                        )
+                        graphic = SvgGraphic(type="svg", url=tool_message.artifact.link)
                     elif isinstance(tool_message.artifact, GraphDBVisualGraphArtifact):
-                        graphics.append(
-                            VizGraphGraphic(
-                                type="vizGraph", url=tool_message.artifact.link
-                            )
+                        graphic = VizGraphGraphic(
+                            type="vizGraph", url=tool_message.artifact.link
                         )
+                if graphic:
+                    graphics.append(graphic)
+                    yield ChatStreamEvent.GRAPHIC, graphic
+
+    if explain_index:
+        await explain_index.put(conversation_id, explain_spans)
 
     total_input_tokens = sum([message.usage.prompt_tokens for message in messages])
     total_output_tokens = sum([message.usage.completion_tokens for message in messages])
     total_total_tokens = sum([message.usage.total_tokens for message in messages])
+    total_cached_input_tokens = sum(
+        [message.usage.cached_prompt_tokens or 0 for message in messages]
+    )
+    total_compacted_input_tokens = sum(
+        [message.usage.compacted_prompt_tokens or 0 for message in messages]
+    )
 
-    return ChatResponse(
+    yield ChatStreamEvent.DONE, ChatResponse(
         id=conversation_id,
         messages=messages,
         usage=Usage(
             completionTokens=total_output_tokens,
             promptTokens=total_input_tokens,
             totalTokens=total_total_tokens,
+            cachedPromptTokens=total_cached_input_tokens or None,
+            compactedPromptTokens=total_compacted_input_tokens or None,
         ),
     )
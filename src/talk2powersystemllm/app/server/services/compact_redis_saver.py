@@ -0,0 +1,432 @@
+import contextlib
+import logging
+import time
+import zlib
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Literal, Sequence
+
+import zstandard
+from cachetools import LRUCache, TTLCache
+from langchain_core.messages import ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+from langgraph.checkpoint.redis import AsyncRedisSaver
+from redis.asyncio import Redis, RedisCluster
+
+from talk2powersystemllm.app.server.metrics import (
+    CHECKPOINT_BYTES,
+    CHECKPOINT_DURATION,
+)
+from talk2powersystemllm.tracing import set_attributes, span
+
+logger = logging.getLogger(__name__)
+
+Compression = Literal["zstd", "zlib"]
+
+OFFLOADED_PAYLOAD = "offloaded_payload"
+MISSING_PAYLOAD_CONTENT = "Error: The result of this tool call is no longer available"
+
+# sizes of the values serialized or deserialized in a checkpoint operation
+_serialized_sizes: ContextVar[list[int] | None] = ContextVar(
+    "serialized_sizes", default=None
+)
+# whether the values serialized in the current context are compressed
+_compress_values: ContextVar[bool] = ContextVar("compress_values", default=False)
+
+
+@contextlib.contextmanager
+def compressed_values():
+    """Compresses the values serialized by `CompressingSerializer` in the block."""
+    token = _compress_values.set(True)
+    try:
+        yield
+    finally:
+        _compress_values.reset(token)
+
+
+def get_codec(
+    compression: Compression,
+) -> tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    """
+    Returns the compress and decompress functions for the compression.
+    """
+    if compression == "zstd":
+        return (
+            lambda data: zstandard.compress(data, 3),
+            zstandard.decompress,
+        )
+    if compression == "zlib":
+        return lambda data: zlib.compress(data, 6), zlib.decompress
+    raise ValueError(f"Unsupported compression {compression}")
+
+
+class CompressingSerializer:
+    """
+    Checkpoint serializer, which compresses the values serialized by another
+    serializer within `compressed_values()`, if they are larger than `min_size`
+    bytes. The other values are serialized unchanged, e.g. the checkpoints, which
+    `AsyncRedisSaver` loads back and stores inline as RedisJSON documents.
+    The compression is appended to the type of the value, e.g. `msgpack+zstd`,
+    so the values stored without compression can still be loaded.
+    """
+
+    def __init__(self, serde, compression: Compression | None, min_size: int):
+        self.serde = serde
+        self.compression = compression
+        self.min_size = min_size
+        self.__codecs = {}
+        if compression:
+            self.__codecs[compression] = get_codec(compression)
+
+    def dumps_typed(self, obj: Any) -> tuple[str, bytes]:
+        type_, data = self.serde.dumps_typed(obj)
+        if self.compression and _compress_values.get() and len(data) >= self.min_size:
+            compress, _ = self.__codecs[self.compression]
+            type_, data = f"{type_}+{self.compression}", compress(data)
+        sizes = _serialized_sizes.get()
+        if sizes is not None:
+            sizes.append(len(data))
+        return type_, data
+
+    def loads_typed(self, data: tuple[str, bytes]) -> Any:
+        type_, payload = data
+        sizes = _serialized_sizes.get()
+        if sizes is not None:
+            sizes.append(len(payload))
+        base_type, _, compression = type_.rpartition("+")
+        if base_type and compression in ("zstd", "zlib"):
+            if compression not in self.__codecs:
+                self.__codecs[compression] = get_codec(compression)
+            _, decompress = self.__codecs[compression]
+            type_, payload = base_type, decompress(payload)
+        return self.serde.loads_typed((type_, payload))
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.serde, name)
+
+
+class CompactRedisSaver(AsyncRedisSaver):
+    """
+    Redis checkpointer, which stores the conversations in less memory,
+    and records the latency and the bytes of the reads and writes as metrics
+    and spans.
+
+    The pending writes and the offloaded payloads are compressed,
+    if `compression` is set, while the checkpoints are stored as RedisJSON
+    documents without compression. The content and the artifact of the tool
+    messages larger than
+    `offload_threshold` bytes are stored once in separate keys, which expire
+    with the conversation, and the checkpoints reference them,
+    instead of rewriting them on each step. They are loaded back on read.
+    If `stats` is set, the checkpoints and the bytes stored per conversation
+    are counted in `checkpoint_stats:{thread_id}`.
+    """
+
+    def __init__(
+        self,
+        *,
+        redis_client: Redis | RedisCluster,
+        ttl: dict[str, Any] | None = None,
+        compression: Compression | None = None,
+        compression_min_size: int = 1024,
+        offload_threshold: int | None = None,
+        stats: bool = False,
+        **kwargs,
+    ):
+        super().__init__(redis_client=redis_client, ttl=ttl, **kwargs)
+        self.redis_client = redis_client
+        self.ttl_seconds = int(ttl["default_ttl"] * 60) if ttl else None
+        self.refresh_on_read = bool(ttl and ttl.get("refresh_on_read"))
+        self.offload_threshold = offload_threshold
+        self.stats = stats
+        self.serde = CompressingSerializer(
+            self.serde, compression, compression_min_size
+        )
+        # whether the payload of a tool message is offloaded by this process,
+        # or is smaller than the threshold, so each message is measured once.
+        # The keys are forgotten well before they expire in Redis,
+        # so that the expired payloads are rewritten
+        self.__offloaded_keys = (
+            TTLCache(maxsize=10_000, ttl=self.ttl_seconds / 2)
+            if self.ttl_seconds
+            else LRUCache(maxsize=10_000)
+        )
+
+    @staticmethod
+    def payload_key(thread_id: str, tool_call_id: str) -> str:
+        # the hash tag keeps the keys of a conversation in the same cluster slot
+        return f"checkpoint_payload:{{{thread_id}}}:{tool_call_id}"
+
+    @staticmethod
+    def stats_key(thread_id: str) -> str:
+        return f"checkpoint_stats:{{{thread_id}}}"
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        channel_values = checkpoint.get("channel_values") or {}
+        offloaded_bytes = 0
+        if "messages" in channel_values:
+            messages, offloaded_bytes = await self.__offload(
+                thread_id, channel_values["messages"]
+            )
+            checkpoint = {
+                **checkpoint,
+                "channel_values": {**channel_values, "messages": messages},
+            }
+
+        sizes = []
+        token = _serialized_sizes.set(sizes)
+        start = time.perf_counter()
+        with self.__span("put", thread_id) as current_span:
+            try:
+                next_config = await super().aput(
+                    config, checkpoint, metadata, new_versions
+                )
+            finally:
+                _serialized_sizes.reset(token)
+                self.__observe("put", start, sizes, current_span)
+        await self.__add_stats(
+            thread_id,
+            {
+                "checkpoints": 1,
+                "checkpoint_bytes": sum(sizes),
+                "offloaded_bytes": offloaded_bytes,
+            },
+        )
+        return next_config
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        offloaded_bytes = 0
+        compact_writes = []
+        for channel, value in writes:
+            if channel == "messages":
+                value, size = await self.__offload(thread_id, value)
+                offloaded_bytes += size
+            compact_writes.append((channel, value))
+
+        sizes = []
+        token = _serialized_sizes.set(sizes)
+        start = time.perf_counter()
+        with self.__span("put_writes", thread_id) as current_span:
+            try:
+                with compressed_values():
+                    await super().aput_writes(
+                        config, compact_writes, task_id, task_path
+                    )
+            finally:
+                _serialized_sizes.reset(token)
+                self.__observe("put_writes", start, sizes, current_span)
+        await self.__add_stats(
+            thread_id,
+            {"write_bytes": sum(sizes), "offloaded_bytes": offloaded_bytes},
+        )
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        sizes = []
+        token = _serialized_sizes.set(sizes)
+        start = time.perf_counter()
+        thread_id = config["configurable"].get("thread_id")
+        with self.__span("get", thread_id) as current_span:
+            try:
+                checkpoint_tuple = await super().aget_tuple(config)
+            finally:
+                _serialized_sizes.reset(token)
+                self.__observe("get", start, sizes, current_span)
+        if checkpoint_tuple is None:
+            return None
+        return await self.__load_offloaded(checkpoint_tuple)
+
+    async def alist(
+        self, config: RunnableConfig | None, **kwargs
+    ) -> AsyncIterator[CheckpointTuple]:
+        async for checkpoint_tuple in super().alist(config, **kwargs):
+            yield await self.__load_offloaded(checkpoint_tuple)
+
+    async def astats(self, thread_id: str) -> dict[str, int]:
+        """
+        Returns the number of checkpoints and the bytes stored for the conversation.
+        """
+        stats = await self.redis_client.hgetall(self.stats_key(thread_id))
+        return {
+            (key.decode() if isinstance(key, bytes) else key): int(value)
+            for key, value in stats.items()
+        }
+
+    @staticmethod
+    def __span(operation: str, thread_id: str | None):
+        return span(
+            f"checkpoint.{operation}",
+            {
+                "db.system": "redis",
+                "db.operation.name": operation,
+                "thread_id": thread_id,
+            },
+        )
+
+    @staticmethod
+    def __observe(operation: str, start: float, sizes: list[int], current_span) -> None:
+        CHECKPOINT_DURATION.labels(operation).observe(time.perf_counter() - start)
+        CHECKPOINT_BYTES.labels(operation).observe(sum(sizes))
+        set_attributes(
+            current_span,
+            {"checkpoint.bytes": sum(sizes), "checkpoint.values": len(sizes)},
+        )
+
+    async def __offload(self, thread_id: str, value: Any) -> tuple[Any, int]:
+        if not self.offload_threshold:
+            return value, 0
+        is_list = isinstance(value, list)
+        messages = value if is_list else [value]
+
+        compact_messages, payloads = [], {}
+        for message in messages:
+            if (
+                not isinstance(message, ToolMessage)
+                or OFFLOADED_PAYLOAD in message.additional_kwargs
+            ):
+                compact_messages.append(message)
+                continue
+
+            key = self.payload_key(thread_id, message.tool_call_id)
+            offloaded = self.__offloaded_keys.get(key)
+            if offloaded is None:
+                with compressed_values():
+                    type_, data = self.serde.dumps_typed(
+                        {"content": message.content, "artifact": message.artifact}
+                    )
+                offloaded = len(data) >= self.offload_threshold
+                if offloaded:
+                    payloads[key] = type_.encode("utf-8") + b"\n" + data
+                else:
+                    self.__offloaded_keys[key] = False
+            if not offloaded:
+                compact_messages.append(message)
+                continue
+
+            compact_messages.append(
+                message.model_copy(
+                    update={
+                        "content": "",
+                        "artifact": None,
+                        "additional_kwargs": {
+                            **message.additional_kwargs,
+                            OFFLOADED_PAYLOAD: key,
+                        },
+                    }
+                )
+            )
+
+        if payloads:
+            pipeline = self.redis_client.pipeline(transaction=False)
+            for key, payload in payloads.items():
+                pipeline.set(key, payload, ex=self.ttl_seconds)
+            await pipeline.execute()
+            for key in payloads:
+                self.__offloaded_keys[key] = True
+
+        offloaded_bytes = sum(len(payload) for payload in payloads.values())
+        return (compact_messages if is_list else compact_messages[0]), offloaded_bytes
+
+    async def __load_offloaded(
+        self, checkpoint_tuple: CheckpointTuple
+    ) -> CheckpointTuple:
+        channel_values = checkpoint_tuple.checkpoint.get("channel_values") or {}
+        messages = channel_values.get("messages") or []
+        pending_writes = checkpoint_tuple.pending_writes or []
+
+        keys = {
+            message.additional_kwargs[OFFLOADED_PAYLOAD]
+            for message in messages
+            if isinstance(message, ToolMessage)
+            and OFFLOADED_PAYLOAD in message.additional_kwargs
+        }
+        for _, channel, value in pending_writes:
+            if channel == "messages":
+                for message in value if isinstance(value, list) else [value]:
+                    if (
+                        isinstance(message, ToolMessage)
+                        and OFFLOADED_PAYLOAD in message.additional_kwargs
+                    ):
+                        keys.add(message.additional_kwargs[OFFLOADED_PAYLOAD])
+        if not keys:
+            return checkpoint_tuple
+
+        keys = list(keys)
+        values = await self.redis_client.mget(keys)
+        if self.refresh_on_read and self.ttl_seconds:
+            pipeline = self.redis_client.pipeline(transaction=False)
+            for key in keys:
+                pipeline.expire(key, self.ttl_seconds)
+            await pipeline.execute()
+        payloads = {}
+        for key, value in zip(keys, values):
+            if value is None:
+                # e.g. evicted by Redis, the tool call is kept without its result
+                logger.warning(f"Offloaded checkpoint payload {key} not found")
+                self.__offloaded_keys.pop(key, None)
+                payloads[key] = {"content": MISSING_PAYLOAD_CONTENT, "artifact": None}
+                continue
+            type_, data = value.split(b"\n", 1)
+            payloads[key] = self.serde.loads_typed((type_.decode("utf-8"), data))
+
+        def load(value: Any) -> Any:
+            if isinstance(value, list):
+                return [load(message) for message in value]
+            if not isinstance(value, ToolMessage):
+                return value
+            key = value.additional_kwargs.get(OFFLOADED_PAYLOAD)
+            if key not in payloads:
+                return value
+            additional_kwargs = dict(value.additional_kwargs)
+            del additional_kwargs[OFFLOADED_PAYLOAD]
+            return value.model_copy(
+                update={**payloads[key], "additional_kwargs": additional_kwargs}
+            )
+
+        checkpoint = checkpoint_tuple.checkpoint
+        if messages:
+            checkpoint = {
+                **checkpoint,
+                "channel_values": {**channel_values, "messages": load(messages)},
+            }
+        return checkpoint_tuple._replace(
+            checkpoint=checkpoint,
+            pending_writes=[
+                (task_id, channel, load(value) if channel == "messages" else value)
+                for task_id, channel, value in pending_writes
+            ],
+        )
+
+    async def __add_stats(self, thread_id: str, stats: dict[str, int]) -> None:
+        if not self.stats:
+            return
+        key = self.stats_key(thread_id)
+        fields = [field for field, value in stats.items() if value]
+        pipeline = self.redis_client.pipeline(transaction=False)
+        for field in fields:
+            pipeline.hincrby(key, field, stats[field])
+        if self.ttl_seconds:
+            pipeline.expire(key, self.ttl_seconds)
+        totals = await pipeline.execute()
+        logger.debug(
+            f"Conversation {thread_id}: Checkpoint storage "
+            f"{dict(zip(fields, totals))}"
+        )
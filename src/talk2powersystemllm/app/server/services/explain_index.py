@@ -0,0 +1,116 @@
+import json
+import logging
+
+from langchain_core.load import dumpd
+from langchain_core.messages import AnyMessage, ToolMessage
+from redis.asyncio import Redis, RedisCluster
+from redis.exceptions import RedisError
+
+from talk2powersystemllm.agent import Talk2PowerSystemAgentFactory
+from talk2powersystemllm.app.models import QueryMethod
+from talk2powersystemllm.app.server.services.explain_service import (
+    get_query_methods_from_messages,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def with_serialized_artifact(message: AnyMessage) -> AnyMessage:
+    """
+    Returns the tool message with the artifact serialized,
+    as it's read from the checkpoints.
+    The artifacts already in this form are kept, because `dumpd` escapes them.
+    """
+    if not isinstance(message, ToolMessage) or message.artifact is None:
+        return message
+    if isinstance(message.artifact, dict):
+        return message
+    return message.model_copy(update={"artifact": dumpd(message.artifact)})
+
+
+class ExplainIndex:
+    """
+    Explanations of the final AI answers, i.e. the tool calls made to produce them,
+    computed when the answers are generated and stored in Redis.
+    There is a single hash per conversation, which expires with the checkpoints,
+    so an explanation is a single read without loading the checkpoint.
+    """
+
+    def __init__(
+        self,
+        redis_client: Redis | RedisCluster,
+        agent_factory: Talk2PowerSystemAgentFactory,
+        ttl: int,
+        refresh_on_read: bool,
+    ):
+        self.redis_client = redis_client
+        self.agent_factory = agent_factory
+        self.ttl = ttl
+        self.refresh_on_read = refresh_on_read
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def info(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+    @staticmethod
+    def key(conversation_id: str) -> str:
+        return f"explain:{conversation_id}"
+
+    async def put(
+        self, conversation_id: str, spans: dict[str, list[AnyMessage]]
+    ) -> None:
+        """
+        Stores the explanations of the final AI messages, given the messages
+        with the tool calls made to produce each of them.
+        """
+        if not spans:
+            return
+        key = self.key(conversation_id)
+        mapping = {}
+        for message_id, messages in spans.items():
+            query_methods = get_query_methods_from_messages(
+                self.agent_factory,
+                [with_serialized_artifact(message) for message in messages],
+            )
+            mapping[message_id] = json.dumps(
+                [
+                    query_method.model_dump(by_alias=True, exclude_unset=True)
+                    for query_method in query_methods
+                ]
+            )
+        try:
+            pipeline = self.redis_client.pipeline(transaction=False)
+            pipeline.hset(key, mapping=mapping)
+            pipeline.expire(key, self.ttl)
+            await pipeline.execute()
+        except RedisError as error:
+            logger.warning(
+                f"Conversation {conversation_id}: "
+                f"Can't write the explanations: {error}"
+            )
+
+    async def get(
+        self, conversation_id: str, message_id: str
+    ) -> list[QueryMethod] | None:
+        """
+        Returns the explanation of the AI message, or None, if it's not stored,
+        e.g. for older conversations.
+        """
+        key = self.key(conversation_id)
+        try:
+            value = await self.redis_client.hget(key, message_id)
+            if value is not None and self.refresh_on_read:
+                await self.redis_client.expire(key, self.ttl)
+        except RedisError as error:
+            logger.warning(
+                f"Conversation {conversation_id}: "
+                f"Can't read the explanations: {error}"
+            )
+            return None
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return [QueryMethod.model_validate(item) for item in json.loads(value)]
@@ -1,4 +1,4 @@
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
 from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
 
@@ -9,15 +9,31 @@ from talk2powersystemllm.app.server.exceptions import (
     MessageNotFound,
 )
 
+if TYPE_CHECKING:
+    from talk2powersystemllm.app.server.services.explain_index import ExplainIndex
+
 
 async def get_query_methods(
     agent_factory: Talk2PowerSystemAgentFactory,
     conversation_id: str,
     message_id: str,
+    explain_index: "ExplainIndex | None" = None,
 ) -> list[QueryMethod]:
+    if explain_index:
+        query_methods = await explain_index.get(conversation_id, message_id)
+        if query_methods is not None:
+            return query_methods
+
+    # conversations started before the explanations were precomputed
     explain_messages = await get_explain_messages(
         agent_factory, conversation_id, message_id
     )
+    return get_query_methods_from_messages(agent_factory, explain_messages)
+
+
+def get_query_methods_from_messages(
+    agent_factory: Talk2PowerSystemAgentFactory, explain_messages: list[Any]
+) -> list[QueryMethod]:
     executed_queries, tools_calls_errors = get_queries_and_errors(explain_messages)
     return build_query_methods(
         agent_factory, explain_messages, executed_queries, tools_calls_errors
@@ -53,8 +69,9 @@ async def get_explain_messages(
 
         if isinstance(message, HumanMessage) or is_final_ai_answer:
             break
-        explain_messages.insert(0, message)
+        explain_messages.append(message)
 
+    explain_messages.reverse()
     return explain_messages
 
 
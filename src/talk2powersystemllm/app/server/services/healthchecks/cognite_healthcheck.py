@@ -1,10 +1,13 @@
 import logging
+from typing import TYPE_CHECKING
 
 from talk2powersystemllm.app.models import HealthCheck, HealthStatus, Severity
 from talk2powersystemllm.app.server.services.healthchecks.healthchecks import (
     HealthProvider,
 )
-from talk2powersystemllm.tools import CogniteSession
+
+if TYPE_CHECKING:
+    from talk2powersystemllm.tools import CogniteSession
 
 logger = logging.getLogger(__name__)
 
@@ -26,7 +29,7 @@ class CogniteHealthcheck(HealthCheck):
 class CogniteHealthchecker(HealthProvider):
     def __init__(
         self,
-        cognite_session: CogniteSession,
+        cognite_session: "CogniteSession",
     ):
         self.__cognite_session = cognite_session
 
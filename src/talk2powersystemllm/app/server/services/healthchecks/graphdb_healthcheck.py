@@ -35,7 +35,7 @@ class GraphDBHealthcheck(HealthCheck):
 
 class GraphDBHealthchecker(HealthProvider):
     def __init__(self, agent_factory: Talk2PowerSystemAgentFactory):
-        self.__graphdb_client = agent_factory.graphdb_client
+        self.__graphdb_client = agent_factory.async_graphdb_client
         self.__repository_id = agent_factory.graphdb_repository_id
 
         self.__retrieval_repository_id = None
@@ -49,24 +49,26 @@ class GraphDBHealthchecker(HealthProvider):
 
     async def health(self) -> GraphDBHealthcheck:
         try:
-            status, msg, health_response = self.__check_repository_health(
+            status, msg, health_response = await self.__check_repository_health(
                 self.__repository_id
             )
             if status != HealthStatus.OK:
                 return GraphDBHealthcheck(status=status, message=msg)
 
-            status, msg = self.__check_autocomplete_status()
+            status, msg = await self.__check_autocomplete_status()
             if status != HealthStatus.OK:
                 return GraphDBHealthcheck(status=status, message=msg)
 
-            status, msg = self.__check_rdf_rank_status()
+            status, msg = await self.__check_rdf_rank_status()
             if status != HealthStatus.OK:
                 return GraphDBHealthcheck(status=status, message=msg)
 
             if self.__retrieval_repository_id:
                 if self.__retrieval_repository_id != self.__repository_id:
                     status, msg, retrieval_health_response = (
-                        self.__check_repository_health(self.__retrieval_repository_id)
+                        await self.__check_repository_health(
+                            self.__retrieval_repository_id
+                        )
                     )
                     if status != HealthStatus.OK:
                         return GraphDBHealthcheck(status=status, message=msg)
@@ -86,11 +88,11 @@ class GraphDBHealthchecker(HealthProvider):
             logger.exception("Exception raised in GraphDB health check")
             return GraphDBHealthcheck(status=HealthStatus.ERROR, message=str(error))
 
-    def __check_repository_health(
+    async def __check_repository_health(
         self, repository_id: str
     ) -> tuple[HealthStatus, str, dict | None]:
         try:
-            health_response = self.__graphdb_client.health(repository_id).json()
+            health_response = (await self.__graphdb_client.health(repository_id)).json()
             if health_response["status"] in ("yellow", "red"):
                 status = (
                     HealthStatus.WARNING
@@ -109,7 +111,7 @@ class GraphDBHealthchecker(HealthProvider):
                 self.__log(status, msg)
                 return status, msg, health_response
 
-            self.__graphdb_client.eval_sparql_query(
+            await self.__graphdb_client.eval_sparql_query(
                 repository_id, "ASK { ?s ?p ?o }", validation=False
             )
             return HealthStatus.OK, "", health_response
@@ -125,8 +127,8 @@ class GraphDBHealthchecker(HealthProvider):
         else:
             logger.warning(message)
 
-    def __check_autocomplete_status(self) -> tuple[HealthStatus, str]:
-        autocomplete_status = self.__graphdb_client.get_autocomplete_status(
+    async def __check_autocomplete_status(self) -> tuple[HealthStatus, str]:
+        autocomplete_status = await self.__graphdb_client.get_autocomplete_status(
             self.__repository_id
         )
         if autocomplete_status != GraphDBAutocompleteStatus.READY:
@@ -139,8 +141,8 @@ class GraphDBHealthchecker(HealthProvider):
             return HealthStatus.WARNING, msg
         return HealthStatus.OK, ""
 
-    def __check_rdf_rank_status(self) -> tuple[HealthStatus, str]:
-        rdf_rank_status = self.__graphdb_client.get_rdf_rank_status(
+    async def __check_rdf_rank_status(self) -> tuple[HealthStatus, str]:
+        rdf_rank_status = await self.__graphdb_client.get_rdf_rank_status(
             self.__repository_id
         )
         if rdf_rank_status != GraphDBRdfRankStatus.COMPUTED:
@@ -1,7 +1,9 @@
 import asyncio
+import time
 from abc import ABC, abstractmethod
 
 from talk2powersystemllm.app.models import HealthCheck, HealthInfo, HealthStatus
+from talk2powersystemllm.app.server.metrics import HEALTHCHECK_DURATION
 
 
 class HealthProvider(ABC):
@@ -19,7 +21,9 @@ class HealthChecks:
 
     async def get_health(self) -> HealthInfo:
         health_checks = list(
-            await asyncio.gather(*[hc.health() for hc in self.registered_health_checks])
+            await asyncio.gather(
+                *[self.__health(hc) for hc in self.registered_health_checks]
+            )
         )
 
         overall_status = HealthStatus.OK
@@ -31,3 +35,13 @@ class HealthChecks:
             status=overall_status,
             healthChecks=health_checks,
         )
+
+    @staticmethod
+    async def __health(health_provider: HealthProvider) -> HealthCheck:
+        start = time.perf_counter()
+        try:
+            return await health_provider.health()
+        finally:
+            HEALTHCHECK_DURATION.labels(type(health_provider).__name__).observe(
+                time.perf_counter() - start
+            )
@@ -0,0 +1,185 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+
+from cachetools import TLRUCache
+from fastapi import HTTPException
+from pydantic import SecretStr
+from redis.asyncio import Redis, RedisCluster
+from redis.exceptions import RedisError
+
+from talk2powersystemllm.agent import AgentsCache
+from talk2powersystemllm.tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+class OboTokenProvider:
+    """
+    Acquires Cognite access tokens with the On-Behalf-Of flow and reuses them
+    per user, i.e. per `tid` and `oid` (or `sub`) of the incoming assertion,
+    until `expiry_margin` seconds before they expire.
+
+    The tokens are kept in memory and, if `redis_client` is set, are shared
+    with the other replicas through Redis, encrypted with `encryption_key`.
+    Only one OBO request per user runs at a time, the concurrent requests of
+    the same user wait for it.
+    The blocking MSAL calls run in a worker thread, outside the event loop.
+    """
+
+    def __init__(
+        self,
+        confidential_app,
+        scopes: list[str],
+        maxsize: int,
+        expiry_margin: int,
+        redis_client: Redis | RedisCluster | None = None,
+        encryption_key: SecretStr | None = None,
+        timer=time.time,
+    ):
+        self.confidential_app = confidential_app
+        self.scopes = scopes
+        self.expiry_margin = expiry_margin
+        self.redis_client = redis_client
+        self.__timer = timer
+        self.__tokens = TLRUCache(maxsize=maxsize, ttu=self.__ttu, timer=timer)
+        self.__in_flight: dict[str, asyncio.Task] = {}
+        self.__fernet = None
+        if redis_client is not None:
+            # imported only if the tokens are shared through Redis
+            from cryptography.fernet import Fernet
+
+            self.__fernet = Fernet(encryption_key.get_secret_value())
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.obo_requests = 0
+        self.obo_errors = 0
+        self.obo_seconds = 0.0
+
+    def __ttu(self, _key: str, value: tuple[str, float], _now: float) -> float:
+        _, expires_at = value
+        return expires_at - self.expiry_margin
+
+    def redis_key(self, user_key: str) -> str:
+        scopes = " ".join(sorted(self.scopes))
+        digest = hashlib.sha256(f"{user_key}|{scopes}".encode("utf-8")).hexdigest()
+        return f"obo_token:{digest}"
+
+    @property
+    def info(self) -> dict[str, int | float]:
+        return {
+            "hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "size": len(self.__tokens),
+            "obo_requests": self.obo_requests,
+            "obo_errors": self.obo_errors,
+            "obo_seconds": self.obo_seconds,
+        }
+
+    async def get_token(self, authorization: str) -> str:
+        """
+        Returns an access token for Cognite on behalf of the user,
+        who sent the `authorization` header.
+        """
+        user_key, _ = AgentsCache.get_user_key_and_expiry(
+            authorization.removeprefix("Bearer ")
+        )
+        if user_key is None:
+            # nothing to key the cache by
+            self.misses += 1
+            access_token, _ = await self.__acquire_token(authorization)
+            return access_token
+
+        value = self.__tokens.get(user_key)
+        if value is not None:
+            self.hits += 1
+            return value[0]
+
+        task = self.__in_flight.get(user_key)
+        if task is None:
+            task = asyncio.create_task(self.__get_token(user_key, authorization))
+            self.__in_flight[user_key] = task
+            task.add_done_callback(lambda _: self.__in_flight.pop(user_key, None))
+        else:
+            self.hits += 1
+        # shielded, so a cancelled request doesn't cancel the OBO request of the others
+        return await asyncio.shield(task)
+
+    async def __get_token(self, user_key: str, authorization: str) -> str:
+        value = await self.__redis_get(user_key)
+        if value is not None:
+            self.redis_hits += 1
+        else:
+            self.misses += 1
+            value = await self.__acquire_token(authorization)
+            await self.__redis_set(user_key, value)
+        self.__tokens[user_key] = value
+        return value[0]
+
+    async def __acquire_token(self, authorization: str) -> tuple[str, float]:
+        logger.debug("Acquiring new Cognite token via OBO flow.")
+        self.obo_requests += 1
+        start = time.perf_counter()
+        try:
+            with span("cognite.obo_token", {"enduser.scopes": self.scopes}):
+                result = await asyncio.to_thread(
+                    self.confidential_app.acquire_token_on_behalf_of,
+                    user_assertion=authorization,
+                    scopes=self.scopes,
+                )
+        finally:
+            self.obo_seconds += time.perf_counter() - start
+
+        if "access_token" not in result:
+            self.obo_errors += 1
+            error_desc = result.get(
+                "error_description", result.get("error", "Unknown MSAL Error")
+            )
+            logger.error(f"MSAL OBO Error: {error_desc}")
+            raise HTTPException(
+                status_code=401, detail=f"Failed to acquire Cognite token: {error_desc}"
+            )
+
+        expires_at = self.__timer() + float(result.get("expires_in", 0))
+        return result["access_token"], expires_at
+
+    async def __redis_get(self, user_key: str) -> tuple[str, float] | None:
+        if self.redis_client is None:
+            return None
+        try:
+            encrypted = await self.redis_client.get(self.redis_key(user_key))
+        except RedisError as error:
+            logger.warning(f"Can't read the Cognite token from Redis: {error}")
+            return None
+        if encrypted is None:
+            return None
+
+        from cryptography.fernet import InvalidToken
+
+        try:
+            value = json.loads(self.__fernet.decrypt(encrypted))
+        except InvalidToken:
+            # e.g. the encryption key is rotated
+            logger.warning("Can't decrypt the Cognite token from Redis")
+            return None
+        if value["expires_at"] - self.expiry_margin <= self.__timer():
+            return None
+        return value["access_token"], value["expires_at"]
+
+    async def __redis_set(self, user_key: str, value: tuple[str, float]) -> None:
+        if self.redis_client is None:
+            return
+        access_token, expires_at = value
+        ttl = int(expires_at - self.expiry_margin - self.__timer())
+        if ttl <= 0:
+            return
+        payload = json.dumps({"access_token": access_token, "expires_at": expires_at})
+        encrypted = self.__fernet.encrypt(payload.encode("utf-8"))
+        try:
+            await self.redis_client.set(self.redis_key(user_key), encrypted, ex=ttl)
+        except RedisError as error:
+            logger.warning(f"Can't write the Cognite token to Redis: {error}")
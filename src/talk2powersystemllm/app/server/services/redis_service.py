@@ -1,9 +1,16 @@
+from redis import Redis as SyncRedis
+from redis import RedisCluster as SyncRedisCluster
 from redis.asyncio import Redis, RedisCluster
 
 from talk2powersystemllm.app.server.config import RedisSettings
+from talk2powersystemllm.app.server.services.compact_redis_saver import (
+    CompactRedisSaver,
+)
 
 
-def create_redis_client(redis_settings: RedisSettings) -> Redis | RedisCluster:
+def get_redis_url_and_connection_kwargs(
+    redis_settings: RedisSettings,
+) -> tuple[str, dict]:
     redis_password = redis_settings.password
     redis_auth = ""
     if redis_password:
@@ -14,6 +21,11 @@ def create_redis_client(redis_settings: RedisSettings) -> Redis | RedisCluster:
         "socket_timeout": redis_settings.read_timeout,
         "health_check_interval": redis_settings.healthcheck_interval,
     }
+    return redis_url, connection_kwargs
+
+
+def create_redis_client(redis_settings: RedisSettings) -> Redis | RedisCluster:
+    redis_url, connection_kwargs = get_redis_url_and_connection_kwargs(redis_settings)
     if redis_settings.is_a_cluster:
         return RedisCluster.from_url(
             redis_url,
@@ -24,3 +36,42 @@ def create_redis_client(redis_settings: RedisSettings) -> Redis | RedisCluster:
             redis_url,
             **connection_kwargs,
         )
+
+
+def create_sync_redis_client(
+    redis_settings: RedisSettings,
+) -> SyncRedis | SyncRedisCluster:
+    """
+    Blocking Redis client for code running outside the event loop, i.e. in the tools.
+    """
+    redis_url, connection_kwargs = get_redis_url_and_connection_kwargs(redis_settings)
+    if redis_settings.is_a_cluster:
+        return SyncRedisCluster.from_url(
+            redis_url,
+            **connection_kwargs,
+        )
+    else:
+        return SyncRedis.from_url(
+            redis_url,
+            **connection_kwargs,
+        )
+
+
+def create_redis_saver(
+    redis_settings: RedisSettings, redis_client: Redis | RedisCluster
+) -> CompactRedisSaver:
+    """
+    Checkpointer, which stores the conversations in Redis,
+    compressing and offloading the large values, if configured.
+    """
+    return CompactRedisSaver(
+        redis_client=redis_client,
+        ttl={
+            "default_ttl": redis_settings.ttl,
+            "refresh_on_read": redis_settings.ttl_refresh_on_read,
+        },
+        compression=redis_settings.checkpoint_compression,
+        compression_min_size=redis_settings.checkpoint_compression_min_size,
+        offload_threshold=redis_settings.checkpoint_offload_threshold,
+        stats=redis_settings.checkpoint_stats,
+    )
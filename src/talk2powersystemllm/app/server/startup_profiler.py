@@ -0,0 +1,180 @@
+import argparse
+import builtins
+import importlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+PROFILE_STARTUP_ENV = "PROFILE_STARTUP"
+PROFILE_STARTUP_FILE_ENV = "PROFILE_STARTUP_FILE"
+
+_startup_profiler: "StartupProfiler | None" = None
+
+
+class StartupProfiler:
+    """
+    Records the time spent importing each top-level package, similar to
+    `python -X importtime`, and the durations of the startup phases.
+
+    The time of an import is attributed to the package of the imported module,
+    excluding the time of the nested imports, which are attributed to their packages.
+    """
+
+    def __init__(self):
+        self.import_times: dict[str, float] = defaultdict(float)
+        self.phases: dict[str, dict[str, float]] = {}
+        self.imports_duration = 0.0
+        self.__lock = threading.Lock()
+        self.__local = threading.local()
+        self.__original_import = None
+        self.__start = 0.0
+
+    def start(self) -> None:
+        self.__start = time.perf_counter()
+        self.__original_import = builtins.__import__
+        builtins.__import__ = self.__import
+
+    def stop(self) -> None:
+        if self.__original_import is None:
+            return
+        if builtins.__import__ == self.__import:
+            builtins.__import__ = self.__original_import
+        self.__original_import = None
+        self.imports_duration = time.perf_counter() - self.__start
+
+    def __import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        original_import = self.__original_import
+        if level == 0 and name in sys.modules:
+            return original_import(name, globals, locals, fromlist, level)
+
+        stack = getattr(self.__local, "stack", None)
+        if stack is None:
+            stack = self.__local.stack = []
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            if level and globals:
+                name = globals.get("__package__") or name
+            with self.__lock:
+                self.import_times[name.split(".")[0]] += elapsed - children
+
+    def add_phases(self, name: str, phases: dict[str, float]) -> None:
+        self.phases[name] = dict(phases)
+
+    def to_dict(self, top: int = 20) -> dict:
+        import_times = sorted(
+            self.import_times.items(), key=lambda item: item[1], reverse=True
+        )
+        return {
+            "imports_ms": round(self.imports_duration * 1000, 1),
+            "import_self_times_ms": {
+                package: round(duration * 1000, 1)
+                for package, duration in import_times[:top]
+            },
+            "phases_ms": {
+                name: {
+                    phase: round(duration * 1000, 1)
+                    for phase, duration in phases.items()
+                }
+                for name, phases in self.phases.items()
+            },
+        }
+
+    def report(self, top: int = 20) -> str:
+        profile = self.to_dict(top)
+        lines = [f"Imports took {profile['imports_ms']:.0f}ms, slowest packages:"]
+        lines.extend(
+            f"  {package}: {duration:.0f}ms"
+            for package, duration in profile["import_self_times_ms"].items()
+        )
+        for name, phases in profile["phases_ms"].items():
+            lines.append(f"{name}:")
+            lines.extend(
+                f"  {phase}: {duration:.0f}ms" for phase, duration in phases.items()
+            )
+        return "\n".join(lines)
+
+    def finish(self, output_file: Path | None = None) -> None:
+        """
+        Stops recording the imports, logs the report and writes it as JSON to
+        `output_file`, if set.
+        """
+        self.stop()
+        logger.info(f"Startup profile\n{self.report()}")
+        if output_file:
+            with open(output_file, "w", encoding="utf-8") as f:
+                json.dump(self.to_dict(top=sys.maxsize), f, indent=2)
+
+
+def start_startup_profiler_from_env() -> None:
+    """
+    Starts profiling the startup, if the environment variable `PROFILE_STARTUP` is set.
+    This must happen before the application modules are imported.
+    """
+    global _startup_profiler
+    if _startup_profiler is not None:
+        return
+    if os.environ.get(PROFILE_STARTUP_ENV, "").lower() not in ("1", "true", "yes"):
+        return
+    _startup_profiler = StartupProfiler()
+    _startup_profiler.start()
+
+
+def finish_startup_profiler(phases: dict[str, dict[str, float]]) -> None:
+    """
+    Completes the startup profile with the startup phases, if profiling is enabled.
+    """
+    global _startup_profiler
+    if _startup_profiler is None:
+        return
+    for name, phases_durations in phases.items():
+        _startup_profiler.add_phases(name, phases_durations)
+    output_file = os.environ.get(PROFILE_STARTUP_FILE_ENV)
+    _startup_profiler.finish(Path(output_file) if output_file else None)
+    _startup_profiler = None
+
+
+def get_args_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Profile the import of the application module"
+    )
+    parser.add_argument(
+        "--module",
+        dest="module",
+        default="talk2powersystemllm.app.server.main",
+        help="The module to import",
+    )
+    parser.add_argument(
+        "--output",
+        dest="output",
+        required=False,
+        help="Path to the JSON file, where the profile is written",
+    )
+    return parser
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    args = get_args_parser().parse_args()
+
+    startup_profiler = StartupProfiler()
+    startup_profiler.start()
+    importlib.import_module(args.module)
+    startup_profiler.finish(Path(args.output) if args.output else None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from rdflib.query import Result
+from ttyg.graphdb import GraphDB, GraphDBAutocompleteStatus, GraphDBRdfRankStatus
+
+from talk2powersystemllm.sparql_cache import SparqlResultCache
+from talk2powersystemllm.tracing import set_attributes, span
+
+T = TypeVar("T")
+
+
+class TracingGraphDB(GraphDB):
+    """
+    GraphDB client, which traces each SPARQL query with its text and number of rows.
+    """
+
+    def eval_sparql_query(
+        self, repository_id: str, query: str, validation: bool = True
+    ) -> tuple[Result, str]:
+        with span(
+            "graphdb.sparql",
+            {
+                "db.system": "graphdb",
+                "db.namespace": repository_id,
+                "db.query.text": query,
+            },
+        ) as current_span:
+            result, query = super().eval_sparql_query(
+                repository_id, query, validation=validation
+            )
+            set_attributes(
+                current_span,
+                {"db.query.text": query, "db.response.returned_rows": len(result)},
+            )
+            return result, query
+
+
+class CachingGraphDB(TracingGraphDB):
+    """
+    GraphDB client, which serves repeated SPARQL queries from a `SparqlResultCache`.
+    """
+
+    def __init__(self, cache: SparqlResultCache, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.cache = cache
+
+    def eval_sparql_query(
+        self, repository_id: str, query: str, validation: bool = True
+    ) -> tuple[Result, str]:
+        return self.cache.get_or_eval(
+            repository_id,
+            query,
+            validation,
+            functools.partial(
+                super().eval_sparql_query, repository_id, query, validation=validation
+            ),
+        )
+
+
+class AsyncGraphDB:
+    """
+    Async access to GraphDB for code running on the event loop.
+    The blocking calls of the GraphDB client are executed on a dedicated thread pool,
+    which bounds the number of concurrent requests to GraphDB and
+    doesn't compete with the default executor of the event loop.
+    """
+
+    def __init__(self, client: GraphDB, max_workers: int = 8):
+        self.client = client
+        self.__executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="graphdb"
+        )
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            self.__executor, functools.partial(context.run, func, *args, **kwargs)
+        )
+
+    async def eval_sparql_query(self, *args: Any, **kwargs: Any) -> Any:
+        return await self.run(self.client.eval_sparql_query, *args, **kwargs)
+
+    async def health(self, repository_id: str) -> Any:
+        return await self.run(self.client.health, repository_id)
+
+    async def get_autocomplete_status(
+        self, repository_id: str
+    ) -> GraphDBAutocompleteStatus:
+        return await self.run(self.client.get_autocomplete_status, repository_id)
+
+    async def get_rdf_rank_status(self, repository_id: str) -> GraphDBRdfRankStatus:
+        return await self.run(self.client.get_rdf_rank_status, repository_id)
+
+    def shutdown(self) -> None:
+        self.__executor.shutdown(wait=False, cancel_futures=True)
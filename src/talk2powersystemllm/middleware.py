@@ -0,0 +1,355 @@
+import asyncio
+import contextlib
+import json
+import threading
+from typing import Awaitable, Callable
+
+from cachetools import LRUCache
+from langchain.agents.middleware import (
+    AgentMiddleware,
+    ModelRequest,
+    ModelResponse,
+    ToolCallRequest,
+)
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langgraph.types import Command
+
+from talk2powersystemllm.ontology_schema import SchemaIndex
+from talk2powersystemllm.tracing import set_attributes, span
+
+
+class ToolCallConcurrencyMiddleware(AgentMiddleware):
+    """
+    Limits the number of tool calls executed at the same time, when the LLM
+    requests several tools in a single step. The limit applies to the tool calls
+    of a single model step, i.e. of an AI message of a conversation, so concurrent
+    conversations don't compete for the same slots.
+    The tool node keeps the results in the order of the tool calls,
+    so the checkpoint and the explain output don't depend on the completion order.
+    """
+
+    def __init__(self, max_concurrency: int):
+        super().__init__()
+        self.max_concurrency = max_concurrency
+        # semaphore and number of running or waiting tool calls by step
+        self.__semaphores: dict[tuple, list] = {}
+        self.__async_semaphores: dict[tuple, list] = {}
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def step_key(request: ToolCallRequest) -> tuple:
+        """
+        Returns the thread id and the id of the AI message with the tool call.
+        """
+        runtime = getattr(request, "runtime", None)
+        config = getattr(runtime, "config", None) or {}
+        thread_id = config.get("configurable", {}).get("thread_id")
+        tool_call_id = request.tool_call["id"]
+        state = request.state if isinstance(request.state, dict) else {}
+        for message in reversed(state.get("messages", [])):
+            if isinstance(message, AIMessage) and any(
+                tool_call["id"] == tool_call_id for tool_call in message.tool_calls
+            ):
+                return thread_id, message.id or id(message)
+        return thread_id, tool_call_id
+
+    @contextlib.contextmanager
+    def __acquire_step(self, semaphores: dict, key: tuple, factory: Callable):
+        with self.__lock:
+            entry = semaphores.setdefault(key, [factory(self.max_concurrency), 0])
+            entry[1] += 1
+        try:
+            yield entry[0]
+        finally:
+            with self.__lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del semaphores[key]
+
+    def wrap_tool_call(
+        self,
+        request: ToolCallRequest,
+        handler: Callable[[ToolCallRequest], ToolMessage | Command],
+    ) -> ToolMessage | Command:
+        with self.__acquire_step(
+            self.__semaphores, self.step_key(request), threading.BoundedSemaphore
+        ) as semaphore:
+            with semaphore:
+                return handler(request)
+
+    async def awrap_tool_call(
+        self,
+        request: ToolCallRequest,
+        handler: Callable[[ToolCallRequest], Awaitable[ToolMessage | Command]],
+    ) -> ToolMessage | Command:
+        with self.__acquire_step(
+            self.__async_semaphores, self.step_key(request), asyncio.Semaphore
+        ) as semaphore:
+            async with semaphore:
+                return await handler(request)
+
+
+class RelevantSchemaMiddleware(AgentMiddleware):
+    """
+    Replaces the `{ontology_schema}` placeholder in the system prompt with the part
+    of the ontology schema relevant to the conversation, instead of the full schema.
+    The relevant part is selected on each model call from the questions of the user,
+    and the tool calls and the tool results of the current turn.
+    """
+
+    def __init__(self, instructions_template: str, schema_index: SchemaIndex):
+        super().__init__()
+        self.instructions_template = instructions_template
+        self.schema_index = schema_index
+
+    def system_prompt(self, messages: list[AnyMessage]) -> str:
+        last_human_message = max(
+            (
+                i
+                for i, message in enumerate(messages)
+                if isinstance(message, HumanMessage)
+            ),
+            default=-1,
+        )
+        texts = []
+        for i, message in enumerate(messages):
+            if isinstance(message, HumanMessage):
+                texts.append(message.text)
+            elif i > last_human_message:
+                if isinstance(message, ToolMessage):
+                    texts.append(message.text)
+                elif isinstance(message, AIMessage):
+                    texts.extend(
+                        json.dumps(tool_call["args"], ensure_ascii=False)
+                        for tool_call in message.tool_calls
+                    )
+        return self.instructions_template.replace(
+            "{ontology_schema}", self.schema_index.render("\n".join(texts))
+        )
+
+    def wrap_model_call(
+        self,
+        request: ModelRequest,
+        handler: Callable[[ModelRequest], ModelResponse],
+    ) -> ModelResponse:
+        return handler(
+            request.override(system_prompt=self.system_prompt(request.messages))
+        )
+
+    async def awrap_model_call(
+        self,
+        request: ModelRequest,
+        handler: Callable[[ModelRequest], Awaitable[ModelResponse]],
+    ) -> ModelResponse:
+        return await handler(
+            request.override(system_prompt=self.system_prompt(request.messages))
+        )
+
+
+COMPACTED_PROMPT_TOKENS = "compacted_prompt_tokens"
+
+
+def summarize_tool_result(content: str, preview_chars: int) -> str:
+    """
+    Returns a compact summary of a tool result, i.e. the number of rows
+    of the JSON results, and a preview of the result.
+    """
+    summary = f"[Compacted result of {len(content)} characters"
+    try:
+        result = json.loads(content)
+    except ValueError:
+        result = None
+    if isinstance(result, dict) and isinstance(result.get("results"), dict):
+        result = result["results"].get("bindings")
+    if isinstance(result, list):
+        summary += f", {len(result)} rows"
+    summary += ". Call the tool again for the full result.]"
+    return f"{summary}\n{content[:preview_chars]}"
+
+
+class HistoryCompactionMiddleware(AgentMiddleware):
+    """
+    Replaces the results of the tool calls from the earlier turns of the conversation
+    with compact summaries, once the messages exceed `token_threshold` tokens.
+    The tool calls, i.e. the queries, remain in the messages.
+    Only the messages sent to the model are compacted, the checkpoint keeps
+    the original results for the explain endpoint.
+    The number of tokens saved is added to the `response_metadata` of the AI message
+    as `compacted_prompt_tokens`.
+    """
+
+    def __init__(self, token_threshold: int, keep_last_turns: int, preview_chars: int):
+        super().__init__()
+        self.token_threshold = token_threshold
+        self.keep_last_turns = keep_last_turns
+        self.preview_chars = preview_chars
+        self.__summaries = LRUCache(maxsize=1024)
+
+    def compact(self, messages: list[AnyMessage]) -> tuple[list[AnyMessage], int]:
+        """
+        Returns the compacted messages and the number of tokens saved.
+        """
+        tokens = count_tokens_approximately(messages)
+        if tokens <= self.token_threshold:
+            return messages, 0
+
+        human_messages = [
+            i for i, message in enumerate(messages) if isinstance(message, HumanMessage)
+        ]
+        if len(human_messages) <= self.keep_last_turns:
+            return messages, 0
+        first_kept = human_messages[-self.keep_last_turns]
+
+        compacted = []
+        for i, message in enumerate(messages):
+            if (
+                i < first_kept
+                and isinstance(message, ToolMessage)
+                and message.status != "error"
+                and len(message.text) > self.preview_chars
+            ):
+                summary = self.__summaries.get(message.tool_call_id)
+                if summary is None:
+                    summary = summarize_tool_result(message.text, self.preview_chars)
+                    self.__summaries[message.tool_call_id] = summary
+                message = message.model_copy(update={"content": summary})
+            compacted.append(message)
+        return compacted, tokens - count_tokens_approximately(compacted)
+
+    @staticmethod
+    def __add_compacted_tokens(response: ModelResponse, saved_tokens: int) -> None:
+        for message in response.result:
+            if isinstance(message, AIMessage):
+                message.response_metadata[COMPACTED_PROMPT_TOKENS] = saved_tokens
+
+    def wrap_model_call(
+        self,
+        request: ModelRequest,
+        handler: Callable[[ModelRequest], ModelResponse],
+    ) -> ModelResponse:
+        messages, saved_tokens = self.compact(request.messages)
+        if not saved_tokens:
+            return handler(request)
+        response = handler(request.override(messages=messages))
+        self.__add_compacted_tokens(response, saved_tokens)
+        return response
+
+    async def awrap_model_call(
+        self,
+        request: ModelRequest,
+        handler: Callable[[ModelRequest], Awaitable[ModelResponse]],
+    ) -> ModelResponse:
+        messages, saved_tokens = self.compact(request.messages)
+        if not saved_tokens:
+            return await handler(request)
+        response = await handler(request.override(messages=messages))
+        self.__add_compacted_tokens(response, saved_tokens)
+        return response
+
+
+class TracingMiddleware(AgentMiddleware):
+    """
+    Traces each model call, with the model and the token usage,
+    and each tool call, with the arguments, e.g. the query, and the status.
+    The spans of the SPARQL queries and the Cognite requests of a tool
+    are children of its span.
+    """
+
+    @staticmethod
+    def __model_span(request: ModelRequest):
+        model = getattr(request.model, "bound", request.model)
+        return span(
+            "agent.model",
+            {
+                "gen_ai.operation.name": "chat",
+                "gen_ai.request.model": getattr(model, "model_name", None)
+                or getattr(model, "model", None),
+                "gen_ai.request.messages": len(request.messages),
+            },
+        )
+
+    @staticmethod
+    def __set_usage(current_span, response: ModelResponse) -> None:
+        for message in response.result:
+            if not isinstance(message, AIMessage):
+                continue
+            usage_metadata = message.usage_metadata or {}
+            set_attributes(
+                current_span,
+                {
+                    "gen_ai.usage.input_tokens": usage_metadata.get("input_tokens"),
+                    "gen_ai.usage.output_tokens": usage_metadata.get("output_tokens"),
+                    "gen_ai.usage.cached_input_tokens": (
+                        usage_metadata.get("input_token_details") or {}
+                    ).get("cache_read"),
+                    "gen_ai.response.tool_calls": len(message.tool_calls),
+                    COMPACTED_PROMPT_TOKENS: message.response_metadata.get(
+                        COMPACTED_PROMPT_TOKENS
+                    ),
+                },
+            )
+
+    @staticmethod
+    def __tool_span(request: ToolCallRequest):
+        tool_call = request.tool_call
+        return span(
+            f"agent.tool {tool_call['name']}",
+            {
+                "gen_ai.operation.name": "execute_tool",
+                "gen_ai.tool.name": tool_call["name"],
+                "gen_ai.tool.call.id": tool_call["id"],
+                "gen_ai.tool.call.arguments": tool_call["args"],
+            },
+        )
+
+    @staticmethod
+    def __set_tool_result(current_span, result: ToolMessage | Command) -> None:
+        if isinstance(result, ToolMessage):
+            set_attributes(
+                current_span,
+                {
+                    "gen_ai.tool.status": result.status,
+                    "gen_ai.tool.result_chars": len(result.text),
+                },
+            )
+
+    def wrap_model_call(
+        self,
+        request: ModelRequest,
+        handler: Callable[[ModelRequest], ModelResponse],
+    ) -> ModelResponse:
+        with self.__model_span(request) as current_span:
+            response = handler(request)
+            self.__set_usage(current_span, response)
+            return response
+
+    async def awrap_model_call(
+        self,
+        request: ModelRequest,
+        handler: Callable[[ModelRequest], Awaitable[ModelResponse]],
+    ) -> ModelResponse:
+        with self.__model_span(request) as current_span:
+            response = await handler(request)
+            self.__set_usage(current_span, response)
+            return response
+
+    def wrap_tool_call(
+        self,
+        request: ToolCallRequest,
+        handler: Callable[[ToolCallRequest], ToolMessage | Command],
+    ) -> ToolMessage | Command:
+        with self.__tool_span(request) as current_span:
+            result = handler(request)
+            self.__set_tool_result(current_span, result)
+            return result
+
+    async def awrap_tool_call(
+        self,
+        request: ToolCallRequest,
+        handler: Callable[[ToolCallRequest], Awaitable[ToolMessage | Command]],
+    ) -> ToolMessage | Command:
+        with self.__tool_span(request) as current_span:
+            result = await handler(request)
+            self.__set_tool_result(current_span, result)
+            return result
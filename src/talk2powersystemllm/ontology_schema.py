@@ -0,0 +1,172 @@
+import re
+
+from rdflib import OWL, RDF, RDFS, BNode, Graph, Literal, URIRef
+
+
+def get_local_names(iri: URIRef) -> set[str]:
+    """
+    Returns the local name of the IRI and for CIM properties,
+    like `cim:ACLineSegment.r`, also the part after the class name.
+    """
+    local_name = re.split(r"[#/]", str(iri))[-1]
+    return {local_name, local_name.rsplit(".", 1)[-1]}
+
+
+def minify_schema(schema_graph: Graph) -> Graph:
+    """
+    Returns a copy of the ontology schema without the `rdfs:comment`s and
+    without the `rdfs:label`s, which only repeat the local name of the resource.
+    The namespace prefixes of the schema are kept, so that the IRIs are prefixed.
+    """
+    minified = Graph(bind_namespaces="none")
+    for prefix, namespace in schema_graph.namespaces():
+        minified.bind(prefix, namespace)
+
+    for s, p, o in schema_graph:
+        if p == RDFS.comment:
+            continue
+        if (
+            p == RDFS.label
+            and isinstance(s, URIRef)
+            and isinstance(o, Literal)
+            and str(o) in get_local_names(s)
+        ):
+            continue
+        minified.add((s, p, o))
+    return minified
+
+
+_WORDS = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+_CLASS_TYPES = (OWL.Class, RDFS.Class)
+_PROPERTY_TYPES = (
+    OWL.ObjectProperty,
+    OWL.DatatypeProperty,
+    OWL.AnnotationProperty,
+    RDF.Property,
+)
+
+
+def tokenize(text: str) -> set[str]:
+    """
+    Splits the text into lowercase words, also splitting camel case identifiers,
+    like `ACLineSegment` into `ac`, `line` and `segment`.
+    The plural `s` at the end of the words is removed.
+    """
+    words = set()
+    for word in _WORDS.findall(text):
+        word = word.lower()
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.add(word)
+    return words
+
+
+class SchemaIndex:
+    """
+    Index of the classes and properties of the ontology schema,
+    which selects the part of the schema relevant to a text.
+    """
+
+    def __init__(self, schema_graph: Graph, core_terms: list[str] | None = None):
+        self.schema_graph = schema_graph
+        self.core = {self.__to_iri(term) for term in core_terms or []}
+        self.__classes: set[URIRef] = set()
+        self.__properties: set[URIRef] = set()
+        self.__names: list[tuple[frozenset[str], URIRef]] = []
+        self.__render_cache: dict[frozenset[URIRef], str] = {}
+
+        for type_ in _CLASS_TYPES:
+            self.__classes.update(
+                s
+                for s in schema_graph.subjects(RDF.type, type_)
+                if isinstance(s, URIRef)
+            )
+        for type_ in _PROPERTY_TYPES:
+            self.__properties.update(
+                s
+                for s in schema_graph.subjects(RDF.type, type_)
+                if isinstance(s, URIRef)
+            )
+
+        for term in self.__classes | self.__properties:
+            names = get_local_names(term) | {
+                str(label) for label in schema_graph.objects(term, RDFS.label)
+            }
+            for name in names:
+                words = tokenize(name)
+                # too short names like `r` or `x` for CIM properties match everything
+                if words and len("".join(words)) >= 3:
+                    self.__names.append((frozenset(words), term))
+
+    def __to_iri(self, term: str) -> URIRef:
+        if "://" in term or term.startswith("urn:"):
+            return URIRef(term)
+        return self.schema_graph.namespace_manager.expand_curie(term)
+
+    def __match(self, text: str) -> set[URIRef]:
+        words = tokenize(text)
+        return {term for names, term in self.__names if names <= words}
+
+    def __superclasses(self, class_: URIRef) -> set[URIRef]:
+        return set(self.schema_graph.transitive_objects(class_, RDFS.subClassOf))
+
+    def select(self, text: str) -> set[URIRef]:
+        """
+        Returns the terms relevant to the text:
+        the matched classes with their superclasses and the properties of all of them,
+        the matched properties with their domains and ranges,
+        the ranges of all selected properties, and the core terms.
+        """
+        matched = self.__match(text) | self.core
+
+        classes = set()
+        properties = set()
+        for term in matched:
+            if term in self.__classes:
+                classes.update(self.__superclasses(term))
+            elif term in self.__properties:
+                properties.add(term)
+                for domain in self.schema_graph.objects(term, RDFS.domain):
+                    classes.update(self.__superclasses(domain))
+            else:
+                classes.add(term)
+
+        for class_ in list(classes):
+            properties.update(self.schema_graph.subjects(RDFS.domain, class_))
+
+        selected = classes | properties
+        for property_ in properties:
+            selected.update(self.schema_graph.objects(property_, RDFS.range))
+
+        # the values of the selected enumerations
+        for class_ in list(selected):
+            if class_ in self.__classes:
+                selected.update(self.schema_graph.subjects(RDF.type, class_))
+
+        return {term for term in selected if isinstance(term, URIRef)}
+
+    def render(self, text: str) -> str:
+        """
+        Returns the part of the schema relevant to the text in turtle.
+        """
+        terms = frozenset(self.select(text))
+        if terms not in self.__render_cache:
+            subgraph = Graph(bind_namespaces="none")
+            for prefix, namespace in self.schema_graph.namespaces():
+                subgraph.bind(prefix, namespace)
+            subjects = list(terms)
+            seen = set()
+            while subjects:
+                subject = subjects.pop()
+                if subject in seen:
+                    continue
+                seen.add(subject)
+                for _, p, o in self.schema_graph.triples((subject, None, None)):
+                    subgraph.add((subject, p, o))
+                    # blank nodes of OWL restrictions and RDF lists
+                    if isinstance(o, BNode):
+                        subjects.append(o)
+            if len(self.__render_cache) >= 1024:
+                self.__render_cache.clear()
+            self.__render_cache[terms] = subgraph.serialize(format="turtle")
+        return self.__render_cache[terms]
@@ -1,23 +1,29 @@
 import argparse
 import asyncio
-import io
 import json
 import time
 import uuid
 from base64 import b64encode
 from datetime import datetime, timezone
 from pathlib import Path
+from typing import Any
 
-import requests
+import httpx
+import jsonlines
 import yaml
 from graphrag_eval import compute_aggregates, run_evaluation
 from pydantic import Field, SecretStr, model_validator
 from pydantic_settings import BaseSettings
-from requests import Response
-from tenacity import RetryCallState, retry, stop_after_attempt, wait_exponential
+from tenacity import (
+    AsyncRetrying,
+    RetryCallState,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_exponential,
+)
 from tqdm import tqdm
-from ttyg.graphdb import GraphDB
 
+from talk2powersystemllm.graphdb import AsyncGraphDB, TracingGraphDB
 from talk2powersystemllm.qa_dataset import load_and_split_qa_dataset
 
 
@@ -51,11 +57,28 @@ def get_args_parser() -> argparse.ArgumentParser:
         required=True,
         help="Path to the results directory",
     )
+    parser.add_argument(
+        "--concurrency",
+        dest="concurrency",
+        type=int,
+        required=False,
+        default=8,
+        help="Maximum number of questions asked and queries replayed at the same time",
+    )
+    parser.add_argument(
+        "--resume",
+        dest="resume",
+        required=False,
+        default=False,
+        action=argparse.BooleanOptionalAction,
+        help="Resume the latest run in the results directory, "
+        "skipping the questions already answered (default: False).",
+    )
 
     return parser
 
 
-class GraphDBWrapper(GraphDB):
+class GraphDBWrapper(TracingGraphDB):
     """We need to override the class, because currently GraphDB /rest/chat/conversations/explain rest endpoint
     doesn't return the actual executed SPARQL query, i.e. if missing prefixes are automatically added, they are not
     present in the response. However, the original implementation also checks for IRIs in the SPARQL queries,
@@ -118,147 +141,312 @@ def get_auth_header_value(graphdb_settings: GraphDBSettings) -> str:
     return f"Basic {basic_auth_token}"
 
 
-def run_agent(
-    writer: io.TextIOWrapper,
+def create_http_client(
     graphdb_settings: GraphDBSettings,
-    question_id: str,
-    question_text: str,
-) -> None:
-    writer.write(str(question_id))
-    writer.write("\n")
-    x_request_id_prefix = f"SN-142-{question_id}-{uuid.uuid1()}"
-    writer.write(str(x_request_id_prefix))
-    writer.write("\n")
-
-    try:
-        start = time.time()
-        conversations_response = post_conversations(
-            x_request_id_prefix, graphdb_settings, question_text
-        )
-    except requests.exceptions.HTTPError as e:
-        writer.write(
-            json.dumps(
-                {
-                    "question_id": question_id,
-                    "error": str(e),
-                    "status": "error",
-                }
-            )
-        )
-        writer.write("\n\n\n\n\n")
-        return
-
-    conversations_response_body = conversations_response.json()
-    elapsed_sec = time.time() - start
-    writer.write(json.dumps(conversations_response_body))
-    writer.write("\n")
-    writer.write(str(elapsed_sec))
-    writer.write("\n")
-
-    messages = conversations_response_body["messages"]
-    conversation_id = conversations_response_body["id"]
-
-    explain_headers = {
+    concurrency: int,
+    transport: httpx.AsyncBaseTransport | None = None,
+) -> httpx.AsyncClient:
+    """
+    Returns a client, which reuses up to `concurrency` connections to GraphDB.
+    """
+    headers = {
         "Accept": "application/json",
         "Content-Type": "application/json",
-        "X-Request-Id": f"{x_request_id_prefix}-explain",
     }
     if graphdb_settings.username:
-        explain_headers.update(
-            {"Authorization": get_auth_header_value(graphdb_settings)}
-        )
-    explain_response = requests.post(
-        f"{graphdb_settings.base_url}/rest/chat/conversations/explain",
-        headers=explain_headers,
-        json={
-            "conversationId": conversation_id,
-            "answerId": messages[-1]["id"],
-        },
-        timeout=(graphdb_settings.connect_timeout, graphdb_settings.read_timeout),
+        headers["Authorization"] = get_auth_header_value(graphdb_settings)
+    return httpx.AsyncClient(
+        base_url=graphdb_settings.base_url,
+        headers=headers,
+        timeout=httpx.Timeout(
+            graphdb_settings.read_timeout, connect=graphdb_settings.connect_timeout
+        ),
+        limits=httpx.Limits(
+            max_connections=concurrency, max_keepalive_connections=concurrency
+        ),
+        transport=transport,
     )
-    explain_response.raise_for_status()
-    explain_response_body = explain_response.json()
-    writer.write(json.dumps(explain_response_body))
-    writer.write("\n")
 
-    delete_headers = {
-        "Accept": "application/json",
-        "Content-Type": "application/json",
-        "X-Request-Id": f"{x_request_id_prefix}-delete",
-    }
-    if graphdb_settings.username:
-        delete_headers.update(
-            {"Authorization": get_auth_header_value(graphdb_settings)}
+
+async def timed_request(
+    client: httpx.AsyncClient,
+    timings: dict[str, float],
+    step: str,
+    method: str,
+    url: str,
+    x_request_id: str,
+    **kwargs,
+) -> httpx.Response:
+    start = time.perf_counter()
+    try:
+        response = await client.request(
+            method, url, headers={"X-Request-Id": x_request_id}, **kwargs
         )
-    delete_response = requests.delete(
-        f"{graphdb_settings.base_url}/rest/chat/conversations/{conversation_id}",
-        headers=delete_headers,
-        timeout=(graphdb_settings.connect_timeout, graphdb_settings.read_timeout),
-    )
-    delete_response.raise_for_status()
-    delete_response_body = delete_response.json()
-    writer.write(json.dumps(delete_response_body))
-    writer.write("\n")
+        response.raise_for_status()
+        return response
+    finally:
+        timings[f"{step}_sec"] = time.perf_counter() - start
+
 
-    writer.write("\n")
+RETRY_WAIT = wait_exponential(multiplier=1, min=1, max=60)
 
 
 def log_retry(retry_state: RetryCallState):
     print(retry_state)
 
 
-@retry(
-    reraise=True,
-    stop=stop_after_attempt(5),
-    wait=wait_exponential(multiplier=1, min=1, max=60),
-    before_sleep=log_retry,
-)
-def post_conversations(
-    x_request_id_prefix: str,
+async def post_conversations(
+    client: httpx.AsyncClient,
     graphdb_settings: GraphDBSettings,
+    x_request_id_prefix: str,
     question_text: str,
-    retry_state: RetryCallState = None,
-) -> Response:
-    attempt_number = retry_state.attempt_number if retry_state else 1
+    timings: dict[str, float],
+) -> dict[str, Any]:
+    async for attempt in AsyncRetrying(
+        reraise=True,
+        retry=retry_if_exception_type(httpx.HTTPError),
+        stop=stop_after_attempt(5),
+        wait=RETRY_WAIT,
+        before_sleep=log_retry,
+    ):
+        with attempt:
+            attempt_number = attempt.retry_state.attempt_number
+            start_conversation_response = await timed_request(
+                client,
+                timings,
+                "start_chat",
+                "POST",
+                "/rest/chat/chats",
+                f"{x_request_id_prefix}-{attempt_number}-start-conversation",
+                json={
+                    "agentId": graphdb_settings.ttyg_agent_id,
+                    "question": question_text,
+                },
+            )
+            conversations_response = await timed_request(
+                client,
+                timings,
+                "question",
+                "POST",
+                "/rest/chat/chats/question",
+                f"{x_request_id_prefix}-{attempt_number}-conversations",
+                json={
+                    "agentId": graphdb_settings.ttyg_agent_id,
+                    "conversationId": start_conversation_response.json()[
+                        "conversationId"
+                    ],
+                    "question": question_text,
+                },
+            )
+            return conversations_response.json()
 
-    base_headers = {
-        "Accept": "application/json",
-        "Content-Type": "application/json",
+
+async def run_agent(
+    client: httpx.AsyncClient,
+    graphdb_settings: GraphDBSettings,
+    question_id: str,
+    question_text: str,
+) -> dict[str, Any]:
+    """
+    Asks the question, explains the answer and deletes the conversation.
+    Returns a record with the responses and the duration of each request.
+    """
+    x_request_id_prefix = f"SN-142-{question_id}-{uuid.uuid1()}"
+    record = {
+        "question_id": question_id,
+        "x_request_id": x_request_id_prefix,
+        "timings": {},
     }
-    if graphdb_settings.username:
-        base_headers.update({"Authorization": get_auth_header_value(graphdb_settings)})
 
-    start_conversation_headers = base_headers.copy()
-    start_conversation_headers["X-Request-Id"] = (
-        f"{x_request_id_prefix}-{attempt_number}-start-conversation"
-    )
-    start_conversation_response = requests.post(
-        f"{graphdb_settings.base_url}/rest/chat/chats",
-        headers=start_conversation_headers,
-        json={
-            "agentId": graphdb_settings.ttyg_agent_id,
-            "question": question_text,
-        },
-        timeout=(graphdb_settings.connect_timeout, graphdb_settings.read_timeout),
-    )
-    start_conversation_response.raise_for_status()
+    start = time.perf_counter()
+    try:
+        conversations_response_body = await post_conversations(
+            client,
+            graphdb_settings,
+            x_request_id_prefix,
+            question_text,
+            record["timings"],
+        )
+    except httpx.HTTPError as e:
+        return {**record, "status": "error", "error": str(e)}
+    record["elapsed_sec"] = time.perf_counter() - start
+    record["conversation"] = conversations_response_body
 
-    conversations_headers = base_headers.copy()
-    conversations_headers["X-Request-Id"] = (
-        f"{x_request_id_prefix}-{attempt_number}-conversations"
-    )
-    conversations_response = requests.post(
-        f"{graphdb_settings.base_url}/rest/chat/chats/question",
-        headers=base_headers,
-        json={
-            "agentId": graphdb_settings.ttyg_agent_id,
-            "conversationId": start_conversation_response.json()["conversationId"],
-            "question": question_text,
-        },
-        timeout=(graphdb_settings.connect_timeout, graphdb_settings.read_timeout),
+    conversation_id = conversations_response_body["id"]
+    try:
+        explain_response = await timed_request(
+            client,
+            record["timings"],
+            "explain",
+            "POST",
+            "/rest/chat/conversations/explain",
+            f"{x_request_id_prefix}-explain",
+            json={
+                "conversationId": conversation_id,
+                "answerId": conversations_response_body["messages"][-1]["id"],
+            },
+        )
+        record["explain"] = explain_response.json()
+    except httpx.HTTPError as e:
+        record.update({"status": "error", "error": f"Explain failed: {e}"})
+
+    try:
+        await timed_request(
+            client,
+            record["timings"],
+            "delete",
+            "DELETE",
+            f"/rest/chat/conversations/{conversation_id}",
+            f"{x_request_id_prefix}-delete",
+        )
+    except httpx.HTTPError as e:
+        # the answer is still usable
+        print(f"Warning: Failed to delete conversation {conversation_id}: {e}")
+    return record
+
+
+def is_error_response(response: dict[str, Any]) -> bool:
+    return "status" in response and response["status"] == "error"
+
+
+def load_gdb_responses(gdb_responses_file: Path) -> dict[str, dict]:
+    """
+    Returns the records written by an earlier run, by question id.
+    The error records are skipped, so that the questions are asked again.
+    """
+    records = dict()
+    if not gdb_responses_file.exists():
+        return records
+    with jsonlines.open(gdb_responses_file) as reader:
+        # skips the last line, if it's truncated by a crash
+        for record in reader.iter(skip_invalid=True):
+            if is_error_response(record):
+                records.pop(record["question_id"], None)
+            else:
+                records[record["question_id"]] = record
+    return records
+
+
+async def ask_questions(
+    client: httpx.AsyncClient,
+    graphdb_settings: GraphDBSettings,
+    questions: list[dict],
+    concurrency: int,
+    writer: jsonlines.Writer,
+    split_name: str,
+) -> list[dict]:
+    """
+    Asks the questions concurrently, and writes each record, as soon as it's ready.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def ask(question: dict) -> dict[str, Any]:
+        async with semaphore:
+            return await run_agent(
+                client, graphdb_settings, question["id"], question["question_text"]
+            )
+
+    records = []
+    tasks = [asyncio.create_task(ask(question)) for question in questions]
+    try:
+        for task in tqdm(
+            asyncio.as_completed(tasks),
+            total=len(tasks),
+            desc=f"Processing questions from {split_name} split",
+        ):
+            record = await task
+            writer.write(record)
+            records.append(record)
+    finally:
+        for task in tasks:
+            task.cancel()
+    return records
+
+
+def eval_query(
+    graphdb_client: GraphDBWrapper, repository_id: str, query: str
+) -> tuple[str, Any]:
+    try:
+        results, _ = graphdb_client.eval_sparql_query(repository_id, query)
+    except Exception as e:
+        return "error", str(e)
+    if results.type in ("CONSTRUCT", "DESCRIBE"):
+        output = results.serialize(format="turtle", encoding="utf-8").decode("utf-8")
+    else:
+        output = json.loads(
+            results.serialize(format="json", encoding="utf-8").decode("utf-8")
+        )
+    return "success", output
+
+
+async def replay_queries(
+    async_graphdb: AsyncGraphDB, repository_id: str, queries: set[str]
+) -> dict[str, tuple[str, Any]]:
+    """
+    Executes each distinct query once, concurrently on the thread pool
+    of `async_graphdb`, and returns the status and the output by query.
+    """
+    queries = sorted(queries)
+    results = await asyncio.gather(
+        *(
+            async_graphdb.run(eval_query, async_graphdb.client, repository_id, query)
+            for query in queries
+        )
     )
-    conversations_response.raise_for_status()
-    return conversations_response
+    return dict(zip(queries, results))
+
+
+def get_executed_queries(records: list[dict]) -> set[str]:
+    return {
+        query_method["query"]
+        for record in records
+        if not is_error_response(record)
+        for query_method in record["explain"]["queryMethods"]
+        if query_method["errorOutput"] is None
+    }
+
+
+def to_chat_response(
+    record: dict[str, Any], query_results: dict[str, tuple[str, Any]]
+) -> dict[str, Any]:
+    if is_error_response(record):
+        return {
+            "question_id": record["question_id"],
+            "error": record["error"],
+            "status": "error",
+        }
+
+    actual_steps = []
+    for query_method in record["explain"]["queryMethods"]:
+        if query_method["errorOutput"] is not None:
+            status, output = "error", query_method["errorOutput"]
+        else:
+            status, output = query_results[query_method["query"]]
+
+        if query_method["name"] == "autocomplete_iri_discovery_search":
+            name, args = "autocomplete_search", json.loads(query_method["rawQuery"])
+        else:
+            # sparql_query and fts_search
+            name, args = query_method["name"], {"query": query_method["rawQuery"]}
+        actual_steps.append(
+            {
+                "name": name,
+                "args": args,
+                "id": str(uuid.uuid4()),
+                "status": status,
+                "output": json.dumps(output),
+            }
+        )
+
+    usage = record["conversation"]["usage"]
+    return {
+        "question_id": record["question_id"],
+        "input_tokens": usage["promptTokens"],
+        "output_tokens": usage["completionTokens"],
+        "total_tokens": usage["totalTokens"],
+        "elapsed_sec": record["elapsed_sec"],
+        "actual_steps": actual_steps,
+    }
 
 
 def init_graphdb(graphdb_settings: GraphDBSettings) -> GraphDBWrapper:
@@ -277,93 +465,42 @@ async def run_evaluation_on_split(
     split: list[dict],
     split_name: str,
     results_dir: Path,
+    concurrency: int = 1,
 ) -> None:
-    gdb_responses_file = results_dir / f"gdb_responses_{split_name}.txt"
+    gdb_responses_file = results_dir / f"gdb_responses_{split_name}.jsonl"
+    records = load_gdb_responses(gdb_responses_file)
+    questions = [
+        question
+        for template in split
+        for question in template["questions"]
+        if question["id"] not in records
+    ]
+    if records:
+        print(
+            f"Resuming the {split_name} split: {len(records)} questions "
+            f"are already answered, {len(questions)} remain"
+        )
 
-    with open(gdb_responses_file, mode="w") as writer:
-        for template in tqdm(
-            split, desc=f"Processing templates from {split_name} split"
-        ):
-            for question in template["questions"]:
-                run_agent(
-                    writer,
-                    graphdb_settings,
-                    question["id"],
-                    question["question_text"],
-                )
-
-    graphdb_client = init_graphdb(graphdb_settings)
-    chat_responses = dict()
-    with open(gdb_responses_file, encoding="utf-8") as reader:
-        lines = reader.readlines()
-        lines = [line.strip() for line in lines]
-
-        for i in range(0, len(lines), 7):
-            responses_for_question = lines[i : i + 7]
-
-            question_id = responses_for_question[0]
-            conversations_response_body = json.loads(responses_for_question[2])
-            if (
-                "status" in conversations_response_body
-                and conversations_response_body["status"] == "error"
+    async with create_http_client(graphdb_settings, concurrency) as client:
+        with jsonlines.open(gdb_responses_file, mode="a", flush=True) as writer:
+            for record in await ask_questions(
+                client, graphdb_settings, questions, concurrency, writer, split_name
             ):
-                chat_responses[question_id] = conversations_response_body
-            else:
-                elapsed_sec = responses_for_question[3]
-
-                usage = conversations_response_body["usage"]
-                messages = conversations_response_body["messages"]
-
-                explain_response_body = json.loads(responses_for_question[4])
-                query_methods = explain_response_body["queryMethods"]
-                actual_steps = []
-                for query_method in query_methods:
-                    if query_method["errorOutput"] is not None:
-                        status = "error"
-                        output = query_method["errorOutput"]
-                    else:
-                        status = "success"
-                        results, _ = graphdb_client.eval_sparql_query(
-                            graphdb_settings.repository_id, query_method["query"]
-                        )
-                        if results.type in ("CONSTRUCT", "DESCRIBE"):
-                            output = results.serialize(
-                                format="turtle", encoding="utf-8"
-                            ).decode("utf-8")
-                        else:
-                            output = json.loads(
-                                results.serialize(
-                                    format="json", encoding="utf-8"
-                                ).decode("utf-8")
-                            )
-
-                    if query_method["name"] == "sparql_query":
-                        name, args = "sparql_query", {"query": query_method["rawQuery"]}
-                    elif query_method["name"] == "autocomplete_iri_discovery_search":
-                        name, args = (
-                            "autocomplete_search",
-                            json.loads(query_method["rawQuery"]),
-                        )
-                    elif query_method["name"] == "fts_search":
-                        name, args = "fts_search", {"query": query_method["rawQuery"]}
-                    actual_steps.append(
-                        {
-                            "name": name,
-                            "args": args,
-                            "id": str(uuid.uuid4()),
-                            "status": status,
-                            "output": json.dumps(output),
-                        }
-                    )
-
-                chat_responses[question_id] = {
-                    "question_id": question_id,
-                    "input_tokens": usage["promptTokens"],
-                    "output_tokens": usage["completionTokens"],
-                    "total_tokens": usage["totalTokens"],
-                    "elapsed_sec": float(elapsed_sec),
-                    "actual_steps": actual_steps,
-                }
+                records[record["question_id"]] = record
+
+    async_graphdb = AsyncGraphDB(init_graphdb(graphdb_settings), concurrency)
+    try:
+        query_results = await replay_queries(
+            async_graphdb,
+            graphdb_settings.repository_id,
+            get_executed_queries(list(records.values())),
+        )
+    finally:
+        async_graphdb.shutdown()
+    chat_responses = {
+        question_id: to_chat_response(record, query_results)
+        for question_id, record in records.items()
+    }
 
     per_question_eval = await run_evaluation(split, chat_responses)
     evaluation_results_file = results_dir / f"evaluation_per_question_{split_name}.yaml"
@@ -382,21 +519,26 @@ def main():
         graphdb_settings = GraphDBSettings(**config)
 
     results_dir = Path(args.results_dir)
-    timestamp = datetime.now(tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
-    results_dir = results_dir / timestamp
-    results_dir.mkdir(parents=True, exist_ok=True)
+    previous_runs = sorted(results_dir.glob("*T*Z")) if results_dir.exists() else []
+    if args.resume and previous_runs:
+        results_dir = previous_runs[-1]
+        print(f"Resuming the run in {results_dir}")
+    else:
+        timestamp = datetime.now(tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        results_dir = results_dir / timestamp
+        results_dir.mkdir(parents=True, exist_ok=True)
 
     _, dev_split, test_split = load_and_split_qa_dataset(Path(args.qa_dataset_path))
     dev_split = dev_split[: args.n_templates]
     test_split = test_split[: args.n_templates]
 
     asyncio.run(
-        run_evaluation_on_split(graphdb_settings, dev_split, "dev", results_dir)
+        run_evaluation_on_split(
+            graphdb_settings, dev_split, "dev", results_dir, args.concurrency
+        )
     )
     asyncio.run(
-        run_evaluation_on_split(graphdb_settings, test_split, "test", results_dir)
+        run_evaluation_on_split(
+            graphdb_settings, test_split, "test", results_dir, args.concurrency
+        )
     )
-
-
-if __name__ == "__main__":
-    main()
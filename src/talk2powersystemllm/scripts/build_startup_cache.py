@@ -0,0 +1,64 @@
+import argparse
+import logging
+from pathlib import Path
+
+from talk2powersystemllm.agent import (
+    OntologySchemaSettings,
+    get_ontology_schema,
+    load_agent_config,
+    validate_graphics_tool_template,
+)
+from talk2powersystemllm.app.server.lifespan import get_trouble_html
+from talk2powersystemllm.startup_cache import PhaseTimer, StartupCache
+
+
+def get_args_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Precompute the artifacts derived at startup of the application"
+    )
+    parser.add_argument(
+        "--agent-config-path",
+        dest="agent_config_paths",
+        nargs="+",
+        required=True,
+        help="Paths to the agent config yaml files",
+    )
+    parser.add_argument(
+        "--trouble-md-path",
+        dest="trouble_md_path",
+        required=False,
+        help="Path to the trouble document in markdown",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        dest="cache_dir",
+        required=True,
+        help="Path to the startup cache directory",
+    )
+    return parser
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    args_parser = get_args_parser()
+    args = args_parser.parse_args()
+
+    startup_cache = StartupCache(Path(args.cache_dir))
+    timer = PhaseTimer("Building the startup cache")
+    for agent_config_path in args.agent_config_paths:
+        with timer.phase(Path(agent_config_path).name):
+            config = load_agent_config(Path(agent_config_path))
+            get_ontology_schema(
+                OntologySchemaSettings(**config["tools"]["ontology_schema"]),
+                startup_cache,
+            )
+    with timer.phase("graphics_tool_template"):
+        validate_graphics_tool_template(startup_cache)
+    if args.trouble_md_path:
+        with timer.phase("trouble_html"):
+            get_trouble_html(Path(args.trouble_md_path), startup_cache)
+    timer.log_report()
+
+
+if __name__ == "__main__":
+    main()
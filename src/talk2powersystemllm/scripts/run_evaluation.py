@@ -1,5 +1,7 @@
 import argparse
 import asyncio
+import math
+import time
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
@@ -7,6 +9,7 @@ from typing import Any
 import jsonlines
 import yaml
 from graphrag_eval import compute_aggregates, run_evaluation
+from langchain_core.rate_limiters import InMemoryRateLimiter
 from langgraph.graph.state import CompiledStateGraph
 from tenacity import retry, retry_if_result, stop_after_attempt, wait_exponential
 from tqdm import tqdm
@@ -59,26 +62,153 @@ def get_args_parser() -> argparse.ArgumentParser:
         action=argparse.BooleanOptionalAction,
         help="Toggle dataset splitting (default: True).",
     )
+    parser.add_argument(
+        "--concurrency",
+        dest="concurrency",
+        type=int,
+        required=False,
+        default=4,
+        help="Maximum number of questions answered at the same time",
+    )
+    parser.add_argument(
+        "--llm_requests_per_minute",
+        dest="llm_requests_per_minute",
+        type=float,
+        required=False,
+        default=None,
+        help="Limit the requests to the LLM to match its quota (default: no limit)",
+    )
+    parser.add_argument(
+        "--resume",
+        dest="resume",
+        required=False,
+        default=False,
+        action=argparse.BooleanOptionalAction,
+        help="Resume the latest run in the results directory, "
+        "skipping the questions already answered (default: False).",
+    )
 
     return parser
 
 
+def load_chat_responses(chat_responses_file: Path) -> dict[str, dict]:
+    """
+    Returns the chat responses checkpointed by an earlier run, by question id.
+    The error responses are skipped, so that the questions are answered again.
+    """
+    chat_responses = dict()
+    if not chat_responses_file.exists():
+        return chat_responses
+    with jsonlines.open(chat_responses_file) as reader:
+        # skips the last line, if it's truncated by a crash
+        for chat_response in reader.iter(skip_invalid=True):
+            if is_error_response(chat_response):
+                chat_responses.pop(chat_response["question_id"], None)
+            else:
+                chat_responses[chat_response["question_id"]] = chat_response
+    return chat_responses
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    """Return the q-th percentile of the values with the nearest-rank method."""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[max(0, math.ceil(q / 100 * len(values)) - 1)]
+
+
+def summarize_run(chat_responses: list[dict], elapsed_sec: float) -> dict[str, Any]:
+    wall_times = [
+        chat_response["wall_time_sec"]
+        for chat_response in chat_responses
+        if "wall_time_sec" in chat_response
+    ]
+    return {
+        "questions": len(chat_responses),
+        "errors": sum(map(is_error_response, chat_responses)),
+        "elapsed_sec": elapsed_sec,
+        "questions_per_minute": (
+            60 * len(chat_responses) / elapsed_sec if elapsed_sec else None
+        ),
+        "wall_time_sec_p50": percentile(wall_times, 50),
+        "wall_time_sec_p95": percentile(wall_times, 95),
+        "input_tokens": sum(
+            chat_response.get("input_tokens", 0) for chat_response in chat_responses
+        ),
+        "output_tokens": sum(
+            chat_response.get("output_tokens", 0) for chat_response in chat_responses
+        ),
+    }
+
+
+async def answer_questions(
+    agent: CompiledStateGraph,
+    questions: list[dict],
+    concurrency: int,
+    writer: jsonlines.Writer,
+    split_name: str,
+) -> list[dict]:
+    """
+    Answers the questions concurrently, and checkpoints each response,
+    as soon as it's ready.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def answer(question: dict) -> dict[str, Any]:
+        async with semaphore:
+            start = time.perf_counter()
+            chat_response = await run_agent(agent, question)
+            chat_response["wall_time_sec"] = time.perf_counter() - start
+            return chat_response
+
+    chat_responses = []
+    tasks = [asyncio.create_task(answer(question)) for question in questions]
+    try:
+        for task in tqdm(
+            asyncio.as_completed(tasks),
+            total=len(tasks),
+            desc=f"Processing questions from {split_name} split",
+        ):
+            chat_response = await task
+            writer.write(chat_response)
+            chat_responses.append(chat_response)
+    finally:
+        for task in tasks:
+            task.cancel()
+    return chat_responses
+
+
 async def run_evaluation_on_split(
     agent: CompiledStateGraph,
     split: list[dict],
     split_name: str,
     results_dir: Path,
+    concurrency: int = 1,
 ) -> None:
-    chat_responses = dict()
     chat_responses_file = results_dir / f"chat_responses_{split_name}.jsonl"
-    with jsonlines.open(chat_responses_file, mode="w") as writer:
-        for template in tqdm(
-            split, desc=f"Processing templates from {split_name} split"
-        ):
-            for question in template["questions"]:
-                chat_response = run_agent(agent, question)
-                writer.write(chat_response)
-                chat_responses[question["id"]] = chat_response
+    chat_responses = load_chat_responses(chat_responses_file)
+    questions = [
+        question
+        for template in split
+        for question in template["questions"]
+        if question["id"] not in chat_responses
+    ]
+    if chat_responses:
+        print(
+            f"Resuming the {split_name} split: {len(chat_responses)} questions "
+            f"are already answered, {len(questions)} remain"
+        )
+
+    start = time.perf_counter()
+    with jsonlines.open(chat_responses_file, mode="a", flush=True) as writer:
+        new_chat_responses = await answer_questions(
+            agent, questions, concurrency, writer, split_name
+        )
+    run_summary = summarize_run(new_chat_responses, time.perf_counter() - start)
+    print(f"Run summary of the {split_name} split: {run_summary}")
+    save_as_yaml(results_dir / f"run_summary_{split_name}.yaml", run_summary)
+    for chat_response in new_chat_responses:
+        chat_responses[chat_response["question_id"]] = chat_response
 
     per_question_eval = await run_evaluation(split, chat_responses)
     evaluation_results_file = results_dir / f"evaluation_per_question_{split_name}.yaml"
@@ -98,9 +228,14 @@ def is_error_response(response: dict[str, Any]) -> bool:
     stop=stop_after_attempt(5),
     wait=wait_exponential(multiplier=1, min=1, max=60),
 )
-def run_agent(agent: CompiledStateGraph, question: dict) -> dict[str, Any]:
-    chat_response = run_agent_for_evaluation(
-        agent, question["id"], {"messages": [("user", question["question_text"])]}
+async def run_agent(agent: CompiledStateGraph, question: dict) -> dict[str, Any]:
+    # the agent runs in a worker thread, and the retries wait without blocking
+    # the other questions
+    chat_response = await asyncio.to_thread(
+        run_agent_for_evaluation,
+        agent,
+        question["id"],
+        {"messages": [("user", question["question_text"])]},
     )
     if "status" in chat_response and chat_response["status"] == "error":
         print(
@@ -115,20 +250,43 @@ def main():
     args = args_parser.parse_args()
 
     results_dir = Path(args.results_dir)
-    timestamp = datetime.now(tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
-    results_dir = results_dir / timestamp
-    results_dir.mkdir(parents=True, exist_ok=True)
+    previous_runs = sorted(results_dir.glob("*T*Z")) if results_dir.exists() else []
+    if args.resume and previous_runs:
+        results_dir = previous_runs[-1]
+        print(f"Resuming the run in {results_dir}")
+    else:
+        timestamp = datetime.now(tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        results_dir = results_dir / timestamp
+        results_dir.mkdir(parents=True, exist_ok=True)
 
-    agent: CompiledStateGraph = Talk2PowerSystemAgentFactory(
-        Path(args.chat_config_path),
-    ).get_agent()
+    agent_factory = Talk2PowerSystemAgentFactory(Path(args.chat_config_path))
+    if args.llm_requests_per_minute:
+        # shared by the concurrent questions, and applied to each LLM call
+        agent_factory.model.rate_limiter = InMemoryRateLimiter(
+            requests_per_second=args.llm_requests_per_minute / 60,
+            check_every_n_seconds=0.1,
+            max_bucket_size=args.concurrency,
+        )
+    agent: CompiledStateGraph = agent_factory.get_agent()
 
     if args.split_dataset:
         _, dev_split, test_split = load_and_split_qa_dataset(Path(args.qa_dataset_path))
         dev_split = dev_split[: args.n_templates]
         test_split = test_split[: args.n_templates]
-        asyncio.run(run_evaluation_on_split(agent, dev_split, "dev", results_dir))
-        asyncio.run(run_evaluation_on_split(agent, test_split, "test", results_dir))
+        asyncio.run(
+            run_evaluation_on_split(
+                agent, dev_split, "dev", results_dir, args.concurrency
+            )
+        )
+        asyncio.run(
+            run_evaluation_on_split(
+                agent, test_split, "test", results_dir, args.concurrency
+            )
+        )
     else:
         qa_dataset = load_qa_dataset(Path(args.qa_dataset_path))
-        asyncio.run(run_evaluation_on_split(agent, qa_dataset, "test", results_dir))
+        asyncio.run(
+            run_evaluation_on_split(
+                agent, qa_dataset, "test", results_dir, args.concurrency
+            )
+        )
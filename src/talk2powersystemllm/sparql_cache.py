@@ -0,0 +1,243 @@
+import hashlib
+import io
+import json
+import logging
+import re
+import threading
+from dataclasses import dataclass
+from typing import Callable
+
+from cachetools import LRUCache
+from pyparsing import ParseException, ParseResults
+from rdflib import Graph
+from rdflib.plugins.sparql import parser
+from rdflib.plugins.sparql.parserutils import CompValue
+from rdflib.query import Result
+from redis import Redis, RedisCluster
+from redis.exceptions import RedisError
+from ttyg.graphdb import GraphDB
+
+logger = logging.getLogger(__name__)
+
+_QUERY_TOKENS = re.compile(
+    r'("""[\s\S]*?"""'
+    r"|'''[\s\S]*?'''"
+    r'|"(?:[^"\\\n]|\\.)*"'
+    r"|'(?:[^'\\\n]|\\.)*'"
+    r"|<[^<>\"{}|^`\\\s]*>)"
+    r"|((?:\s+|#[^\n]*)+)"
+)
+_GRAPH_RESULT_TYPES = ("CONSTRUCT", "DESCRIBE")
+# functions returning a different value on each evaluation of a query
+_NON_DETERMINISTIC_FUNCTIONS = ("NOW", "RAND", "UUID", "STRUUID", "BNODE")
+_NON_DETERMINISTIC_CALL = re.compile(
+    rf"\b(?:{'|'.join(_NON_DETERMINISTIC_FUNCTIONS)})\s*\(", re.IGNORECASE
+)
+
+
+def normalize_query(query: str) -> str:
+    """
+    Removes the comments and collapses the whitespaces in a SPARQL query,
+    leaving the string literals and the IRIs intact.
+    """
+    return _QUERY_TOKENS.sub(
+        lambda match: match.group(1) if match.group(1) else " ", query
+    ).strip()
+
+
+def _builtin_names(value: ParseResults | CompValue | list) -> set[str]:
+    if isinstance(value, CompValue):
+        names = {value.name}
+        values = value.values()
+    elif isinstance(value, (ParseResults, list)):
+        names = set()
+        values = value
+    else:
+        return set()
+    for item in values:
+        names |= _builtin_names(item)
+    return names
+
+
+def is_deterministic(query: str) -> bool:
+    """
+    Returns `False`, if the SPARQL query calls NOW(), RAND(), UUID(), STRUUID()
+    or BNODE(), so that its results differ on each evaluation.
+    The query is parsed only if one of the function names appears in its text.
+    """
+    if not _NON_DETERMINISTIC_CALL.search(query):
+        return True
+    try:
+        # the lock, with which GraphDB serializes the not thread-safe rdflib parser
+        with GraphDB._lock:
+            parsed_query = parser.parseQuery(query)
+    except ParseException:
+        # the syntax error is reported by GraphDB, and errors aren't cached
+        return True
+    return not {
+        f"Builtin_{name}" for name in _NON_DETERMINISTIC_FUNCTIONS
+    } & _builtin_names(parsed_query)
+
+
+def serialize_result(result: Result) -> bytes:
+    if result.type in _GRAPH_RESULT_TYPES:
+        return result.graph.serialize(format="nt", encoding="utf-8")
+    return result.serialize(format="json", encoding="utf-8")
+
+
+def deserialize_result(result_type: str, data: bytes) -> Result:
+    if result_type in _GRAPH_RESULT_TYPES:
+        result = Result(result_type)
+        result.graph = Graph().parse(data=data, format="nt")
+        return result
+    return Result.parse(io.BytesIO(data), format="json")
+
+
+@dataclass(frozen=True)
+class _CacheEntry:
+    result: Result
+    query: str
+    size: int
+
+
+class SparqlResultCache:
+    """
+    Cache of SPARQL query results shared by the GraphDB tools.
+
+    The results are kept in-process in an LRU cache bounded by the size of the
+    serialized results, and optionally in Redis, so that they are shared by the
+    worker processes. The entries are keyed by the repository and the normalized
+    query text, and are dropped when the version of the data changes.
+    The queries calling non-deterministic functions, such as NOW(), bypass the cache.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        max_entry_size: int,
+        redis_ttl: int,
+        redis_client: Redis | RedisCluster | None = None,
+    ):
+        self.max_entry_size = max_entry_size
+        self.redis_ttl = redis_ttl
+        self.redis_client = redis_client
+        self.__cache = LRUCache(maxsize=max_size, getsizeof=lambda entry: entry.size)
+        self.__lock = threading.Lock()
+        self.__version = ""
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.bytes_saved = 0
+
+    def __key(self, repository_id: str, query: str, validation: bool) -> str:
+        digest = hashlib.sha256(
+            "\0".join(
+                (self.__version, repository_id, str(validation), normalize_query(query))
+            ).encode("utf-8")
+        ).hexdigest()
+        return f"sparql_cache:{digest}"
+
+    def get_or_eval(
+        self,
+        repository_id: str,
+        query: str,
+        validation: bool,
+        evaluate: Callable[[], tuple[Result, str]],
+    ) -> tuple[Result, str]:
+        if not is_deterministic(query):
+            with self.__lock:
+                self.bypasses += 1
+            return evaluate()
+
+        key = self.__key(repository_id, query, validation)
+        with self.__lock:
+            entry = self.__cache.get(key)
+            if entry:
+                self.hits += 1
+                self.bytes_saved += entry.size
+                return entry.result, entry.query
+
+        entry = self.__redis_get(key)
+        if entry:
+            with self.__lock:
+                self.redis_hits += 1
+                self.bytes_saved += entry.size
+                self.__cache[key] = entry
+            return entry.result, entry.query
+
+        with self.__lock:
+            self.misses += 1
+        result, actual_query = evaluate()
+
+        data = serialize_result(result)
+        if len(data) <= self.max_entry_size:
+            with self.__lock:
+                self.__cache[key] = _CacheEntry(result, actual_query, len(data))
+            self.__redis_set(key, result.type, actual_query, data)
+        return result, actual_query
+
+    def __redis_get(self, key: str) -> _CacheEntry | None:
+        if not self.redis_client:
+            return None
+        try:
+            value = self.redis_client.get(key)
+        except RedisError as error:
+            logger.warning(f"Can't read SPARQL cache entry from Redis: {error}")
+            return None
+        if not value:
+            return None
+        try:
+            value = json.loads(value)
+            data = value["data"].encode("utf-8")
+            return _CacheEntry(
+                deserialize_result(value["type"], data), value["query"], len(data)
+            )
+        except Exception as error:
+            # e.g. an entry written by another version, it's overwritten on the miss
+            logger.warning(f"Can't decode SPARQL cache entry from Redis: {error}")
+            return None
+
+    def __redis_set(self, key: str, result_type: str, query: str, data: bytes) -> None:
+        if not self.redis_client:
+            return
+        value = json.dumps(
+            {"type": result_type, "query": query, "data": data.decode("utf-8")}
+        )
+        try:
+            self.redis_client.set(key, value, ex=self.redis_ttl)
+        except RedisError as error:
+            logger.warning(f"Can't write SPARQL cache entry to Redis: {error}")
+
+    def update_version(self, version: str) -> None:
+        """
+        Sets the version of the data in GraphDB.
+        If it differs from the current one, the cached results are invalidated.
+        The version is part of the Redis keys, so the stale entries there expire.
+        """
+        version = hashlib.sha256(version.encode("utf-8")).hexdigest()
+        with self.__lock:
+            if version == self.__version:
+                return
+            if self.__version:
+                logger.info("GraphDB data changed, invalidating the SPARQL cache")
+            self.__version = version
+            self.__cache.clear()
+
+    @property
+    def info(self) -> dict[str, int | float]:
+        with self.__lock:
+            requests = self.hits + self.redis_hits + self.misses
+            return {
+                "hits": self.hits,
+                "redis_hits": self.redis_hits,
+                "misses": self.misses,
+                "bypasses": self.bypasses,
+                "hit_ratio": (
+                    (self.hits + self.redis_hits) / requests if requests else 0.0
+                ),
+                "bytes_saved": self.bytes_saved,
+                "entries": len(self.__cache),
+                "size": int(self.__cache.currsize),
+                "maxsize": int(self.__cache.maxsize),
+            }
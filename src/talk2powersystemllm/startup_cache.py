@@ -0,0 +1,115 @@
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator
+
+logger = logging.getLogger(__name__)
+
+# Increment, when the way any of the cached artifacts is derived changes
+CACHE_FORMAT_VERSION = 1
+
+
+class StartupCache:
+    """
+    Cache of the artifacts derived at startup from the configuration, like the
+    serialized ontology schema or the rendered troubleshooting document.
+
+    Each artifact is stored in a file in `cache_dir`, named after the artifact and
+    the hash of the content it is derived from, so that changed sources are never
+    served stale. The cache is populated at build time by the `build_startup_cache`
+    script. If `cache_dir` is not set, the artifacts are always derived.
+    """
+
+    def __init__(self, cache_dir: Path | None = None):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def info(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+    @staticmethod
+    def key(name: str, sources: list[str | bytes]) -> str:
+        digest = hashlib.sha256(f"{name}\0{CACHE_FORMAT_VERSION}".encode("utf-8"))
+        for source in sources:
+            if isinstance(source, str):
+                source = source.encode("utf-8")
+            digest.update(b"\0")
+            digest.update(hashlib.sha256(source).digest())
+        return f"{name}-{digest.hexdigest()}"
+
+    def get_or_create(
+        self, name: str, sources: list[str | bytes], create: Callable[[], str]
+    ) -> str:
+        """
+        Returns the artifact `name` derived from the `sources`.
+        If it's not in the cache, it's created with `create` and stored.
+        """
+        if not self.cache_dir:
+            return create()
+
+        path = self.cache_dir / self.key(name, sources)
+        try:
+            value = path.read_text(encoding="utf-8")
+            self.hits += 1
+            logger.debug(f"Loaded {name} from the startup cache {path}")
+            return value
+        except FileNotFoundError:
+            pass
+        except OSError as error:
+            logger.warning(f"Can't read {name} from the startup cache: {error}")
+
+        self.misses += 1
+        value = create()
+        self.__write(path, value)
+        return value
+
+    @staticmethod
+    def __write(path: Path, value: str) -> None:
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # write to a temporary file and rename it, so that the concurrently
+            # starting workers never read a partially written file
+            with tempfile.NamedTemporaryFile(
+                "w", encoding="utf-8", dir=path.parent, delete=False
+            ) as tmp_file:
+                tmp_file.write(value)
+            os.replace(tmp_file.name, path)
+        except OSError as error:
+            logger.warning(f"Can't write {path.name} to the startup cache: {error}")
+
+
+class PhaseTimer:
+    """
+    Measures the duration of the startup phases and logs them as a single report.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.phases: dict[str, float] = {}
+        self.__start = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + (
+                time.perf_counter() - start
+            )
+
+    def report(self) -> str:
+        total = time.perf_counter() - self.__start
+        phases = ", ".join(
+            f"{name}={duration * 1000:.0f}ms" for name, duration in self.phases.items()
+        )
+        return f"{self.name} took {total * 1000:.0f}ms: {phases}"
+
+    def log_report(self) -> None:
+        logger.info(self.report())
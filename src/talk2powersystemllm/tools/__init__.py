@@ -1,15 +1,52 @@
-from .cognite import CogniteSession, RetrieveDataPointsTool, RetrieveTimeSeriesTool
-from .graphics_tool import GraphDBVisualGraphArtifact, GraphicsTool, SvgArtifact
+import importlib
+from typing import TYPE_CHECKING
+
+from .graphdb_tools import (
+    AsyncAutocompleteSearchTool,
+    AsyncGraphDBTool,
+    AsyncRetrievalQueryTool,
+    AsyncSparqlQueryTool,
+)
+from .graphics_tool import (
+    GraphDBVisualGraphArtifact,
+    GraphicsTool,
+    SvgArtifact,
+    validate_graphics_sparql_query_template,
+)
 from .now_tool import NowTool
 from .user_datetime_context import user_datetime_ctx
 
+if TYPE_CHECKING:
+    from .cognite import CogniteSession, RetrieveDataPointsTool, RetrieveTimeSeriesTool
+
+# The Cognite SDK is slow to import, so the Cognite tools are imported on first use,
+# which happens only if Cognite is enabled
+_LAZY_IMPORTS = {
+    "CogniteSession": ".cognite",
+    "RetrieveDataPointsTool": ".cognite",
+    "RetrieveTimeSeriesTool": ".cognite",
+}
+
+
+def __getattr__(name: str):
+    if name in _LAZY_IMPORTS:
+        module = importlib.import_module(_LAZY_IMPORTS[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 __all__ = [
     "CogniteSession",
     "RetrieveDataPointsTool",
     "RetrieveTimeSeriesTool",
+    "AsyncAutocompleteSearchTool",
+    "AsyncGraphDBTool",
+    "AsyncRetrievalQueryTool",
+    "AsyncSparqlQueryTool",
     "GraphDBVisualGraphArtifact",
     "GraphicsTool",
     "SvgArtifact",
+    "validate_graphics_sparql_query_template",
     "NowTool",
     "user_datetime_ctx",
 ]
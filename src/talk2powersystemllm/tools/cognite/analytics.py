@@ -0,0 +1,291 @@
+import re
+from dataclasses import dataclass, replace
+from typing import Literal
+
+import numpy as np
+
+from talk2powersystemllm.tools.cognite.result_shaping import SeriesData, format_value
+
+# ``<positive-integer>(s|m|h|d|w)``, the format of the time shifts of Cognite
+WINDOW_PATTERN = r"^([1-9][0-9]*)(s|m|h|d|w)$"
+WINDOW_UNITS = {"s": "s", "m": "m", "h": "h", "d": "D", "w": "W"}
+
+
+def parse_window(window: str) -> np.timedelta64:
+    match = re.match(WINDOW_PATTERN, window)
+    if not match:
+        raise ValueError(
+            f"Invalid window {window}, "
+            f"expected <positive-integer>(s|m|h|d|w), for example 1h"
+        )
+    return np.timedelta64(int(match.group(1)), WINDOW_UNITS[match.group(2)])
+
+
+def primary_column(series: SeriesData) -> str | None:
+    """
+    Returns the name of the first numeric column of the time series,
+    which is `value` for raw datapoints or the first requested aggregate,
+    or `None` for string time series.
+    """
+    for name, column in series.columns.items():
+        if np.issubdtype(column.dtype, np.number):
+            return name
+    return None
+
+
+def lttb_indexes(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Returns the indexes of the points selected by
+    the Largest-Triangle-Three-Buckets algorithm, which keeps the visual shape
+    of the series. The first and the last points are always selected.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # n_out - 2 buckets between the first and the last points
+    edges = np.linspace(1, n - 1, n_out - 1).astype("int64")
+    indexes = np.empty(n_out, dtype="int64")
+    indexes[0], indexes[-1] = 0, n - 1
+    finite = np.isfinite(y)
+    selected = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_stop = edges[i + 2] if i + 2 < len(edges) else n
+        next_finite = finite[stop:next_stop]
+        next_x = x[stop:next_stop].mean()
+        next_y = (
+            y[stop:next_stop][next_finite].mean() if next_finite.any() else y[selected]
+        )
+        # twice the areas of the triangles with the selected and the next points
+        areas = np.abs(
+            (x[selected] - next_x) * (y[start:stop] - y[selected])
+            - (x[selected] - x[start:stop]) * (next_y - y[selected])
+        )
+        selected = start + int(np.argmax(np.nan_to_num(areas, nan=-1.0)))
+        indexes[i + 1] = selected
+    return indexes
+
+
+def minmax_indexes(y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Returns the sorted indexes of the minimum and the maximum of each bucket,
+    together with the first and the last points.
+    """
+    n = len(y)
+    if n_out >= n:
+        return np.arange(n)
+
+    buckets = max(1, (n_out - 2) // 2)
+    size = -(-n // buckets)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(buckets, size)
+    nan = np.isnan(padded)
+    offsets = np.arange(buckets) * size
+    minima = offsets + np.argmin(np.where(nan, np.inf, padded), axis=1)
+    maxima = offsets + np.argmax(np.where(nan, -np.inf, padded), axis=1)
+    indexes = np.unique(np.concatenate([[0, n - 1], minima, maxima]))
+    return indexes[indexes < n]
+
+
+def downsample(
+    series: SeriesData, method: Literal["lttb", "minmax"], max_points: int
+) -> SeriesData:
+    """
+    Reduces the datapoints to at most `max_points` on the primary column.
+    The kept rows are actual datapoints with all their columns.
+    The statistics of all datapoints are added to the annotations.
+    """
+    name = primary_column(series)
+    n = len(series)
+    if name is None or n <= max_points:
+        return series
+
+    y = series.columns[name].astype("float64")
+    if method == "lttb":
+        x = (series.timestamps - series.timestamps[0]).astype("float64")
+        indexes = lttb_indexes(x, y, max_points)
+    else:
+        indexes = minmax_indexes(y, max_points)
+
+    return replace(
+        series,
+        timestamps=series.timestamps[indexes],
+        columns={key: column[indexes] for key, column in series.columns.items()},
+        annotations=[
+            *series.annotations,
+            *series.stats(),
+            f"downsampled with {method} from {n} to {len(indexes)} datapoints",
+        ],
+        downsampled_from=n,
+    )
+
+
+def rolling_statistics(
+    timestamps: np.ndarray, values: np.ndarray, window: np.timedelta64
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the mean and the standard deviation of the values
+    in the time window (t - window, t] ending at each timestamp.
+    Missing values are skipped.
+    """
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    sums = np.concatenate([[0.0], np.cumsum(filled)])
+    squares = np.concatenate([[0.0], np.cumsum(filled * filled)])
+    counts = np.concatenate([[0], np.cumsum(valid)])
+
+    left = np.searchsorted(timestamps, timestamps - window, side="right")
+    right = np.arange(1, len(timestamps) + 1)
+    count = counts[right] - counts[left]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = (sums[right] - sums[left]) / count
+        variance = (squares[right] - squares[left]) / count - mean * mean
+    return mean, np.sqrt(np.maximum(variance, 0.0))
+
+
+def add_rolling_statistics(series: SeriesData, window: str) -> SeriesData:
+    name = primary_column(series)
+    if name is None or not len(series):
+        return series
+    mean, std = rolling_statistics(
+        series.timestamps,
+        series.columns[name].astype("float64"),
+        parse_window(window),
+    )
+    return replace(
+        series,
+        columns={
+            **series.columns,
+            f"rolling_mean_{window}": mean,
+            f"rolling_std_{window}": std,
+        },
+    )
+
+
+def extrema_indexes(y: np.ndarray, n: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the indexes of the `n` highest local maxima
+    and of the `n` lowest local minima, ordered by their values.
+    The first point of a plateau is a local extremum.
+    """
+    if len(y) < 3:
+        return np.array([], dtype="int64"), np.array([], dtype="int64")
+    middle, previous, following = y[1:-1], y[:-2], y[2:]
+    peaks = np.flatnonzero((middle > previous) & (middle >= following)) + 1
+    troughs = np.flatnonzero((middle < previous) & (middle <= following)) + 1
+    peaks = peaks[np.argsort(-y[peaks], kind="stable")[:n]]
+    troughs = troughs[np.argsort(y[troughs], kind="stable")[:n]]
+    return peaks, troughs
+
+
+def add_extrema(series: SeriesData, n: int) -> SeriesData:
+    name = primary_column(series)
+    if name is None:
+        return series
+    peaks, troughs = extrema_indexes(series.columns[name].astype("float64"), n)
+    timestamps = np.datetime_as_string(series.timestamps, unit="s", timezone="UTC")
+    column = series.columns[name]
+    annotations = [
+        f"{kind} {name}: "
+        + (", ".join(f"{timestamps[i]}={format_value(column[i])}" for i in indexes))
+        for kind, indexes in (("peaks", peaks), ("troughs", troughs))
+        if len(indexes)
+    ]
+    return replace(series, annotations=[*series.annotations, *annotations])
+
+
+def drop_missing(series: SeriesData, name: str) -> SeriesData:
+    """Keeps only the datapoints with a value in the column `name`."""
+    valid = ~np.isnan(series.columns[name].astype("float64"))
+    return replace(
+        series,
+        timestamps=series.timestamps[valid],
+        columns={name: series.columns[name][valid].astype("float64")},
+    )
+
+
+def interpolate(series: SeriesData, name: str, grid: np.ndarray) -> np.ndarray:
+    """
+    Returns the values of the column `name` at the timestamps of the `grid`,
+    which must be within the period of the time series.
+    """
+    values = series.columns[name]
+    if series.is_step:
+        # the value holds until the next datapoint
+        return values[np.searchsorted(series.timestamps, grid, side="right") - 1]
+    origin = grid[0]
+    return np.interp(
+        (grid - origin).astype("float64"),
+        (series.timestamps - origin).astype("float64"),
+        values,
+    )
+
+
+def align(series_list: list[SeriesData]) -> SeriesData:
+    """
+    Aligns the primary columns of the time series on common timestamps,
+    the union of their timestamps within the period covered by all of them.
+    The values are interpolated linearly, or held for step time series.
+    """
+    names = [primary_column(series) for series in series_list]
+    if any(name is None for name in names):
+        raise ValueError("Only numeric time series can be aligned")
+    series_list = [
+        drop_missing(series, name) for series, name in zip(series_list, names)
+    ]
+    if any(not len(series) for series in series_list):
+        raise ValueError("Time series without datapoints can't be aligned")
+
+    start = max(series.timestamps[0] for series in series_list)
+    end = min(series.timestamps[-1] for series in series_list)
+    if start > end:
+        raise ValueError("The time series don't overlap and can't be aligned")
+    grid = np.unique(np.concatenate([series.timestamps for series in series_list]))
+    grid = grid[(grid >= start) & (grid <= end)]
+
+    columns = {}
+    for series, name in zip(series_list, names):
+        key = series.external_id
+        if name != "value":
+            key = f"{series.external_id}.{name}"
+        columns[key] = interpolate(series, name, grid)
+
+    units = ", ".join(f"{series.external_id}={series.unit}" for series in series_list)
+    return SeriesData(
+        external_id=",".join(str(series.external_id) for series in series_list),
+        unit=None,
+        timestamps=grid,
+        columns=columns,
+        annotations=[f"aligned, units: {units}"],
+    )
+
+
+@dataclass
+class DatapointsAnalytics:
+    """
+    Post-processing of the retrieved datapoints, before they are passed to the LLM.
+    The time series are aligned first, then the rolling statistics and the extrema
+    are computed on all datapoints, and finally the datapoints are downsampled.
+    """
+
+    downsample: Literal["lttb", "minmax"] | None = None
+    max_points: int = 200
+    rolling_window: str | None = None
+    extrema: int | None = None
+    align: bool = False
+
+    def apply(self, series_list: list[SeriesData]) -> list[SeriesData]:
+        if self.align and len(series_list) > 1:
+            series_list = [align(series_list)]
+        result = []
+        for series in series_list:
+            if self.rolling_window:
+                series = add_rolling_statistics(series, self.rolling_window)
+            if self.extrema:
+                series = add_extrema(series, self.extrema)
+            if self.downsample:
+                series = downsample(series, self.downsample, self.max_points)
+            result.append(series)
+        return result
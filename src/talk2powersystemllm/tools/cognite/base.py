@@ -1,7 +1,7 @@
 from abc import ABCMeta
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any
+from typing import Any, Literal
 
 import jwt
 from cognite.client import CogniteClient
@@ -138,4 +138,7 @@ class BaseCogniteTool(BaseTool, metaclass=ABCMeta):
 
     cognite_session: CogniteSession
     """The Cognite Session"""
+    max_result_tokens: int = 4000
+    """Approximate budget of LLM tokens for the result of a single tool call"""
     handle_tool_error: bool = True
+    response_format: Literal["content", "content_and_artifact"] = "content_and_artifact"
@@ -0,0 +1,334 @@
+import contextvars
+import datetime
+import math
+import threading
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+
+import numpy as np
+from cognite.client import CogniteClient
+from cognite.client.data_classes.datapoints import (
+    Aggregate,
+    DatapointsArray,
+    DatapointsArrayList,
+)
+from cognite.client.utils import timestamp_to_ms
+
+from talk2powersystemllm.tools.cognite.result_shaping import DATAPOINTS_COLUMNS
+from talk2powersystemllm.tracing import set_attributes, span
+
+# Estimated size of a datapoint in the NumPy arrays:
+# the timestamp and a float64 per value or aggregate
+BYTES_PER_VALUE = 8
+# Raw datapoints are split in time windows of at least this length
+MIN_WINDOW_MS = 60 * 60 * 1000
+
+
+class FetchLimitExceeded(ValueError):
+    """Raised when the datapoints of a tool call exceed the memory ceiling."""
+
+
+@dataclass
+class FetchPiece:
+    """A single `retrieve_arrays` request of a plan."""
+
+    external_ids: list[str]
+    start: int | str | datetime.datetime | None
+    end: int | str | datetime.datetime | None
+    limit: int | None
+    # the position of the time window of the piece
+    window: int = 0
+
+
+@dataclass
+class DatapointsFetchPlanner:
+    """
+    Splits the retrieval of the datapoints of many time series in requests
+    of at most `max_series_per_request` time series, and the retrieval of raw
+    datapoints over a known period in time windows, so that the requests keep
+    `max_concurrent_requests` threads busy. The requests are executed concurrently
+    and their arrays are merged per time series in the order of the request.
+
+    The datapoints of a tool call are limited to `max_fetch_bytes`.
+    The budget is split between the time series and passed to Cognite as a `limit`,
+    so at most one datapoint over the budget of a time series is downloaded.
+    The time windows of a time series start with equal shares of its budget.
+    A window, which fills its share, is continued from its last datapoint with
+    the budget left by the other windows. If a time series has more datapoints than
+    its budget, the retrieval fails with `FetchLimitExceeded`, and the requests,
+    which haven't started, are cancelled. The requests in flight can't be
+    interrupted. They complete in the background within the budget,
+    and their results are dropped.
+    """
+
+    max_series_per_request: int = 10
+    max_concurrent_requests: int = 4
+    max_fetch_bytes: int = 256 * 1024 * 1024
+
+    def plan(
+        self,
+        external_ids: list[str],
+        limit: int | None = None,
+        start: str | datetime.datetime | None = None,
+        end: str | datetime.datetime | None = None,
+        aggregates: Aggregate | list[Aggregate] | None = None,
+    ) -> tuple[list[FetchPiece], int]:
+        """
+        Returns the initial requests and the maximum number of datapoints
+        of a time series over all its time windows, allowed by the memory ceiling.
+        """
+        chunks = [
+            external_ids[i : i + self.max_series_per_request]
+            for i in range(0, len(external_ids), self.max_series_per_request)
+        ]
+
+        if aggregates is None:
+            values = 1
+        else:
+            values = 1 if isinstance(aggregates, str) else len(aggregates)
+        bytes_per_datapoint = BYTES_PER_VALUE * (1 + values)
+        budget = self.max_fetch_bytes // (bytes_per_datapoint * len(external_ids))
+        if budget < 1:
+            raise FetchLimitExceeded(
+                f"Too many time series requested at once, "
+                f"retrieve at most {self.max_fetch_bytes // bytes_per_datapoint} "
+                f"datapoints per call"
+            )
+        windows = [(start, end)]
+        # aggregates aren't split, because the windows must be aligned to the
+        # granularity, and a limit applies to the first datapoints of the period
+        if aggregates is None and limit is None and start is not None:
+            windows = self.split_period(start, end, len(chunks), budget + 1)
+        # one more datapoint than the budget, to find out if it's exceeded,
+        # split between the time windows
+        if limit is None:
+            piece_limit = (budget + 1) // len(windows)
+        else:
+            piece_limit = min(limit, budget + 1)
+        pieces = [
+            FetchPiece(chunk, window_start, window_end, piece_limit, window)
+            for chunk in chunks
+            for window, (window_start, window_end) in enumerate(windows)
+        ]
+        return pieces, budget
+
+    def split_period(
+        self,
+        start: str | datetime.datetime,
+        end: str | datetime.datetime | None,
+        requests: int,
+        max_windows: int,
+    ) -> list[tuple]:
+        """
+        Splits the period in time windows, if there are less requests than threads.
+        The windows are adjacent, because `start` is inclusive and `end` exclusive.
+        """
+        windows = min(math.ceil(self.max_concurrent_requests / requests), max_windows)
+        if windows <= 1:
+            return [(start, end)]
+        try:
+            start_ms = timestamp_to_ms(start)
+            end_ms = timestamp_to_ms("now" if end is None else end)
+        except (TypeError, ValueError):
+            # invalid time, which is reported by Cognite
+            return [(start, end)]
+        windows = min(windows, (end_ms - start_ms) // MIN_WINDOW_MS)
+        if windows <= 1:
+            return [(start, end)]
+        bounds = np.linspace(start_ms, end_ms, windows + 1).astype("int64").tolist()
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def fetch(
+        self,
+        client: CogniteClient,
+        external_id: str | list[str],
+        limit: int | None = None,
+        start: str | datetime.datetime | None = None,
+        end: str | datetime.datetime | None = None,
+        aggregates: Aggregate | list[Aggregate] | None = None,
+        granularity: str | None = None,
+    ) -> DatapointsArray | DatapointsArrayList | None:
+        external_ids = [external_id] if isinstance(external_id, str) else external_id
+        unique_ids = list(dict.fromkeys(external_ids))
+        pieces, budget = self.plan(unique_ids, limit, start, end, aggregates)
+        cancelled = threading.Event()
+
+        def retrieve(
+            piece: FetchPiece,
+        ) -> DatapointsArray | DatapointsArrayList | None:
+            with span(
+                "cognite.retrieve_datapoints.request",
+                {
+                    "cognite.external_id": piece.external_ids,
+                    "cognite.start": str(piece.start) if piece.start else None,
+                    "cognite.end": str(piece.end) if piece.end else None,
+                    "cognite.limit": piece.limit,
+                },
+            ) as current_span:
+                result = client.time_series.data.retrieve_arrays(
+                    external_id=(
+                        piece.external_ids[0]
+                        if isinstance(external_id, str)
+                        else piece.external_ids
+                    ),
+                    limit=piece.limit,
+                    start=piece.start,
+                    end=piece.end,
+                    aggregates=aggregates,
+                    granularity=granularity,
+                )
+                if cancelled.is_set():
+                    # the retrieval has already failed
+                    return None
+                self.check_budget(result, budget, limit)
+                set_attributes(current_span, {"cognite.bytes": nbytes(result)})
+                return result
+
+        if len(pieces) == 1:
+            return retrieve(pieces[0])
+
+        executor = ThreadPoolExecutor(
+            max_workers=min(self.max_concurrent_requests, len(pieces)),
+            thread_name_prefix="cognite",
+        )
+        futures = {}
+        # the datapoints of each time series, which aren't requested yet
+        available = dict.fromkeys(unique_ids, budget + 1)
+
+        def submit(piece: FetchPiece) -> None:
+            for key in piece.external_ids:
+                available[key] -= piece.limit
+            future = executor.submit(contextvars.copy_context().run, retrieve, piece)
+            futures[future] = piece
+
+        try:
+            for piece in pieces:
+                submit(piece)
+            parts = defaultdict(list)
+            fetched = defaultdict(int)
+            fetched_bytes = 0
+            # the time windows, which filled their limits, per time series
+            continued = defaultdict(list)
+            # the arrays are merged as the requests complete, and the remaining
+            # requests are cancelled on the first error
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    piece = futures.pop(future)
+                    result = future.result()
+                    fetched_bytes += nbytes(result)
+                    if fetched_bytes > self.max_fetch_bytes:
+                        raise FetchLimitExceeded(limit_exceeded_message(budget))
+                    for array in as_arrays(result):
+                        key = array.external_id
+                        fetched[key] += len(array)
+                        available[key] += piece.limit - len(array)
+                        self.check_budget(fetched[key], budget, limit)
+                        # the continuations of a window complete after it,
+                        # so the arrays of a window are in order
+                        parts[key].append((piece.window, array))
+                        if limit is None and len(array) and len(array) == piece.limit:
+                            continued[key].append(continuation(piece, array))
+                for key, rest in continued.items():
+                    while rest and available[key] > 0:
+                        piece = rest.pop()
+                        piece.limit = max(1, available[key] // (len(rest) + 1))
+                        submit(piece)
+        finally:
+            # the requests in flight can't be interrupted, they complete
+            # in the threads of the executor, which exit afterwards
+            cancelled.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        merged = {
+            key: concatenate([array for _, array in sorted(arrays, key=lambda p: p[0])])
+            for key, arrays in parts.items()
+        }
+        if isinstance(external_id, str):
+            return merged.get(external_id)
+        return DatapointsArrayList(
+            [merged[key] for key in external_ids if key in merged]
+        )
+
+    @staticmethod
+    def check_budget(
+        result: DatapointsArray | DatapointsArrayList | int | None,
+        budget: int,
+        limit: int | None,
+    ) -> None:
+        """
+        Raises `FetchLimitExceeded`, if a time series of the result,
+        or the given number of datapoints, exceeds the budget.
+        """
+        if limit is not None and limit <= budget:
+            return
+        if isinstance(result, int):
+            lengths = [result]
+        else:
+            lengths = [len(array) for array in as_arrays(result)]
+        if any(length > budget for length in lengths):
+            raise FetchLimitExceeded(limit_exceeded_message(budget))
+
+
+def limit_exceeded_message(budget: int) -> str:
+    return (
+        f"The time series have more than {budget} datapoints each, which is "
+        f"the memory limit of a single call. Use aggregates with a granularity, "
+        f"a shorter period or fewer time series."
+    )
+
+
+def continuation(piece: FetchPiece, array: DatapointsArray) -> FetchPiece:
+    """
+    Returns the request of the rest of the time window of the piece
+    after the last datapoint of the array. Its limit is set when it's submitted.
+    """
+    last = int(array.timestamp[-1].astype("datetime64[ms]").astype("int64"))
+    return FetchPiece([array.external_id], last + 1, piece.end, None, piece.window)
+
+
+def as_arrays(
+    result: DatapointsArray | DatapointsArrayList | None,
+) -> list[DatapointsArray]:
+    if isinstance(result, DatapointsArray):
+        return [result]
+    if isinstance(result, DatapointsArrayList):
+        return list(result)
+    return []
+
+
+def nbytes(result: DatapointsArray | DatapointsArrayList | None) -> int:
+    """Returns the size of the NumPy arrays of the datapoints."""
+    return sum(
+        array.timestamp.nbytes
+        + sum(
+            column.nbytes
+            for name in DATAPOINTS_COLUMNS
+            if (column := getattr(array, name, None)) is not None
+        )
+        for array in as_arrays(result)
+    )
+
+
+def concatenate(arrays: list[DatapointsArray]) -> DatapointsArray:
+    """Concatenates the datapoints of a time series from adjacent time windows."""
+    first = arrays[0]
+    if len(arrays) == 1:
+        return first
+    columns = {
+        name: np.concatenate([getattr(array, name) for array in arrays])
+        for name in ("timestamp", *DATAPOINTS_COLUMNS)
+        if getattr(first, name, None) is not None
+    }
+    return DatapointsArray(
+        id=first.id,
+        external_id=first.external_id,
+        is_string=first.is_string,
+        is_step=first.is_step,
+        type=first.type,
+        unit=first.unit,
+        unit_external_id=first.unit_external_id,
+        granularity=first.granularity,
+        **columns,
+    )
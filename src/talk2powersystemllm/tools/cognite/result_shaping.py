@@ -0,0 +1,225 @@
+import json
+import math
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+import numpy as np
+from cognite.client.data_classes import TimeSeriesList
+from cognite.client.data_classes.datapoints import DatapointsArray, DatapointsArrayList
+
+if TYPE_CHECKING:
+    from talk2powersystemllm.tools.cognite.analytics import DatapointsAnalytics
+
+# Rough estimate of the number of characters per LLM token
+CHARS_PER_TOKEN = 4
+MIN_ROWS = 1
+
+DATAPOINTS_COLUMNS = (
+    "value",
+    "average",
+    "max",
+    "min",
+    "count",
+    "sum",
+    "interpolation",
+    "step_interpolation",
+    "continuous_variance",
+    "discrete_variance",
+    "total_variation",
+    "count_good",
+    "count_uncertain",
+    "count_bad",
+    "duration_good",
+    "duration_uncertain",
+    "duration_bad",
+)
+TIME_SERIES_OMITTED_FIELDS = {
+    "id",
+    "createdTime",
+    "lastUpdatedTime",
+    "securityCategories",
+    "dataSetId",
+    "legacyName",
+}
+
+
+@dataclass
+class SeriesData:
+    """Column-oriented datapoints of a single time series."""
+
+    external_id: str | None
+    unit: str | None
+    timestamps: np.ndarray
+    columns: dict[str, np.ndarray]
+    is_step: bool = False
+    # lines rendered after the header, for example the detected peaks
+    annotations: list[str] = field(default_factory=list)
+    # the number of datapoints before downsampling
+    downsampled_from: int | None = None
+
+    @classmethod
+    def from_datapoints_array(cls, datapoints: DatapointsArray) -> "SeriesData":
+        columns = {}
+        for name in DATAPOINTS_COLUMNS:
+            column = getattr(datapoints, name, None)
+            if column is not None:
+                columns[name] = np.asarray(column)
+        return cls(
+            external_id=datapoints.external_id,
+            unit=getattr(datapoints, "unit", None),
+            timestamps=np.asarray(datapoints.timestamp, dtype="datetime64[ns]"),
+            columns=columns,
+            is_step=bool(getattr(datapoints, "is_step", False)),
+        )
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def header(self) -> str:
+        header = f"external_id={self.external_id}"
+        if self.unit:
+            header += f" unit={self.unit}"
+        if self.downsampled_from is not None:
+            return f"{header} datapoints={self.downsampled_from} shown={len(self)}"
+        return f"{header} datapoints={len(self)}"
+
+    def stats(self) -> list[str]:
+        lines = []
+        for name, column in self.columns.items():
+            if not np.issubdtype(column.dtype, np.number) or not len(column):
+                continue
+            column = column.astype("float64")
+            count = int(np.count_nonzero(~np.isnan(column)))
+            if not count:
+                continue
+            lines.append(
+                f"stats {name}: count={count} "
+                f"min={format_value(np.nanmin(column))} "
+                f"max={format_value(np.nanmax(column))} "
+                f"mean={format_value(np.nanmean(column))}"
+            )
+        return lines
+
+    def rows(self, start: int, stop: int) -> list[str]:
+        timestamps = self.timestamps[start:stop]
+        unit = "ms" if np.any(timestamps.astype("int64") % 1_000_000_000 != 0) else "s"
+        timestamps = np.datetime_as_string(timestamps, unit=unit, timezone="UTC")
+        columns = [column[start:stop] for column in self.columns.values()]
+        return [
+            ",".join([timestamps[i], *(format_value(c[i]) for c in columns)])
+            for i in range(len(timestamps))
+        ]
+
+    def render(self, max_tokens: int) -> str:
+        """
+        Renders the datapoints as a CSV-like table, which fits in `max_tokens`.
+        If the table doesn't fit, only the first and the last rows are kept,
+        and summary statistics of all datapoints are added.
+        """
+        n = len(self)
+        if n == 0:
+            return "\n".join([self.header(), *self.annotations])
+        lines = [
+            self.header(),
+            *self.annotations,
+            ",".join(["timestamp", *self.columns]),
+        ]
+
+        max_chars = max_tokens * CHARS_PER_TOKEN
+        sample = self.rows(0, min(n, 10))
+        row_chars = max(len(row) for row in sample) + 1
+        fixed_chars = sum(len(line) + 1 for line in lines)
+        if fixed_chars + n * row_chars <= max_chars:
+            return "\n".join(lines + self.rows(0, n))
+
+        # the statistics of downsampled datapoints are already in the annotations
+        stats = self.stats() if self.downsampled_from is None else []
+        fixed_chars += sum(len(line) + 1 for line in stats) + 40
+        head = max(MIN_ROWS, (max_chars - fixed_chars) // (2 * row_chars))
+        head = min(head, n // 2)
+        tail = n - head
+        return "\n".join(
+            [*lines[:-1], *stats, lines[-1]]
+            + self.rows(0, head)
+            + [f"... {tail - head} rows omitted ..."]
+            + self.rows(tail, n)
+        )
+
+
+def format_value(value) -> str:
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    if isinstance(value, str) and ("," in value or "\n" in value):
+        return json.dumps(value)
+    return str(value)
+
+
+def shape_datapoints(
+    result: DatapointsArray | DatapointsArrayList | None,
+    max_tokens: int,
+    analytics: "DatapointsAnalytics | None" = None,
+) -> tuple[str, list[dict] | None]:
+    """
+    Returns the content for the LLM and the full datapoints as an artifact.
+    If `analytics` is passed, the datapoints passed to the LLM are post-processed,
+    while the artifact still contains the retrieved datapoints.
+    """
+    if result is None:
+        return "No datapoints found", None
+    if isinstance(result, DatapointsArray):
+        arrays = [result]
+    elif isinstance(result, DatapointsArrayList):
+        arrays = list(result)
+    else:
+        return str(result), None
+
+    if not arrays:
+        return "No datapoints found", []
+
+    series = [SeriesData.from_datapoints_array(array) for array in arrays]
+    if analytics is not None:
+        series = analytics.apply(series)
+    series_max_tokens = max(1, max_tokens // len(series))
+    content = "\n\n".join(s.render(series_max_tokens) for s in series)
+    return content, [array.dump() for array in arrays]
+
+
+def shape_time_series(
+    result: TimeSeriesList, max_tokens: int
+) -> tuple[str, list[dict] | None]:
+    """
+    Returns the content for the LLM and the full time series as an artifact.
+    Each time series is a compact JSON line without the fields,
+    which are not useful for answering questions.
+    If the time series don't fit in the budget, only the first ones are kept.
+    """
+    if not isinstance(result, TimeSeriesList):
+        return str(result), None
+
+    dumped = [time_series.dump(camel_case=True) for time_series in result]
+    if not dumped:
+        return "No time series found", []
+
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    lines, chars = [], 0
+    for item in dumped:
+        line = json.dumps(
+            {k: v for k, v in item.items() if k not in TIME_SERIES_OMITTED_FIELDS},
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        if lines and chars + len(line) + 1 > max_chars:
+            break
+        lines.append(line)
+        chars += len(line) + 1
+
+    if len(lines) < len(dumped):
+        lines.append(
+            f"... {len(dumped) - len(lines)} more time series omitted, "
+            f"use a more specific filter ..."
+        )
+    return "\n".join(lines), dumped
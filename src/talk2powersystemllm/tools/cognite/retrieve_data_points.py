@@ -1,5 +1,5 @@
 import datetime
-from typing import Type
+from typing import Literal, Type
 
 from cognite.client.data_classes.datapoints import (
     Aggregate,
@@ -11,13 +11,22 @@ from langchain_core.tools import ToolException
 from pydantic import BaseModel, Field
 from ttyg.utils import timeit
 
+from talk2powersystemllm.tools.cognite.analytics import (
+    WINDOW_PATTERN,
+    DatapointsAnalytics,
+)
 from talk2powersystemllm.tools.cognite.base import BaseCogniteTool
+from talk2powersystemllm.tools.cognite.fetch_planner import DatapointsFetchPlanner
+from talk2powersystemllm.tools.cognite.result_shaping import shape_datapoints
+from talk2powersystemllm.tracing import set_attributes, span
 
 
 class RetrieveDataPointsTool(BaseCogniteTool):
     """
     A tool, which retrieves datapoints for one or more time series.
     Supported arguments: `external_id`, `limit`, `start`, `end`, `aggregates` and `granularity`.
+    The datapoints can be post-processed before they are passed to the LLM
+    with the arguments `downsample`, `max_points`, `rolling_window`, `extrema` and `align`.
     """
 
     class ArgumentsSchema(BaseModel):
@@ -118,10 +127,56 @@ class RetrieveDataPointsTool(BaseCogniteTool):
             default=None,
             examples=["1w", "1mo", "2days"],
         )
+        downsample: Literal["lttb", "minmax"] | None = Field(
+            description="Reduces the datapoints of each time series to at most `max_points`, "
+            "after they are retrieved. "
+            "``lttb`` (Largest-Triangle-Three-Buckets) keeps the shape of the curve, "
+            "``minmax`` keeps the minimum and the maximum of each time bucket. "
+            "The count, min, max and mean of all datapoints are also returned. "
+            "Use it instead of a limit, when the user asks about the trend or the extremes "
+            "over a long period of time.",
+            default=None,
+        )
+        max_points: int = Field(
+            description="Maximum number of datapoints of each time series, "
+            "when `downsample` is used.",
+            ge=3,
+            le=10000,
+            default=200,
+        )
+        rolling_window: str | None = Field(
+            description="Adds the rolling mean and the rolling standard deviation of the values "
+            "over this time window, ending at each datapoint. "
+            "The format is ``<positive-integer>(s|m|h|d|w)``.",
+            pattern=WINDOW_PATTERN,
+            default=None,
+            examples=["15m", "1h", "7d"],
+        )
+        extrema: int | None = Field(
+            description="Returns the timestamps and the values of this number of "
+            "the highest peaks and of the lowest troughs of each time series, "
+            "computed over all datapoints.",
+            ge=1,
+            le=50,
+            default=None,
+        )
+        align: bool = Field(
+            description="Aligns several time series on common timestamps "
+            "within the period covered by all of them, so that their values "
+            "can be compared row by row. "
+            "The values are interpolated linearly, or held for step time series.",
+            default=False,
+        )
 
     name: str = "retrieve_data_points"
     description: str = "Retrieve datapoints for one or more time series"
     args_schema: Type[BaseModel] = ArgumentsSchema
+    max_series_per_request: int = 10
+    """Maximum number of time series retrieved with a single request"""
+    max_concurrent_requests: int = 4
+    """Maximum number of concurrent requests of a single tool call"""
+    max_fetch_bytes: int = 256 * 1024 * 1024
+    """Memory ceiling of the retrieved datapoints of a single tool call"""
 
     @timeit
     def _run(
@@ -132,19 +187,65 @@ class RetrieveDataPointsTool(BaseCogniteTool):
         end: str | None = None,
         aggregates: Aggregate | list[Aggregate] | None = None,
         granularity: str | None = None,
+        downsample: Literal["lttb", "minmax"] | None = None,
+        max_points: int = 200,
+        rolling_window: str | None = None,
+        extrema: int | None = None,
+        align: bool = False,
         run_manager: CallbackManagerForToolRun | None = None,
-    ) -> DatapointsArray | DatapointsArrayList | None:
+    ) -> tuple[str, list[dict] | None]:
         try:
             start = self._try_to_parse_as_iso_format(start)
             end = self._try_to_parse_as_iso_format(end)
-            return self.cognite_session.client().time_series.data.retrieve_arrays(
-                external_id=external_id,
-                limit=limit,
-                start=start,
-                end=end,
-                aggregates=aggregates,
-                granularity=granularity,
+            with span(
+                "cognite.retrieve_datapoints",
+                {
+                    "cognite.external_id": external_id,
+                    "cognite.limit": limit,
+                    "cognite.start": str(start) if start else None,
+                    "cognite.end": str(end) if end else None,
+                    "cognite.aggregates": aggregates,
+                    "cognite.granularity": granularity,
+                    "cognite.downsample": downsample,
+                    "cognite.rolling_window": rolling_window,
+                    "cognite.extrema": extrema,
+                    "cognite.align": align,
+                },
+            ) as current_span:
+                fetch_planner = DatapointsFetchPlanner(
+                    max_series_per_request=self.max_series_per_request,
+                    max_concurrent_requests=self.max_concurrent_requests,
+                    max_fetch_bytes=self.max_fetch_bytes,
+                )
+                datapoints: DatapointsArray | DatapointsArrayList | None = (
+                    fetch_planner.fetch(
+                        self.cognite_session.client(),
+                        external_id=external_id,
+                        limit=limit,
+                        start=start,
+                        end=end,
+                        aggregates=aggregates,
+                        granularity=granularity,
+                    )
+                )
+                if datapoints is not None:
+                    arrays = (
+                        [datapoints]
+                        if isinstance(datapoints, DatapointsArray)
+                        else datapoints
+                    )
+                    set_attributes(
+                        current_span,
+                        {"cognite.datapoints": sum(len(array) for array in arrays)},
+                    )
+            analytics = DatapointsAnalytics(
+                downsample=downsample,
+                max_points=max_points,
+                rolling_window=rolling_window,
+                extrema=extrema,
+                align=align,
             )
+            return shape_datapoints(datapoints, self.max_result_tokens, analytics)
         except Exception as e:
             raise ToolException(str(e))
 
@@ -7,6 +7,8 @@ from pydantic import BaseModel, Field
 from ttyg.utils import timeit
 
 from talk2powersystemllm.tools.cognite.base import BaseCogniteTool
+from talk2powersystemllm.tools.cognite.result_shaping import shape_time_series
+from talk2powersystemllm.tracing import set_attributes, span
 
 
 class RetrieveTimeSeriesTool(BaseCogniteTool):
@@ -48,7 +50,7 @@ class RetrieveTimeSeriesTool(BaseCogniteTool):
         limit: int | None = 25,
         mrid: str | list[str] | None = None,
         run_manager: CallbackManagerForToolRun | None = None,
-    ) -> str:
+    ) -> tuple[str, list[dict] | None]:
         try:
             exists_filter = filters.Exists(["metadata", "RNDP_mrid"])
             advanced_filter = exists_filter
@@ -60,8 +62,14 @@ class RetrieveTimeSeriesTool(BaseCogniteTool):
                     mrid_filter = filters.In(["metadata", "RNDP_mrid"], mrid)
                 advanced_filter = exists_filter & mrid_filter
 
-            return self.cognite_session.client().time_series.list(
-                limit=limit, advanced_filter=advanced_filter
-            )
+            with span(
+                "cognite.list_time_series",
+                {"cognite.mrid": mrid, "cognite.limit": limit},
+            ) as current_span:
+                time_series = self.cognite_session.client().time_series.list(
+                    limit=limit, advanced_filter=advanced_filter
+                )
+                set_attributes(current_span, {"cognite.time_series": len(time_series)})
+            return shape_time_series(time_series, self.max_result_tokens)
         except Exception as e:
             raise ToolException(str(e))
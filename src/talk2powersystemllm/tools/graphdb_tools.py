@@ -0,0 +1,39 @@
+from typing import Any
+
+from ttyg.tools import (
+    AutocompleteSearchTool,
+    BaseGraphDBTool,
+    RetrievalQueryTool,
+    SparqlQueryTool,
+)
+
+from talk2powersystemllm.graphdb import AsyncGraphDB
+
+
+class AsyncGraphDBTool(BaseGraphDBTool):
+    """
+    GraphDB tool, which runs on the thread pool of `async_graph` when the agent is
+    invoked asynchronously, instead of on the default executor of the event loop.
+    """
+
+    async_graph: AsyncGraphDB | None = None
+
+    async def _arun(self, *args: Any, **kwargs: Any) -> Any:
+        if not self.async_graph:
+            return await super()._arun(*args, **kwargs)
+
+        if kwargs.get("run_manager"):
+            kwargs["run_manager"] = kwargs["run_manager"].get_sync()
+        return await self.async_graph.run(self._run, *args, **kwargs)
+
+
+class AsyncSparqlQueryTool(AsyncGraphDBTool, SparqlQueryTool):
+    pass
+
+
+class AsyncAutocompleteSearchTool(AsyncGraphDBTool, AutocompleteSearchTool):
+    pass
+
+
+class AsyncRetrievalQueryTool(AsyncGraphDBTool, RetrievalQueryTool):
+    pass
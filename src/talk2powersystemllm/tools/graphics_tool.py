@@ -1,5 +1,5 @@
 import logging
-from typing import Literal, Tuple, Type
+from typing import ClassVar, Literal, Tuple, Type
 from urllib.parse import quote
 
 from langchain_core.callbacks import CallbackManagerForToolRun
@@ -12,6 +12,8 @@ from ttyg.tools import BaseArtifact, SparqlQueryTool
 from ttyg.utils import timeit
 from typing_extensions import Self
 
+from talk2powersystemllm.tools.graphdb_tools import AsyncGraphDBTool
+
 logger = logging.getLogger(__name__)
 
 
@@ -28,7 +30,26 @@ class GraphDBVisualGraphArtifact(GraphicArtifact):
     type: Literal["gdb_viz_graph"] = "gdb_viz_graph"
 
 
-class GraphicsTool(SparqlQueryTool):
+def validate_graphics_sparql_query_template(sparql_query_template: str) -> str:
+    """
+    Validates the SPARQL query template of the graphics tool is a SELECT query.
+    Returns the type of the query.
+    """
+
+    try:
+        parsed_query = prepareQuery(
+            sparql_query_template.format(iri="http://example.com/")
+        )
+    except ParseException as e:
+        raise ValueError("Graphics tool SPARQL query template is not valid.", e)
+
+    if parsed_query.algebra.name != "SelectQuery":
+        raise ValueError("Invalid query type. Only SELECT queries are supported.")
+
+    return parsed_query.algebra.name
+
+
+class GraphicsTool(AsyncGraphDBTool, SparqlQueryTool):
     """
     Displays a diagram specified by its IRI or
     a diagram specified by IRI of a diagram configuration and node IRI
@@ -72,6 +93,8 @@ SELECT ?link ?name ?format ?description ?kind {{
     }}
 }}"""
     args_schema: Type[BaseModel] = ArgumentsSchema
+    # templates, which are already validated, for example at build time
+    validated_sparql_query_templates: ClassVar[set[str]] = set()
 
     @model_validator(mode="after")
     def validate_sparql_query_template(self) -> Self:
@@ -79,16 +102,9 @@ SELECT ?link ?name ?format ?description ?kind {{
         Validate the SPARQL query template uses SELECT
         """
 
-        try:
-            parsed_query = prepareQuery(
-                self.sparql_query_template.format(iri="http://example.com/")
-            )
-        except ParseException as e:
-            raise ValueError("Graphics tool SPARQL query template is not valid.", e)
-
-        if parsed_query.algebra.name != "SelectQuery":
-            raise ValueError("Invalid query type. Only SELECT queries are supported.")
-
+        if self.sparql_query_template not in self.validated_sparql_query_templates:
+            validate_graphics_sparql_query_template(self.sparql_query_template)
+            self.validated_sparql_query_templates.add(self.sparql_query_template)
         return self
 
     @timeit
@@ -0,0 +1,124 @@
+import json
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterator, Literal
+
+if TYPE_CHECKING:
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SpanExporter
+    from opentelemetry.trace import Span
+
+TracingExporter = Literal["otlp", "console", "file"]
+
+_tracer = None
+
+
+def configure_tracing(
+    exporter: "TracingExporter | SpanExporter",
+    file_path: Path | None = None,
+    service_name: str = "talk2powersystem",
+) -> "TracerProvider":
+    """
+    Enables the OpenTelemetry tracing and returns the tracer provider.
+
+    The spans are exported with `exporter`, which is either one of the
+    built-in exporters or an instance of `SpanExporter`, e.g. `InMemorySpanExporter`
+    in the tests:
+        - `otlp` - in batches to the OTLP endpoint configured with the standard
+        `OTEL_EXPORTER_OTLP_*` environment variables.
+        - `console` - to the standard output.
+        - `file` - to `file_path`, one JSON span per line.
+    OpenTelemetry is imported only if the tracing is enabled. Until then, the spans
+    are no-op.
+    """
+    # imported only if the tracing is enabled
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import (
+        BatchSpanProcessor,
+        ConsoleSpanExporter,
+        SimpleSpanProcessor,
+    )
+
+    global _tracer
+
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    if exporter == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+            OTLPSpanExporter,
+        )
+
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    elif exporter == "console":
+        provider.add_span_processor(SimpleSpanProcessor(ConsoleSpanExporter()))
+    elif exporter == "file":
+        if file_path is None:
+            raise ValueError("'file_path' is required for the file exporter!")
+        out = open(file_path, "a", encoding="utf-8")
+        provider.add_span_processor(
+            SimpleSpanProcessor(
+                ConsoleSpanExporter(
+                    out=out,
+                    formatter=lambda span: span.to_json(indent=None) + "\n",
+                )
+            )
+        )
+    elif isinstance(exporter, str):
+        raise ValueError(f"Unsupported tracing exporter {exporter}")
+    else:
+        provider.add_span_processor(SimpleSpanProcessor(exporter))
+
+    _tracer = provider.get_tracer("talk2powersystemllm")
+    return provider
+
+
+def disable_tracing() -> None:
+    global _tracer
+    _tracer = None
+
+
+def is_tracing_enabled() -> bool:
+    return _tracer is not None
+
+
+def _to_attribute_value(value: Any) -> Any:
+    if isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, (list, tuple)) and all(
+        isinstance(item, str) for item in value
+    ):
+        return list(value)
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+def set_attributes(current_span: "Span | None", attributes: dict[str, Any]) -> None:
+    """
+    Sets the attributes, which are not None, on the span, if the tracing is enabled.
+    The values, which are not primitives, are set as JSON.
+    """
+    if current_span is None:
+        return
+    current_span.set_attributes(
+        {
+            name: _to_attribute_value(value)
+            for name, value in attributes.items()
+            if value is not None
+        }
+    )
+
+
+@contextmanager
+def span(
+    name: str, attributes: dict[str, Any] | None = None
+) -> Iterator["Span | None"]:
+    """
+    Starts a span as a child of the current span, with the attributes,
+    as in `set_attributes`. Yields None, if the tracing is disabled.
+    The exceptions are recorded on the span.
+    """
+    if _tracer is None:
+        yield None
+        return
+    with _tracer.start_as_current_span(name) as current_span:
+        set_attributes(current_span, attributes or {})
+        yield current_span
@@ -254,7 +254,7 @@ class AcceptanceTestsApp(TestCase):
             self.assertFalse("use_responses_api" in agent_llm)
 
         self.assertTrue("tools" in actual_response_json["agent"])
-        self.assertEqual(7, len(actual_response_json["agent"]["tools"]))
+        self.assertEqual(8, len(actual_response_json["agent"]["tools"]))
         self.assertTrue("sparql_query" in actual_response_json["agent"]["tools"])
         self.assertTrue(
             "enabled" in actual_response_json["agent"]["tools"]["sparql_query"]
@@ -360,6 +360,18 @@ SELECT ?link ?name ?format ?description ?kind {{
         self.assertFalse(
             actual_response_json["agent"]["tools"]["retrieve_time_series"]["enabled"]
         )
+        self.assertTrue(
+            "ontology_schema_and_vocabulary" in actual_response_json["agent"]["tools"]
+        )
+        self.assertTrue(
+            "enabled"
+            in actual_response_json["agent"]["tools"]["ontology_schema_and_vocabulary"]
+        )
+        self.assertFalse(
+            actual_response_json["agent"]["tools"]["ontology_schema_and_vocabulary"][
+                "enabled"
+            ]
+        )
         self.assertTrue("now" in actual_response_json["agent"]["tools"])
         self.assertTrue("enabled" in actual_response_json["agent"]["tools"]["now"])
         self.assertTrue(actual_response_json["agent"]["tools"]["now"]["enabled"])
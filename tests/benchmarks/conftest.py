@@ -0,0 +1,100 @@
+import asyncio
+import statistics
+import time
+import tracemalloc
+from collections.abc import Callable
+from typing import Any
+
+import pytest
+
+# the rounds of the fallback benchmark fixture
+FALLBACK_ROUNDS = 20
+
+
+class FallbackBenchmark:
+    """
+    Minimal stand-in for the `benchmark` fixture of pytest-benchmark,
+    so that the benchmarks also run, and report their timings, without the plugin.
+    """
+
+    def __init__(self, node: pytest.Item, rounds: int = FALLBACK_ROUNDS):
+        self.node = node
+        self.rounds = rounds
+        self.extra_info: dict[str, Any] = {}
+
+    def __call__(self, func: Callable, *args, **kwargs) -> Any:
+        # warm-up
+        result = func(*args, **kwargs)
+        timings = []
+        for _ in range(self.rounds):
+            start = time.perf_counter()
+            func(*args, **kwargs)
+            timings.append(time.perf_counter() - start)
+        stats = {
+            "min": min(timings),
+            "median": statistics.median(timings),
+            "max": max(timings),
+            "rounds": self.rounds,
+        }
+        # reported in the terminal summary
+        self.node.user_properties.append(("benchmark", {**stats, **self.extra_info}))
+        return result
+
+
+try:
+    import pytest_benchmark  # noqa: F401
+except ImportError:
+
+    @pytest.fixture
+    def benchmark(request: pytest.FixtureRequest) -> FallbackBenchmark:
+        return FallbackBenchmark(request.node)
+
+    def pytest_terminal_summary(terminalreporter) -> None:
+        reports = [
+            report
+            for report in terminalreporter.stats.get("passed", [])
+            if report.when == "call"
+        ]
+        lines = [
+            f"{report.nodeid}: median {stats['median'] * 1000:.3f} ms, "
+            f"min {stats['min'] * 1000:.3f} ms, "
+            f"peak allocated {stats.get('peak_allocated_bytes', '?')} bytes"
+            for report in reports
+            for name, stats in report.user_properties
+            if name == "benchmark"
+        ]
+        if lines:
+            terminalreporter.write_sep("-", "benchmarks (without pytest-benchmark)")
+            for line in lines:
+                terminalreporter.write_line(line)
+
+
+@pytest.fixture
+def run_async():
+    """
+    Runs the coroutines on the same event loop,
+    so that the benchmarks don't measure the creation of a loop.
+    """
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
+
+
+@pytest.fixture
+def measure(benchmark) -> Callable:
+    """
+    Records the peak of the memory allocated by a call of the function
+    in the extra info of the benchmark, then benchmarks the function.
+    """
+
+    def run(func: Callable, *args, **kwargs) -> Any:
+        tracemalloc.start()
+        try:
+            func(*args, **kwargs)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        benchmark.extra_info["peak_allocated_bytes"] = peak
+        return benchmark(func, *args, **kwargs)
+
+    return run
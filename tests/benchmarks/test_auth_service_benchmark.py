@@ -0,0 +1,67 @@
+import time
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+
+from talk2powersystemllm.app.server.config import SecuritySettings
+from talk2powersystemllm.app.server.services import JwtVerifier
+
+SETTINGS = SecuritySettings(audience="api://talk2powersystem", issuer="issuer")
+
+
+class FakeJwksCache:
+    def __init__(self, key: dict):
+        self.key = key
+
+    async def get_key(self, kid: str | None) -> dict:
+        return self.key
+
+
+@pytest.fixture(scope="module")
+def signing_key() -> tuple[str, dict]:
+    # RS256, as the tokens of the identity providers
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode("utf-8")
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM,
+        serialization.PublicFormat.SubjectPublicKeyInfo,
+    )
+    public_jwk = {**jwk.construct(public_pem, "RS256").to_dict(), "kid": "key-1"}
+    return private_pem, public_jwk
+
+
+@pytest.fixture
+def token(signing_key: tuple[str, dict]) -> str:
+    private_pem, _ = signing_key
+    claims = {
+        "aud": "api://talk2powersystem",
+        "iss": "issuer",
+        "sub": "user",
+        "name": "User",
+        "roles": ["reader"],
+        "exp": int(time.time()) + 3600,
+    }
+    return jwt.encode(claims, private_pem, algorithm="RS256", headers={"kid": "key-1"})
+
+
+@pytest.mark.parametrize("cached", [False, True])
+def test_verify(
+    measure, run_async, signing_key: tuple[str, dict], token: str, cached: bool
+) -> None:
+    _, public_jwk = signing_key
+    jwks_cache = FakeJwksCache(public_jwk)
+    verifier = JwtVerifier(SETTINGS, jwks_cache, cache_size=10)
+
+    def verify() -> dict:
+        if cached:
+            return run_async(verifier.verify(token))
+        # verifies the signature on each call
+        return run_async(JwtVerifier(SETTINGS, jwks_cache, cache_size=10).verify(token))
+
+    assert measure(verify)["sub"] == "user"
@@ -0,0 +1,130 @@
+import json
+
+import pytest
+from langchain_core.messages import AIMessage, ToolMessage
+
+from talk2powersystemllm.app.models import ChatResponse, Message, SvgGraphic, Usage
+from talk2powersystemllm.app.server.services import run_agent_loop
+from talk2powersystemllm.tools import SvgArtifact
+
+QUERY_ARTIFACT = {
+    "lc": 1,
+    "type": "constructor",
+    "id": ["ttyg", "tools", "QueryArtifact"],
+    "kwargs": {"type": "query", "query": "SELECT * {}", "query_type": "sparql"},
+}
+USAGE = {"input_tokens": 5000, "output_tokens": 100, "total_tokens": 5100}
+
+
+def model_update(message: AIMessage) -> tuple:
+    return "updates", {"model": {"messages": [message]}}
+
+
+def tools_update(message: ToolMessage) -> tuple:
+    return "updates", {"tools": {"messages": [message]}}
+
+
+def recorded_updates(tool_rounds: int, result_rows: int) -> list[tuple]:
+    """
+    Returns the `updates` stream of an agent run with `tool_rounds` rounds
+    of SPARQL queries with `result_rows` rows each, a diagram and the answer.
+    """
+    result = "\n".join(
+        f"urn:uuid:{i:08d},Substation {i},{i * 1.5}" for i in range(result_rows)
+    )
+    updates = []
+    for i in range(tool_rounds):
+        tool_call = {
+            "id": f"call-{i}",
+            "name": "sparql_query",
+            "args": {"query": f"SELECT * {{}} LIMIT {i}"},
+        }
+        updates.append(
+            model_update(
+                AIMessage(
+                    id=f"ai-{i}",
+                    content="",
+                    tool_calls=[tool_call],
+                    usage_metadata=USAGE,
+                )
+            )
+        )
+        updates.append(
+            tools_update(
+                ToolMessage(
+                    content=result,
+                    name="sparql_query",
+                    tool_call_id=tool_call["id"],
+                    artifact=QUERY_ARTIFACT,
+                )
+            )
+        )
+    updates.append(
+        tools_update(
+            ToolMessage(
+                content='Diagram with name "OSLO"',
+                name="display_graphics",
+                tool_call_id="call-graphics",
+                artifact=SvgArtifact(link="OSLO.svg", mime_type="image/svg+xml"),
+            )
+        )
+    )
+    updates.append(
+        model_update(
+            AIMessage(
+                id="ai-answer",
+                content="There are many substations. " * 20,
+                usage_metadata=USAGE,
+            )
+        )
+    )
+    return updates
+
+
+class RecordedAgent:
+    def __init__(self, updates: list[tuple]):
+        self.updates = updates
+
+    async def astream(self, input_, config, stream_mode):
+        for update in self.updates:
+            yield update
+
+
+@pytest.mark.parametrize("tool_rounds,result_rows", [(1, 10), (10, 1000)])
+def test_run_agent_loop(measure, run_async, tool_rounds: int, result_rows: int) -> None:
+    agent = RecordedAgent(recorded_updates(tool_rounds, result_rows))
+
+    chat_response = measure(
+        lambda: run_async(run_agent_loop(agent, "thread_1", "How many?", []))
+    )
+
+    assert chat_response.messages[0].graphics == [SvgGraphic(url="OSLO.svg")]
+
+
+@pytest.mark.parametrize("messages", [1, 50])
+def test_chat_response_serialization(measure, messages: int) -> None:
+    usage = Usage(promptTokens=5000, completionTokens=100, totalTokens=5100)
+    chat_response = ChatResponse(
+        id="thread_1",
+        messages=[
+            Message(
+                id=f"ai-{i}",
+                message="There are many substations. " * 20,
+                usage=usage,
+                graphics=[SvgGraphic(url="OSLO.svg")] if i % 2 else None,
+            )
+            for i in range(messages)
+        ],
+        usage=usage,
+    )
+
+    def serialize() -> str:
+        # as FastAPI serializes the response with `response_model_exclude_none`
+        return json.dumps(
+            chat_response.model_dump(mode="json", by_alias=True, exclude_none=True)
+        )
+
+    body = json.loads(measure(serialize))
+
+    assert "graphics" not in body["messages"][0]
+    assert "cachedPromptTokens" not in body["usage"]
@@ -0,0 +1,74 @@
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from talk2powersystemllm.app.server.services import get_query_methods
+
+TOOL_CALLS_PER_TURN = 3
+
+
+def query_artifact(query: str) -> dict:
+    return {
+        "lc": 1,
+        "type": "constructor",
+        "id": ["ttyg", "tools", "QueryArtifact"],
+        "kwargs": {"type": "query", "query": query, "query_type": "sparql"},
+    }
+
+
+def synthetic_messages(turns: int, result_chars: int) -> list:
+    """
+    Returns the messages of a conversation with `turns` questions, each answered
+    after `TOOL_CALLS_PER_TURN` SPARQL queries with results of `result_chars`.
+    """
+    messages = []
+    for turn in range(turns):
+        tool_calls = [
+            {
+                "id": f"call-{turn}-{i}",
+                "name": "sparql_query",
+                "args": {"query": f"SELECT * {{ ?s ?p {turn}{i} }}"},
+            }
+            for i in range(TOOL_CALLS_PER_TURN)
+        ]
+        messages.append(HumanMessage(id=f"human-{turn}", content="How many?"))
+        messages.append(AIMessage(id=f"ai-{turn}", content="", tool_calls=tool_calls))
+        for tool_call in tool_calls:
+            messages.append(
+                ToolMessage(
+                    content="x" * result_chars,
+                    name="sparql_query",
+                    tool_call_id=tool_call["id"],
+                    artifact=query_artifact(tool_call["args"]["query"]),
+                    status="error" if tool_call["id"].endswith("-2") else "success",
+                )
+            )
+        messages.append(AIMessage(id=f"answer-{turn}", content=f"Answer {turn}"))
+    return messages
+
+
+class FakeCheckpointer:
+    def __init__(self, messages: list):
+        self.messages = messages
+
+    async def aget(self, config: dict) -> dict:
+        return {"channel_values": {"messages": self.messages}}
+
+
+@pytest.mark.parametrize("turns", [10, 200])
+def test_get_query_methods(measure, run_async, turns: int) -> None:
+    agent_factory = SimpleNamespace(
+        checkpointer=FakeCheckpointer(synthetic_messages(turns, result_chars=10000)),
+        advanced_tools=set(),
+        tool_name_to_gdb_repository={"sparql_query": "cim"},
+    )
+    # the last answer is the worst case, because the whole checkpoint is scanned
+    message_id = f"answer-{turns - 1}"
+
+    query_methods = measure(
+        lambda: run_async(get_query_methods(agent_factory, "thread_1", message_id))
+    )
+
+    assert len(query_methods) == TOOL_CALLS_PER_TURN
+    assert query_methods[-1].error_output == "x" * 10000
@@ -0,0 +1,98 @@
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+from cognite.client.data_classes.datapoints import DatapointsArray
+from rdflib import Literal as RDFLiteral
+from rdflib import Variable
+from ttyg.graphdb import GraphDB
+
+from talk2powersystemllm.tools import GraphicsTool, RetrieveDataPointsTool
+from talk2powersystemllm.tools.cognite.result_shaping import shape_datapoints
+from talk2powersystemllm.tools.graphics_tool import (
+    validate_graphics_sparql_query_template,
+)
+
+DATETIME_STRINGS = [
+    "3w-ago",
+    "now",
+    "2025-06-04",
+    "2025-06-04T14:30",
+    "2025-06-04T14:30:30.123Z",
+    "2025-06-04T14:30:30-04:00",
+    "2025-06-04T14:30:30.123-0400",
+    None,
+]
+
+
+class FakeQueryResults:
+    def __init__(self, bindings: list[dict]):
+        self.bindings = bindings
+
+
+def test_validate_graphics_sparql_query_template(measure) -> None:
+    template = GraphicsTool.model_fields["sparql_query_template"].default
+
+    assert measure(validate_graphics_sparql_query_template, template) == "SelectQuery"
+
+
+def test_graphics_tool(measure) -> None:
+    graphdb = MagicMock(spec=GraphDB)
+    graphdb.eval_sparql_query.return_value = (
+        FakeQueryResults(
+            [
+                {
+                    Variable("name"): RDFLiteral("Diagram of substation OSLO"),
+                    Variable("format"): RDFLiteral("image/svg+xml"),
+                    Variable("link"): RDFLiteral("PowSyBl-SLD-substation-OSLO.svg"),
+                    Variable("kind"): RDFLiteral("PowSyBl-SingleLineDiagram"),
+                }
+            ]
+        ),
+        None,
+    )
+
+    def display_graphics():
+        # the validation of the template is cached after the first tool
+        graphics_tool = GraphicsTool(graph=graphdb, graphdb_repository_id="cim")
+        return graphics_tool._run(
+            diagram_iri=None,
+            diagram_configuration_iri="urn:uuid:a53f9c60-189d-4be2-b3af-0320298e529d",
+            node_iri="urn:uuid:f1769664-9aeb-11e5-91da-b8763fd99c5f",
+        )
+
+    content, artifact = measure(display_graphics)
+
+    assert artifact.link.startswith("PowSyBl-SLD-substation-OSLO.svg")
+
+
+@pytest.mark.parametrize("n", [100, 100_000])
+def test_shape_datapoints(measure, n: int) -> None:
+    rng = np.random.default_rng(42)
+    datapoints = DatapointsArray(
+        id=1,
+        external_id="ts-1",
+        is_string=False,
+        is_step=False,
+        type="numeric",
+        timestamp=np.datetime64("2025-06-01T00:00:00", "ns")
+        + np.arange(n) * np.timedelta64(1, "m"),
+        value=rng.normal(100, 10, n),
+    )
+
+    content, artifact = measure(shape_datapoints, datapoints, 2000)
+
+    assert len(content) <= 2000 * 4
+
+
+def test_try_to_parse_as_iso_format(measure) -> None:
+    def parse_all() -> list:
+        return [
+            RetrieveDataPointsTool._try_to_parse_as_iso_format(datetime_string)
+            for datetime_string in DATETIME_STRINGS
+        ]
+
+    parsed = measure(parse_all)
+
+    assert parsed[:2] == ["3w-ago", "now"]
+    assert parsed[-1] is None
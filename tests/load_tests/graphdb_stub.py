@@ -0,0 +1,245 @@
+"""
+Stand-in for the GraphDB REST API used by the application in the load tests.
+It answers the SPARQL queries according to a YAML script after a configurable latency,
+so that the load tests measure the application and not GraphDB.
+
+Run with `python -m tests.load_tests.graphdb_stub --script <path> --port 7200`.
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Literal
+
+import uvicorn
+import yaml
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCRIPT = Path(__file__).parent / "graphdb_stub.yaml"
+
+_QUERY_TYPE_PATTERN = re.compile(
+    r"^\s*(?:(?:PREFIX\s+\S*\s*<[^>]*>|BASE\s+<[^>]*>)\s*)*"
+    r"(SELECT|ASK|CONSTRUCT|DESCRIBE)",
+    re.IGNORECASE,
+)
+_PROJECTION_PATTERN = re.compile(
+    r"SELECT\s+(?:DISTINCT\s+|REDUCED\s+)?(.*?)\s*(?:WHERE|FROM|\{)",
+    re.IGNORECASE | re.DOTALL,
+)
+_VARIABLE_PATTERN = re.compile(r"[?$](\w+)")
+
+
+class Rule(BaseModel):
+    pattern: str = Field(description="Regular expression searched in the query")
+    latency_ms: float | None = Field(
+        default=None, description="Overrides the latency of the script"
+    )
+    status_code: int = 200
+    boolean: bool | None = Field(default=None, description="Result of ASK queries")
+    rows: list[list[str]] = Field(
+        default_factory=list,
+        description="Results of SELECT queries, with a value per projected variable. "
+        "The values in angle brackets are IRIs, the others are literals.",
+    )
+    ntriples: str = Field(
+        default="", description="Results of CONSTRUCT and DESCRIBE queries"
+    )
+
+
+class StubScript(BaseModel):
+    latency_ms: float = Field(default=0, ge=0)
+    jitter_ms: float = Field(default=0, ge=0)
+    repositories: list[str] = ["cim"]
+    health_status: Literal["green", "yellow", "red"] = "green"
+    namespaces: dict[str, str] = {}
+    rules: list[Rule] = []
+
+
+def load_script(path: Path) -> StubScript:
+    with open(path, "r", encoding="utf-8") as f:
+        return StubScript.model_validate(yaml.safe_load(f) or {})
+
+
+def get_query_type(query: str) -> str:
+    match = _QUERY_TYPE_PATTERN.search(query)
+    return match.group(1).upper() if match else "SELECT"
+
+
+def get_projected_variables(query: str) -> list[str]:
+    match = _PROJECTION_PATTERN.search(query)
+    if not match:
+        return []
+    projection = match.group(1)
+    # for `SELECT *` the variables of the pattern in the order of appearance
+    source = query[match.end() :] if projection.strip() == "*" else projection
+    return list(dict.fromkeys(_VARIABLE_PATTERN.findall(source)))
+
+
+def to_binding(value: str) -> dict:
+    if value.startswith("<") and value.endswith(">"):
+        return {"type": "uri", "value": value[1:-1]}
+    return {"type": "literal", "value": value}
+
+
+def find_rule(script: StubScript, query: str) -> Rule | None:
+    return next((rule for rule in script.rules if re.search(rule.pattern, query)), None)
+
+
+def answer_query(rule: Rule | None, query: str, accept: str) -> Response:
+    query_type = get_query_type(query)
+    rule = rule or Rule(pattern="")
+    if rule.status_code != 200:
+        return Response(status_code=rule.status_code, content="Scripted error")
+    if query_type == "ASK":
+        return JSONResponse(
+            {"head": {}, "boolean": True if rule.boolean is None else rule.boolean},
+            media_type="application/sparql-results+json",
+        )
+    if query_type == "SELECT":
+        variables = get_projected_variables(query)
+        bindings = [
+            {variable: to_binding(value) for variable, value in zip(variables, row)}
+            for row in rule.rows
+        ]
+        return JSONResponse(
+            {"head": {"vars": variables}, "results": {"bindings": bindings}},
+            media_type="application/sparql-results+json",
+        )
+    # the N-Triples are also valid Turtle
+    media_type = (
+        "application/n-triples" if "application/n-triples" in accept else "text/turtle"
+    )
+    return Response(content=rule.ntriples, media_type=media_type)
+
+
+def create_app(script: StubScript) -> FastAPI:
+    app = FastAPI(title="GraphDB stub")
+    app.state.script = script
+    app.state.requests = Counter()
+
+    async def wait(latency_ms: float | None = None) -> None:
+        script = app.state.script
+        latency_ms = script.latency_ms if latency_ms is None else latency_ms
+        jitter_ms = random.uniform(-script.jitter_ms, script.jitter_ms)
+        await asyncio.sleep(max(latency_ms + jitter_ms, 0) / 1000)
+
+    def unknown_repository(repository_id: str) -> Response | None:
+        if repository_id not in app.state.script.repositories:
+            return Response(
+                status_code=404, content=f"Unknown repository: {repository_id}"
+            )
+        return None
+
+    @app.api_route("/repositories/{repository_id}", methods=["GET", "POST"])
+    async def sparql(repository_id: str, request: Request) -> Response:
+        if error := unknown_repository(repository_id):
+            return error
+        if request.method == "GET":
+            query = request.query_params.get("query", "")
+        elif request.headers.get("content-type", "").startswith(
+            "application/sparql-query"
+        ):
+            query = (await request.body()).decode("utf-8")
+        else:
+            query = (await request.form()).get("query", "")
+        rule = find_rule(app.state.script, query)
+        app.state.requests[f"sparql_{get_query_type(query).lower()}"] += 1
+        await wait(rule.latency_ms if rule else None)
+        return answer_query(rule, query, request.headers.get("accept", ""))
+
+    @app.get("/repositories/{repository_id}/health")
+    async def health(repository_id: str) -> Response:
+        if error := unknown_repository(repository_id):
+            return error
+        app.state.requests["health"] += 1
+        await wait()
+        return JSONResponse(
+            {
+                "name": repository_id,
+                "status": app.state.script.health_status,
+                "components": [],
+            }
+        )
+
+    @app.get("/repositories/{repository_id}/namespaces")
+    async def namespaces(repository_id: str) -> Response:
+        if error := unknown_repository(repository_id):
+            return error
+        app.state.requests["namespaces"] += 1
+        await wait()
+        return JSONResponse(
+            {
+                "head": {"vars": ["prefix", "namespace"]},
+                "results": {
+                    "bindings": [
+                        {
+                            "prefix": to_binding(prefix),
+                            "namespace": to_binding(namespace),
+                        }
+                        for prefix, namespace in app.state.script.namespaces.items()
+                    ]
+                },
+            },
+            media_type="application/sparql-results+json",
+        )
+
+    @app.get("/rest/repositories/{repository_id}")
+    async def repository(repository_id: str) -> Response:
+        if error := unknown_repository(repository_id):
+            return error
+        return JSONResponse({"id": repository_id, "state": "RUNNING"})
+
+    @app.put("/__stub/script")
+    async def replace_script(new_script: StubScript) -> dict:
+        app.state.script = new_script
+        logger.info(f"The script is replaced, latency {new_script.latency_ms} ms")
+        return {"rules": len(new_script.rules)}
+
+    @app.get("/__stub/requests")
+    async def requests_count() -> dict:
+        return dict(app.state.requests)
+
+    @app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
+    async def unknown(path: str, request: Request) -> Response:
+        # an unexpected call of the application, which should be scripted
+        logger.warning(f"Not scripted: {request.method} /{path}")
+        app.state.requests["not_scripted"] += 1
+        return Response(status_code=404, content=f"Not scripted: /{path}")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="GraphDB stub for the load tests",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--script", type=Path, default=DEFAULT_SCRIPT)
+    parser.add_argument("--host", type=str, default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=7200)
+    parser.add_argument(
+        "--latency_ms",
+        type=float,
+        help="Overrides the latency of the script in milliseconds",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s"
+    )
+    script = load_script(args.script)
+    if args.latency_ms is not None:
+        script.latency_ms = args.latency_ms
+    uvicorn.run(create_app(script), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import json
+
+from tests.acceptance_tests.conf import USE_RESPONSES_API
+from tests.acceptance_tests.openai_mock import (
+    MOCK_OPENAI_CLIENT,
+    mock_openai_reset,
+    openai_response,
+    response_tool_call,
+)
+
+# replaced with a new uuid in each mocked response
+ID_PLACEHOLDER = "__uuid__"
+SPARQL_QUERY = (
+    "SELECT ?substation ?name { "
+    "?substation a <https://cim.ucaiug.io/ns#Substation> ; "
+    "<https://cim.ucaiug.io/ns#IdentifiedObject.name> ?name }"
+)
+ANSWER = "There are two substations: ARENDAL and BLAFALLI."
+
+
+def velocity_template(response: dict) -> str:
+    """
+    Returns a MockServer Velocity template, which renders the response
+    with a new uuid in place of the placeholders.
+    The rest of the response is in unparsed blocks, so that the characters `#` and `$`
+    of the JSON are not interpreted by Velocity.
+    """
+    parts = json.dumps(response).split(ID_PLACEHOLDER)
+    return "$!uuid".join(f"#[[{part}]]#" for part in parts)
+
+
+def mock_response(
+    content: str | None,
+    tool_calls: list | None,
+    use_responses_api: bool,
+) -> dict:
+    response = openai_response(
+        prompt_tokens=1500,
+        completion_tokens=50,
+        content=content,
+        tool_calls=tool_calls,
+        use_responses_api=use_responses_api,
+    )
+    body = response["body"]
+    if use_responses_api:
+        body["id"] = f"resp_{ID_PLACEHOLDER}"
+        for item in body["output"]:
+            if item["type"] == "message":
+                item["id"] = f"msg_{ID_PLACEHOLDER}"
+    else:
+        body["id"] = f"chatcmpl-{ID_PLACEHOLDER}"
+    response["headers"] = {"content-type": ["application/json"]}
+    return response
+
+
+def mock_openai_for_load_tests(
+    latency_ms: int,
+    use_responses_api: bool = USE_RESPONSES_API,
+) -> None:
+    """
+    Mocks the LLM for any conversation. If the last message is the output of a tool,
+    the LLM answers, otherwise it calls the `sparql_query` tool,
+    so that each question makes two LLM calls and a SPARQL query.
+    """
+    mock_openai_reset()
+    if use_responses_api:
+        path = "/openai/responses"
+        last_message_is_tool_output = (
+            "$.input[(@.length-1)][?(@.type == 'function_call_output')]"
+        )
+    else:
+        path = "/openai/deployments/gpt-5.4/chat/completions"
+        last_message_is_tool_output = "$.messages[(@.length-1)][?(@.role == 'tool')]"
+
+    answer = mock_response(ANSWER, None, use_responses_api)
+    tool_call = mock_response(
+        None,
+        [
+            response_tool_call(
+                ID_PLACEHOLDER,
+                "sparql_query",
+                json.dumps({"query": SPARQL_QUERY}),
+                use_responses_api=use_responses_api,
+            )
+        ],
+        use_responses_api,
+    )
+    delay = {"timeUnit": "MILLISECONDS", "value": latency_ms}
+    for priority, body_matcher, response in (
+        (10, {"type": "JSON_PATH", "jsonPath": last_message_is_tool_output}, answer),
+        (0, None, tool_call),
+    ):
+        http_request = {"method": "POST", "path": path}
+        if body_matcher:
+            http_request["body"] = body_matcher
+        result = MOCK_OPENAI_CLIENT._call(
+            "expectation",
+            json.dumps(
+                {
+                    "httpRequest": http_request,
+                    "httpResponseTemplate": {
+                        "templateType": "VELOCITY",
+                        "template": velocity_template(response),
+                        "delay": delay,
+                    },
+                    "times": {"unlimited": True},
+                    "priority": priority,
+                }
+            ),
+        )
+        assert result.status_code == 201, result.content.decode("UTF-8")
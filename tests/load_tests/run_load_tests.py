@@ -0,0 +1,303 @@
+"""
+Runs the load test scenarios against the application at several concurrency levels
+and writes the throughput, the latencies, the event loop lag and the resident memory
+of each worker as JSON.
+
+Run with `python -m tests.load_tests.run_load_tests --output results.json`.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import re
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+from talk2powersystemllm.scripts.run_evaluation import percentile
+from tests.acceptance_tests.conf import USE_RESPONSES_API
+from tests.load_tests.graphdb_stub import DEFAULT_SCRIPT, load_script
+from tests.load_tests.llm_mock import mock_openai_for_load_tests
+from tests.load_tests.scenarios import SCENARIOS, Recorder, Sample
+
+NAMESPACE = "talk2powersystem"
+EVENT_LOOP_LAG = f"{NAMESPACE}_event_loop_lag_seconds"
+WORKER_RESIDENT_MEMORY = f"{NAMESPACE}_worker_resident_memory_bytes"
+
+_SAMPLE_PATTERN = re.compile(r"^([a-zA-Z_:][\w:]*)(?:\{(.*)\})?\s+(\S+)")
+_LABEL_PATTERN = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+Metrics = dict[tuple[str, tuple[tuple[str, str], ...]], float]
+
+
+def parse_metrics(text: str) -> Metrics:
+    """
+    Parses the samples of the Prometheus text format into a dictionary
+    from the name and the sorted labels of each sample to its value.
+    """
+    metrics = {}
+    for line in text.splitlines():
+        match = _SAMPLE_PATTERN.match(line)
+        if line.startswith("#") or not match:
+            continue
+        name, labels, value = match.groups()
+        labels = tuple(sorted(_LABEL_PATTERN.findall(labels or "")))
+        metrics[(name, labels)] = float(value)
+    return metrics
+
+
+def delta(before: Metrics, after: Metrics, sample: str, labels: tuple = ()) -> float:
+    return after.get((sample, labels), 0) - before.get((sample, labels), 0)
+
+
+def histogram_quantile(
+    before: Metrics, after: Metrics, name: str, q: float
+) -> float | None:
+    """
+    Returns the upper bound of the bucket of the q-th quantile of the observations
+    of a histogram between two scrapes, aggregated over all labels,
+    or the largest finite bound, if the quantile is above it.
+    """
+    buckets = defaultdict(float)
+    for sample, labels in after:
+        if sample == f"{name}_bucket":
+            le = float(dict(labels)["le"])
+            buckets[le] += delta(before, after, sample, labels)
+    if not buckets or buckets[float("inf")] <= 0:
+        return None
+    rank = q / 100 * buckets[float("inf")]
+    bounds = sorted(buckets)
+    quantile = next(le for le in bounds if buckets[le] >= rank)
+    return bounds[-2] if math.isinf(quantile) and len(bounds) > 1 else quantile
+
+
+def histogram_means(before: Metrics, after: Metrics) -> dict[str, float]:
+    """
+    Returns the mean of the observations between two scrapes of each histogram
+    of the application, by its labels.
+    """
+    means = {}
+    for sample, labels in after:
+        if not (sample.startswith(NAMESPACE) and sample.endswith("_count")):
+            continue
+        count = delta(before, after, sample, labels)
+        if count <= 0:
+            continue
+        name = sample.removesuffix("_count")
+        total = delta(before, after, f"{name}_sum", labels)
+        labels_text = ",".join(f"{key}={value}" for key, value in labels)
+        means[f"{name}{{{labels_text}}}"] = total / count
+    return means
+
+
+def get_resident_memory(metrics: Metrics) -> dict[str, float]:
+    return {
+        # with a single worker, the sample has no pid
+        dict(labels).get("pid", "0"): value
+        for (sample, labels), value in metrics.items()
+        if sample == WORKER_RESIDENT_MEMORY
+    }
+
+
+def summarize_latencies(latencies: list[float]) -> dict[str, float | None]:
+    if not latencies:
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    latencies_ms = [latency * 1000 for latency in latencies]
+    return {
+        "p50": percentile(latencies_ms, 50),
+        "p95": percentile(latencies_ms, 95),
+        "p99": percentile(latencies_ms, 99),
+        "mean": sum(latencies_ms) / len(latencies_ms),
+        "max": max(latencies_ms),
+    }
+
+
+def summarize_level(
+    concurrency: int,
+    samples: list[Sample],
+    duration_sec: float,
+    before: Metrics,
+    after: Metrics,
+) -> dict[str, Any]:
+    by_request = defaultdict(list)
+    for sample in samples:
+        by_request[sample.request].append(sample)
+    lag_count = delta(before, after, f"{EVENT_LOOP_LAG}_count")
+    lag_sum = delta(before, after, f"{EVENT_LOOP_LAG}_sum")
+    lag_p99 = histogram_quantile(before, after, EVENT_LOOP_LAG, 99)
+    return {
+        "concurrency": concurrency,
+        "duration_sec": duration_sec,
+        "requests": len(samples),
+        "errors": sum(not sample.ok for sample in samples),
+        "throughput_rps": len(samples) / duration_sec,
+        "latency_ms": summarize_latencies([sample.latency_sec for sample in samples]),
+        "requests_latency_ms": {
+            request: {
+                "requests": len(request_samples),
+                "errors": sum(not sample.ok for sample in request_samples),
+                **summarize_latencies(
+                    [sample.latency_sec for sample in request_samples]
+                ),
+            }
+            for request, request_samples in sorted(by_request.items())
+        },
+        "event_loop_lag_ms": {
+            "mean": lag_sum / lag_count * 1000 if lag_count > 0 else None,
+            "p99": lag_p99 * 1000 if lag_p99 is not None else None,
+        },
+        "rss_bytes_per_worker": get_resident_memory(after),
+        "server_mean_sec": histogram_means(before, after),
+    }
+
+
+async def scrape_metrics(client: httpx.AsyncClient) -> Metrics:
+    try:
+        response = await client.get("/metrics")
+        response.raise_for_status()
+    except httpx.HTTPError as error:
+        print(f"The metrics can't be scraped: {error}")
+        return {}
+    return parse_metrics(response.text)
+
+
+async def run_workers(
+    client: httpx.AsyncClient, scenario: str, concurrency: int, duration_sec: float
+) -> list[Sample]:
+    recorder = Recorder(client)
+    deadline = time.perf_counter() + duration_sec
+
+    async def worker() -> None:
+        while time.perf_counter() < deadline:
+            await SCENARIOS[scenario](recorder)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return recorder.samples
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    scenario: str,
+    concurrency: int,
+    duration_sec: float,
+    warmup_sec: float,
+) -> dict[str, Any]:
+    if warmup_sec > 0:
+        await run_workers(client, scenario, concurrency, warmup_sec)
+    before = await scrape_metrics(client)
+    start = time.perf_counter()
+    samples = await run_workers(client, scenario, concurrency, duration_sec)
+    elapsed_sec = time.perf_counter() - start
+    after = await scrape_metrics(client)
+    return summarize_level(concurrency, samples, elapsed_sec, before, after)
+
+
+async def run_load_tests(args: argparse.Namespace) -> dict[str, Any]:
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    results = {
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "base_url": args.base_url,
+        "use_responses_api": USE_RESPONSES_API,
+        "llm_latency_ms": args.llm_latency_ms,
+        "graphdb_latency_ms": args.graphdb_latency_ms,
+        "duration_sec": args.duration_sec,
+        "scenarios": {},
+    }
+    limits = httpx.Limits(max_connections=max(args.concurrency))
+    async with httpx.AsyncClient(
+        base_url=args.base_url,
+        headers=headers,
+        limits=limits,
+        timeout=args.timeout_sec,
+    ) as client:
+        for scenario in args.scenarios:
+            levels = []
+            for concurrency in args.concurrency:
+                print(f"Scenario {scenario}, concurrency {concurrency}")
+                level = await run_level(
+                    client, scenario, concurrency, args.duration_sec, args.warmup_sec
+                )
+                print(
+                    f"{level['throughput_rps']:.2f} requests/s, "
+                    f"p95 {level['latency_ms']['p95']} ms, "
+                    f"{level['errors']} errors"
+                )
+                levels.append(level)
+            results["scenarios"][scenario] = levels
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load tests of Talk to Power System",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--base_url", type=str, default="http://talk2powersystem:8000")
+    parser.add_argument(
+        "--scenarios",
+        nargs="+",
+        choices=list(SCENARIOS),
+        default=list(SCENARIOS),
+    )
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument(
+        "--duration_sec",
+        type=float,
+        default=60,
+        help="Duration of each concurrency level of each scenario",
+    )
+    parser.add_argument(
+        "--warmup_sec",
+        type=float,
+        default=5,
+        help="Duration of the warm-up before each measurement, which isn't recorded",
+    )
+    parser.add_argument("--timeout_sec", type=float, default=120)
+    parser.add_argument(
+        "--token",
+        type=str,
+        help="Bearer token, if the security of the application is enabled",
+    )
+    parser.add_argument(
+        "--llm_latency_ms",
+        type=int,
+        default=500,
+        help="Latency of the mocked LLM. A negative value skips mocking the LLM.",
+    )
+    parser.add_argument(
+        "--graphdb_stub_url",
+        type=str,
+        default="http://graphdb:7200",
+        help="URL of the GraphDB stub, whose latency is set to --graphdb_latency_ms",
+    )
+    parser.add_argument(
+        "--graphdb_latency_ms",
+        type=float,
+        help="Latency of the GraphDB stub. If not set, the latency of its script.",
+    )
+    parser.add_argument("--output", type=Path, default=Path("load_test_results.json"))
+    args = parser.parse_args()
+
+    if args.llm_latency_ms >= 0:
+        mock_openai_for_load_tests(args.llm_latency_ms)
+    if args.graphdb_latency_ms is not None:
+        script = load_script(DEFAULT_SCRIPT)
+        script.latency_ms = args.graphdb_latency_ms
+        httpx.put(
+            f"{args.graphdb_stub_url}/__stub/script", json=script.model_dump()
+        ).raise_for_status()
+
+    results = asyncio.run(run_load_tests(args))
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"The results are written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
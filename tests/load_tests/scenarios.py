@@ -0,0 +1,98 @@
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+
+import httpx
+
+CONVERSATIONS_PATH = "/rest/chat/conversations"
+EXPLAIN_PATH = "/rest/chat/conversations/explain"
+QUESTIONS = [
+    "List the substations",
+    "Which of them are in Arendal?",
+    "What is the voltage level of the first one?",
+]
+
+
+@dataclass
+class Sample:
+    request: str
+    latency_sec: float
+    ok: bool
+
+
+@dataclass
+class Recorder:
+    """
+    Sends the requests of the scenarios and records their latencies and outcomes.
+    """
+
+    client: httpx.AsyncClient
+    samples: list[Sample] = field(default_factory=list)
+
+    async def request(
+        self, name: str, method: str, url: str, **kwargs
+    ) -> httpx.Response | None:
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+            ok = response.is_success
+        except httpx.HTTPError:
+            response, ok = None, False
+        self.samples.append(Sample(name, time.perf_counter() - start, ok))
+        return response if ok else None
+
+
+async def ask(
+    recorder: Recorder, name: str, question: str, conversation_id: str | None = None
+) -> dict | None:
+    body = {"question": question}
+    if conversation_id:
+        body["conversationId"] = conversation_id
+    response = await recorder.request(name, "POST", CONVERSATIONS_PATH, json=body)
+    return response.json() if response else None
+
+
+async def new_conversation(recorder: Recorder) -> None:
+    await ask(recorder, "new_conversation", QUESTIONS[0])
+
+
+async def continued_conversation(recorder: Recorder) -> None:
+    """
+    Asks the questions in the same conversation,
+    so each question reads and writes a longer checkpoint.
+    """
+    conversation = await ask(recorder, "new_conversation", QUESTIONS[0])
+    for question in QUESTIONS[1:]:
+        if conversation is None:
+            return
+        conversation = await ask(
+            recorder, "continued_conversation", question, conversation["id"]
+        )
+
+
+async def explain(recorder: Recorder) -> None:
+    conversation = await ask(recorder, "new_conversation", QUESTIONS[0])
+    if conversation is None:
+        return
+    await recorder.request(
+        "explain",
+        "POST",
+        EXPLAIN_PATH,
+        json={
+            "conversationId": conversation["id"],
+            "messageId": conversation["messages"][-1]["id"],
+        },
+    )
+
+
+async def health_polling(recorder: Recorder) -> None:
+    await recorder.request("gtg", "GET", "/__gtg")
+    await recorder.request("health", "GET", "/__health")
+
+
+SCENARIOS: dict[str, Callable[[Recorder], Awaitable[None]]] = {
+    "new_conversation": new_conversation,
+    "continued_conversation": continued_conversation,
+    "explain": explain,
+    "health_polling": health_polling,
+}
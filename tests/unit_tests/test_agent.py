@@ -599,3 +599,17 @@ def test_cognite_settings_obo_client_secret_env_prefix_loading():
         assert settings.tenant_id is None
         assert settings.token_file_path is None
         assert settings.obo_client_secret.get_secret_value() == "secret-key"
+
+
+def test_llm_settings_hugging_face_prompt_cache_key() -> None:
+    with pytest.raises(
+        ValueError,
+        match="`prompt_cache_key` is supported only by OpenAI and Azure OpenAI.",
+    ):
+        LLMSettings(
+            type=LLMType.hugging_face,
+            model="openai/gpt-oss-120b",
+            hugging_face_endpoint="https://example.huggingface.cloud/v1",
+            prompt_cache_key="talk2powersystem",
+            api_key=SecretStr("secret-key"),
+        )
@@ -0,0 +1,77 @@
+from unittest.mock import MagicMock
+
+from jose import jwt
+
+from talk2powersystemllm.agent import AgentsCache
+
+
+class FakeTimer:
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def obo_token(**claims) -> str:
+    return jwt.encode(claims, "secret", algorithm="HS256")
+
+
+def test_get_user_key_and_expiry() -> None:
+    token = obo_token(oid="user-1", tid="tenant", sub="subject", exp=1000)
+    assert AgentsCache.get_user_key_and_expiry(token) == ("tenant:user-1", 1000.0)
+
+    token = obo_token(sub="subject", exp=1000)
+    assert AgentsCache.get_user_key_and_expiry(token) == (":subject", 1000.0)
+
+
+def test_get_user_key_and_expiry_no_identity() -> None:
+    assert AgentsCache.get_user_key_and_expiry(None) == (None, None)
+    assert AgentsCache.get_user_key_and_expiry("not a jwt") == (None, None)
+    assert AgentsCache.get_user_key_and_expiry(obo_token(oid="user-1")) == (
+        None,
+        None,
+    )
+    assert AgentsCache.get_user_key_and_expiry(obo_token(exp=1000)) == (None, None)
+
+
+def test_hit_and_miss() -> None:
+    cache = AgentsCache(maxsize=2, expiry_margin=60, timer=FakeTimer(0))
+    agent = MagicMock()
+
+    assert cache.get("user-1") is None
+    cache.put("user-1", 1000, agent)
+    assert cache.get("user-1") is agent
+    assert cache.get("user-2") is None
+
+    assert cache.info == {"hits": 1, "misses": 2, "size": 1, "maxsize": 2}
+
+
+def test_eviction_before_token_expiry() -> None:
+    timer = FakeTimer(0)
+    cache = AgentsCache(maxsize=2, expiry_margin=60, timer=timer)
+    agent = MagicMock()
+    cache.put("user-1", 1000, agent)
+
+    timer.now = 939
+    assert cache.get("user-1") is agent
+
+    timer.now = 940
+    assert cache.get("user-1") is None
+
+
+def test_token_expiring_within_the_margin_is_not_cached() -> None:
+    cache = AgentsCache(maxsize=2, expiry_margin=60, timer=FakeTimer(950))
+    cache.put("user-1", 1000, MagicMock())
+    assert cache.get("user-1") is None
+    assert cache.info["size"] == 0
+
+
+def test_bounded_size() -> None:
+    cache = AgentsCache(maxsize=2, expiry_margin=60, timer=FakeTimer(0))
+    for user in ("user-1", "user-2", "user-3"):
+        cache.put(user, 1000, MagicMock())
+
+    assert cache.info["size"] == 2
+    assert cache.get("user-1") is None
+    assert cache.get("user-3") is not None
@@ -0,0 +1,131 @@
+import asyncio
+import base64
+import time
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from jose import jwt
+
+from talk2powersystemllm.app.server.config import SecuritySettings
+from talk2powersystemllm.app.server.services import JwksCache, JwtVerifier
+
+DISCOVERY_URL = "https://login.example.com/.well-known/openid-configuration"
+JWKS_URI = "https://login.example.com/keys"
+SECRET = "secret"
+KEY = {
+    "kty": "oct",
+    "kid": "key-1",
+    "alg": "HS256",
+    "k": base64.urlsafe_b64encode(SECRET.encode()).decode().rstrip("="),
+}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class IssuerTransport(httpx.AsyncBaseTransport):
+    def __init__(self, keys: list[dict]):
+        self.keys = keys
+        self.requests = []
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(str(request.url))
+        # let the concurrent requests pile up
+        await asyncio.sleep(0.01)
+        if str(request.url) == DISCOVERY_URL:
+            return httpx.Response(200, json={"jwks_uri": JWKS_URI})
+        return httpx.Response(200, json={"keys": self.keys})
+
+
+def jwks_cache(transport: IssuerTransport, clock: Clock) -> JwksCache:
+    return JwksCache(
+        DISCOVERY_URL,
+        ttl=100,
+        min_refresh_interval=10,
+        timer=clock,
+        transport=transport,
+    )
+
+
+@pytest.mark.asyncio
+async def test_get_key_single_flight() -> None:
+    transport = IssuerTransport([KEY])
+    cache = jwks_cache(transport, Clock())
+
+    keys = await asyncio.gather(*(cache.get_key("key-1") for _ in range(10)))
+
+    assert keys == [KEY] * 10
+    assert transport.requests == [DISCOVERY_URL, JWKS_URI]
+
+
+@pytest.mark.asyncio
+async def test_get_key_stale_while_revalidate() -> None:
+    transport = IssuerTransport([KEY])
+    clock = Clock()
+    cache = jwks_cache(transport, clock)
+    await cache.get_key("key-1")
+
+    clock.now = 150
+    new_key = {**KEY, "kid": "key-2"}
+    transport.keys = [new_key]
+
+    # the stale key is returned, while the keys are refreshed
+    assert await cache.get_key("key-1") == KEY
+    await asyncio.sleep(0.05)
+    assert await cache.get_key("key-2") == new_key
+    assert transport.requests == [DISCOVERY_URL, JWKS_URI, JWKS_URI]
+
+
+@pytest.mark.asyncio
+async def test_get_key_unknown_kid_refresh_is_rate_limited() -> None:
+    transport = IssuerTransport([KEY])
+    clock = Clock()
+    cache = jwks_cache(transport, clock)
+    await cache.get_key("key-1")
+
+    with pytest.raises(HTTPException) as exc_info:
+        await cache.get_key("key-2")
+    assert exc_info.value.status_code == 401
+    assert len(transport.requests) == 2
+
+    clock.now = 20
+    transport.keys = [KEY, {**KEY, "kid": "key-2"}]
+    assert (await cache.get_key("key-2"))["kid"] == "key-2"
+    assert len(transport.requests) == 3
+
+
+class FakeJwksCache:
+    def __init__(self):
+        self.calls = 0
+
+    async def get_key(self, kid: str | None) -> dict:
+        self.calls += 1
+        return KEY
+
+
+@pytest.mark.asyncio
+async def test_verify_caches_verified_tokens() -> None:
+    settings = SecuritySettings(audience="api://talk2powersystem", issuer="issuer")
+    cache = FakeJwksCache()
+    verifier = JwtVerifier(settings, cache, cache_size=10)
+    claims = {
+        "aud": "api://talk2powersystem",
+        "iss": "issuer",
+        "sub": "user",
+        "exp": int(time.time()) + 3600,
+    }
+    token = jwt.encode(claims, SECRET, algorithm="HS256", headers={"kid": "key-1"})
+
+    assert await verifier.verify(token) == claims
+    assert await verifier.verify(token) == claims
+    assert cache.calls == 1
+
+    with pytest.raises(HTTPException) as exc_info:
+        await verifier.verify(token + "x")
+    assert exc_info.value.status_code == 401
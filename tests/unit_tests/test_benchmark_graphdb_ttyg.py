@@ -0,0 +1,146 @@
+import json
+from pathlib import Path
+
+import httpx
+import jsonlines
+import pytest
+from tenacity import wait_none
+
+from talk2powersystemllm.scripts import benchmark_graphdb_ttyg
+from talk2powersystemllm.scripts.benchmark_graphdb_ttyg import (
+    GraphDBSettings,
+    ask_questions,
+    create_http_client,
+    get_executed_queries,
+    load_gdb_responses,
+    replay_queries,
+    to_chat_response,
+)
+
+GRAPHDB_SETTINGS = GraphDBSettings(
+    base_url="http://graphdb:7200",
+    repository_id="cim",
+    ttyg_agent_id="agent-1",
+)
+QUERY = "SELECT * { ?s ?p ?o }"
+
+
+def graphdb_handler(request: httpx.Request) -> httpx.Response:
+    path = request.url.path
+    if path == "/rest/chat/chats":
+        question = json.loads(request.content)["question"]
+        if question == "fail":
+            return httpx.Response(503)
+        return httpx.Response(200, json={"conversationId": f"conversation-{question}"})
+    if path == "/rest/chat/chats/question":
+        conversation_id = json.loads(request.content)["conversationId"]
+        return httpx.Response(
+            200,
+            json={
+                "id": conversation_id,
+                "messages": [{"id": "answer-1"}],
+                "usage": {"promptTokens": 10, "completionTokens": 2, "totalTokens": 12},
+            },
+        )
+    if path == "/rest/chat/conversations/explain":
+        return httpx.Response(
+            200,
+            json={
+                "queryMethods": [
+                    {
+                        "name": "sparql_query",
+                        "rawQuery": QUERY,
+                        "query": QUERY,
+                        "errorOutput": None,
+                    }
+                ]
+            },
+        )
+    if request.method == "DELETE":
+        return httpx.Response(200, json={})
+    return httpx.Response(404)
+
+
+@pytest.mark.asyncio
+async def test_ask_questions(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(benchmark_graphdb_ttyg, "RETRY_WAIT", wait_none())
+    gdb_responses_file = tmp_path / "gdb_responses_dev.jsonl"
+    questions = [
+        {"id": "q1", "question_text": "one"},
+        {"id": "q2", "question_text": "two"},
+        {"id": "q3", "question_text": "fail"},
+    ]
+
+    async with create_http_client(
+        GRAPHDB_SETTINGS, 2, transport=httpx.MockTransport(graphdb_handler)
+    ) as client:
+        with jsonlines.open(gdb_responses_file, mode="w", flush=True) as writer:
+            records = await ask_questions(
+                client, GRAPHDB_SETTINGS, questions, 2, writer, "dev"
+            )
+
+    records = {record["question_id"]: record for record in records}
+    assert records["q3"]["status"] == "error"
+    assert set(records["q1"]["timings"]) == {
+        "start_chat_sec",
+        "question_sec",
+        "explain_sec",
+        "delete_sec",
+    }
+    assert records["q1"]["conversation"]["id"] == "conversation-one"
+    # the failed question is asked again on resume
+    assert set(load_gdb_responses(gdb_responses_file)) == {"q1", "q2"}
+
+
+@pytest.mark.asyncio
+async def test_replay_queries_once() -> None:
+    executed = []
+
+    class FakeAsyncGraphDB:
+        client = None
+
+        async def run(self, func, client, repository_id: str, query: str):
+            executed.append(query)
+            return "success", {"results": {"bindings": []}}
+
+    records = [
+        {
+            "question_id": f"q{i}",
+            "elapsed_sec": 1.5,
+            "conversation": {
+                "usage": {"promptTokens": 10, "completionTokens": 2, "totalTokens": 12}
+            },
+            "explain": {
+                "queryMethods": [
+                    {
+                        "name": "sparql_query",
+                        "rawQuery": QUERY,
+                        "query": QUERY,
+                        "errorOutput": None,
+                    },
+                    {
+                        "name": "fts_search",
+                        "rawQuery": "Oslo",
+                        "query": "SELECT ?s { ?s ?p 'Oslo' }",
+                        "errorOutput": "timeout",
+                    },
+                ]
+            },
+        }
+        for i in range(3)
+    ]
+
+    query_results = await replay_queries(
+        FakeAsyncGraphDB(), "cim", get_executed_queries(records)
+    )
+    chat_response = to_chat_response(records[0], query_results)
+
+    assert executed == [QUERY]
+    assert chat_response["total_tokens"] == 12
+    assert [
+        (step["name"], step["args"], step["status"])
+        for step in chat_response["actual_steps"]
+    ] == [
+        ("sparql_query", {"query": QUERY}, "success"),
+        ("fts_search", {"query": "Oslo"}, "error"),
+    ]
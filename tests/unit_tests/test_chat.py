@@ -2,9 +2,16 @@ from unittest.mock import MagicMock
 
 from fastapi import Request
 
+from talk2powersystemllm.app.models import (
+    ChatResponse,
+    ChatStreamEvent,
+    StreamError,
+    Usage,
+)
 from talk2powersystemllm.app.server.routers.chat import (
     build_diagram_image_url,
     build_gdb_visual_graph_url,
+    to_server_sent_event,
 )
 
 
@@ -67,3 +74,33 @@ def test_build_diagram_image_url_root_context() -> None:
     result = build_diagram_image_url(mock_request, "PowSyBl-SLD-substation-OSLO.svg")
 
     assert result == "/rest/chat/diagrams/PowSyBl-SLD-substation-OSLO.svg"
+
+
+def test_to_server_sent_event() -> None:
+    result = to_server_sent_event(
+        ChatStreamEvent.DONE,
+        ChatResponse(
+            id="thread_1",
+            messages=[],
+            usage=Usage(promptTokens=1, completionTokens=2, totalTokens=3),
+        ),
+    )
+
+    assert result == (
+        "event: done\n"
+        'data: {"id":"thread_1","messages":[],'
+        '"usage":{"completionTokens":2,"promptTokens":1,"totalTokens":3}}\n\n'
+    )
+
+
+def test_to_server_sent_event_error() -> None:
+    result = to_server_sent_event(
+        ChatStreamEvent.ERROR,
+        StreamError(message="The agent failed to answer the question", requestId="1"),
+    )
+
+    assert result == (
+        "event: error\n"
+        'data: {"message":"The agent failed to answer the question",'
+        '"requestId":"1"}\n\n'
+    )
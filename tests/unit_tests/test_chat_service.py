@@ -0,0 +1,197 @@
+import pytest
+from langchain_core.messages import AIMessage, AIMessageChunk, ToolMessage
+
+from talk2powersystemllm.app.models import (
+    ChatResponse,
+    ChatStreamEvent,
+    MessageDelta,
+    SvgGraphic,
+    ToolCallEnd,
+    ToolCallStart,
+)
+from talk2powersystemllm.app.server.services import run_agent_loop, stream_agent_loop
+from talk2powersystemllm.tools import SvgArtifact
+
+
+def usage(input_tokens: int, output_tokens: int) -> dict:
+    return {
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": input_tokens + output_tokens,
+    }
+
+
+TOOL_CALL_MESSAGE = AIMessage(
+    id="ai-1",
+    content="",
+    tool_calls=[
+        {
+            "id": "call-1",
+            "name": "display_graphics",
+            "args": {"diagram_iri": "urn:uuid:1"},
+        }
+    ],
+    usage_metadata=usage(100, 10),
+)
+TOOL_MESSAGE = ToolMessage(
+    content='Diagram with name "OSLO"',
+    name="display_graphics",
+    tool_call_id="call-1",
+    artifact=SvgArtifact(link="OSLO.svg", mime_type="image/svg+xml"),
+)
+ANSWER_MESSAGE = AIMessage(
+    id="ai-2", content="Here is the diagram.", usage_metadata=usage(200, 20)
+)
+
+
+class FakeAgent:
+    def __init__(self, chunks: list):
+        self.chunks = chunks
+        self.stream_mode = None
+
+    async def astream(self, input_, config, stream_mode):
+        self.stream_mode = stream_mode
+        for chunk in self.chunks:
+            yield chunk
+
+
+@pytest.fixture
+def agent() -> FakeAgent:
+    return FakeAgent(
+        [
+            (
+                "messages",
+                (
+                    AIMessageChunk(id="ai-2", content="Here"),
+                    {"langgraph_node": "model"},
+                ),
+            ),
+            ("updates", {"model": {"messages": [TOOL_CALL_MESSAGE]}}),
+            ("updates", {"tools": {"messages": [TOOL_MESSAGE]}}),
+            ("updates", {"model": {"messages": [ANSWER_MESSAGE]}}),
+        ]
+    )
+
+
+@pytest.mark.asyncio
+async def test_stream_agent_loop(agent: FakeAgent) -> None:
+    events = [
+        event
+        async for event in stream_agent_loop(
+            agent, "thread_1", "Show OSLO", [], stream_tokens=True
+        )
+    ]
+
+    assert agent.stream_mode == ["updates", "messages"]
+    assert [event for event, _ in events] == [
+        ChatStreamEvent.DELTA,
+        ChatStreamEvent.TOOL_CALL_START,
+        ChatStreamEvent.TOOL_CALL_END,
+        ChatStreamEvent.GRAPHIC,
+        ChatStreamEvent.MESSAGE,
+        ChatStreamEvent.DONE,
+    ]
+    assert events[0][1] == MessageDelta(id="ai-2", delta="Here")
+    assert events[1][1] == ToolCallStart(
+        id="call-1", name="display_graphics", args={"diagram_iri": "urn:uuid:1"}
+    )
+    assert events[2][1] == ToolCallEnd(
+        id="call-1", name="display_graphics", status="success"
+    )
+    assert events[3][1] == SvgGraphic(url="OSLO.svg")
+
+    message = events[4][1]
+    assert message.id == "ai-2"
+    assert message.message == "Here is the diagram."
+    assert message.usage.prompt_tokens == 300
+    assert message.usage.completion_tokens == 30
+    assert message.graphics[0] is events[3][1]
+
+    chat_response = events[5][1]
+    assert isinstance(chat_response, ChatResponse)
+    assert chat_response.messages == [message]
+    assert chat_response.usage.total_tokens == 330
+
+
+@pytest.mark.asyncio
+async def test_run_agent_loop(agent: FakeAgent) -> None:
+    chat_response = await run_agent_loop(agent, "thread_1", "Show OSLO", [])
+
+    assert agent.stream_mode == ["updates"]
+    assert chat_response.id == "thread_1"
+    assert len(chat_response.messages) == 1
+    assert chat_response.messages[0].graphics == [SvgGraphic(url="OSLO.svg")]
+
+
+@pytest.mark.asyncio
+async def test_run_agent_loop_cached_prompt_tokens() -> None:
+    tool_call_message = TOOL_CALL_MESSAGE.model_copy(
+        update={
+            "usage_metadata": {
+                **usage(100, 10),
+                "input_token_details": {"cache_read": 64},
+            }
+        }
+    )
+    agent = FakeAgent(
+        [
+            ("updates", {"model": {"messages": [tool_call_message]}}),
+            ("updates", {"tools": {"messages": [TOOL_MESSAGE]}}),
+            ("updates", {"model": {"messages": [ANSWER_MESSAGE]}}),
+        ]
+    )
+
+    chat_response = await run_agent_loop(agent, "thread_1", "Show OSLO", [])
+
+    assert chat_response.messages[0].usage.cached_prompt_tokens == 64
+    assert chat_response.usage.cached_prompt_tokens == 64
+
+
+@pytest.mark.asyncio
+async def test_run_agent_loop_no_cached_prompt_tokens(agent: FakeAgent) -> None:
+    chat_response = await run_agent_loop(agent, "thread_1", "Show OSLO", [])
+
+    assert chat_response.usage.cached_prompt_tokens is None
+    assert "cachedPromptTokens" not in chat_response.usage.model_dump(
+        by_alias=True, exclude_none=True
+    )
+
+
+@pytest.mark.asyncio
+async def test_run_agent_loop_compacted_prompt_tokens() -> None:
+    answer_message = ANSWER_MESSAGE.model_copy(
+        update={"response_metadata": {"compacted_prompt_tokens": 1500}}
+    )
+    agent = FakeAgent(
+        [
+            ("updates", {"model": {"messages": [TOOL_CALL_MESSAGE]}}),
+            ("updates", {"tools": {"messages": [TOOL_MESSAGE]}}),
+            ("updates", {"model": {"messages": [answer_message]}}),
+        ]
+    )
+
+    chat_response = await run_agent_loop(agent, "thread_1", "Show OSLO", [])
+
+    assert chat_response.messages[0].usage.compacted_prompt_tokens == 1500
+    assert chat_response.usage.compacted_prompt_tokens == 1500
+
+
+class RecordingExplainIndex:
+    def __init__(self):
+        self.spans = {}
+
+    async def put(self, conversation_id: str, spans: dict) -> None:
+        self.spans[conversation_id] = spans
+
+
+@pytest.mark.asyncio
+async def test_run_agent_loop_writes_explain_index(agent: FakeAgent) -> None:
+    explain_index = RecordingExplainIndex()
+
+    await run_agent_loop(
+        agent, "thread_1", "Show OSLO", [], explain_index=explain_index
+    )
+
+    assert explain_index.spans == {
+        "thread_1": {"ai-2": [TOOL_CALL_MESSAGE, TOOL_MESSAGE]}
+    }
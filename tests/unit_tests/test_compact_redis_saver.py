@@ -0,0 +1,316 @@
+import json
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.checkpoint.base import CheckpointTuple, empty_checkpoint
+from langgraph.checkpoint.redis import AsyncRedisSaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from redisvl.index import AsyncSearchIndex
+
+from talk2powersystemllm.app.server.services.compact_redis_saver import (
+    MISSING_PAYLOAD_CONTENT,
+    OFFLOADED_PAYLOAD,
+    CompactRedisSaver,
+    CompressingSerializer,
+    compressed_values,
+)
+
+CONFIG = {"configurable": {"thread_id": "thread_1", "checkpoint_ns": ""}}
+MESSAGES = [
+    HumanMessage(id="human-1", content="List the substations"),
+    AIMessage(
+        id="ai-1",
+        content="",
+        tool_calls=[
+            {"id": "call-1", "name": "sparql_query", "args": {"query": "SELECT"}},
+            {"id": "call-2", "name": "now", "args": {}},
+        ],
+    ),
+    ToolMessage(
+        content="x" * 10_000,
+        tool_call_id="call-1",
+        artifact={"rows": list(range(100))},
+    ),
+    ToolMessage(content="2025-06-01T00:00:00Z", tool_call_id="call-2"),
+]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values: dict[str, bytes] = {}
+        self.hashes: dict[str, dict[str, int]] = {}
+        self.ttls: dict[str, int] = {}
+
+    def pipeline(self, transaction: bool = True) -> "FakePipeline":
+        return FakePipeline(self)
+
+    async def set(self, key: str, value: bytes) -> None:
+        self.values[key] = value
+
+    async def expire(self, key: str, ttl: int) -> None:
+        self.ttls[key] = ttl
+
+    async def mget(self, keys: list[str]) -> list[bytes | None]:
+        return [self.values.get(key) for key in keys]
+
+
+class FakePipeline:
+    def __init__(self, redis: FakeRedis):
+        self.redis = redis
+        self.commands = []
+
+    def set(self, key: str, value: bytes, ex: int | None = None) -> None:
+        self.commands.append(lambda: self.redis.values.__setitem__(key, value))
+        if ex:
+            self.expire(key, ex)
+
+    def expire(self, key: str, ttl: int) -> None:
+        self.commands.append(lambda: self.redis.ttls.__setitem__(key, ttl))
+
+    def hincrby(self, key: str, field: str, value: int) -> None:
+        def hincrby() -> int:
+            fields = self.redis.hashes.setdefault(key, {})
+            fields[field] = fields.get(field, 0) + value
+            return fields[field]
+
+        self.commands.append(hincrby)
+
+    async def execute(self) -> list:
+        return [command() for command in self.commands]
+
+
+@pytest.fixture
+def stored(monkeypatch: pytest.MonkeyPatch) -> dict:
+    """
+    Keeps the last checkpoint document, which AsyncRedisSaver.aput stores
+    in the RedisJSON index, encoded to JSON as by redis-py, and the last writes
+    serialized by the saver, and reads them back with AsyncRedisSaver.aget_tuple.
+    """
+    stored = {}
+
+    async def load(self, data, keys=None, ttl=None, **kwargs):
+        (document,) = data
+        stored["checkpoint"] = json.loads(json.dumps(document))
+        return keys
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        stored["writes"] = [
+            (channel, self.serde.dumps_typed(value)) for channel, value in writes
+        ]
+
+    async def aget_tuple(self, config):
+        if "checkpoint" not in stored:
+            return None
+        return CheckpointTuple(
+            config,
+            {"channel_values": stored_channel_values(self, stored)},
+            {},
+            None,
+            [
+                ("task-1", channel, self.serde.loads_typed(value))
+                for channel, value in stored.get("writes", [])
+            ],
+        )
+
+    monkeypatch.setattr(AsyncSearchIndex, "load", load)
+    monkeypatch.setattr(AsyncRedisSaver, "aput_writes", aput_writes)
+    monkeypatch.setattr(AsyncRedisSaver, "aget_tuple", aget_tuple)
+    return stored
+
+
+def stored_channel_values(saver: AsyncRedisSaver, stored: dict) -> dict:
+    channel_values = stored["checkpoint"]["checkpoint"]["channel_values"]
+    return saver._recursive_deserialize(channel_values)
+
+
+def payload_keys(redis: FakeRedis) -> list[str]:
+    return [key for key in redis.values if key.startswith("checkpoint_payload:")]
+
+
+def create_saver(
+    redis: FakeRedis, offload_threshold: int = 1000, **kwargs
+) -> CompactRedisSaver:
+    return CompactRedisSaver(
+        redis_client=redis,
+        ttl={"default_ttl": 60, "refresh_on_read": True},
+        offload_threshold=offload_threshold,
+        **kwargs,
+    )
+
+
+async def put_messages(saver: CompactRedisSaver, messages: list) -> None:
+    checkpoint = {**empty_checkpoint(), "channel_values": {"messages": messages}}
+    await saver.aput(CONFIG, checkpoint, {"source": "loop", "step": 1}, {})
+
+
+@pytest.mark.parametrize("compression", ["zlib", "zstd"])
+def test_compressing_serializer_round_trip(compression: str) -> None:
+    serde = CompressingSerializer(JsonPlusSerializer(), compression, min_size=100)
+    message = ToolMessage(content="x" * 10_000, tool_call_id="call-1")
+
+    with compressed_values():
+        type_, data = serde.dumps_typed(message)
+
+    assert type_.endswith(f"+{compression}")
+    assert len(data) < 1000
+    assert serde.loads_typed((type_, data)) == message
+
+
+def test_compressing_serializer_small_values() -> None:
+    serde = CompressingSerializer(JsonPlusSerializer(), "zlib", min_size=100)
+
+    with compressed_values():
+        type_, data = serde.dumps_typed({"a": 1})
+
+    assert "+" not in type_
+    assert serde.loads_typed((type_, data)) == {"a": 1}
+
+
+def test_compressing_serializer_outside_of_compressed_values() -> None:
+    serde = CompressingSerializer(JsonPlusSerializer(), "zlib", min_size=0)
+
+    type_, _ = serde.dumps_typed("x" * 10_000)
+
+    assert "+" not in type_
+
+
+def test_compressing_serializer_loads_uncompressed_values() -> None:
+    inner_serde = JsonPlusSerializer()
+    serde = CompressingSerializer(inner_serde, None, min_size=0)
+
+    assert serde.loads_typed(inner_serde.dumps_typed("value")) == "value"
+    with compressed_values():
+        compressed = CompressingSerializer(inner_serde, "zlib", 0).dumps_typed("value")
+    assert compressed[0].endswith("+zlib")
+    assert serde.loads_typed(compressed) == "value"
+
+
+def test_keys_are_in_the_slot_of_the_conversation() -> None:
+    assert CompactRedisSaver.payload_key("thread_1", "call-1") == (
+        "checkpoint_payload:{thread_1}:call-1"
+    )
+    assert CompactRedisSaver.stats_key("thread_1") == "checkpoint_stats:{thread_1}"
+
+
+@pytest.mark.asyncio
+async def test_offload_large_tool_results(stored: dict) -> None:
+    redis = FakeRedis()
+    saver = create_saver(redis)
+
+    await put_messages(saver, MESSAGES)
+
+    key = CompactRedisSaver.payload_key("thread_1", "call-1")
+    assert payload_keys(redis) == [key]
+    assert redis.ttls[key] == 3600
+    messages = stored_channel_values(saver, stored)["messages"]
+    assert messages[2].content == "" and messages[2].artifact is None
+    assert messages[2].additional_kwargs == {OFFLOADED_PAYLOAD: key}
+    assert messages[3] == MESSAGES[3]
+    assert messages[:2] == MESSAGES[:2]
+
+
+@pytest.mark.asyncio
+async def test_tool_results_are_measured_once(
+    stored: dict, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    saver = create_saver(FakeRedis())
+    measured = []
+    dumps_typed = saver.serde.dumps_typed
+
+    def measure(obj):
+        if isinstance(obj, dict) and set(obj) == {"content", "artifact"}:
+            measured.append(obj["content"])
+        return dumps_typed(obj)
+
+    monkeypatch.setattr(saver.serde, "dumps_typed", measure)
+
+    await put_messages(saver, MESSAGES)
+    await put_messages(saver, MESSAGES)
+
+    assert measured == [MESSAGES[2].content, MESSAGES[3].content]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("compression", ["zlib", "zstd"])
+async def test_compression_of_writes_and_payloads(
+    stored: dict, compression: str
+) -> None:
+    redis = FakeRedis()
+    # the offloaded tool results are measured compressed
+    saver = create_saver(
+        redis, offload_threshold=100, compression=compression, compression_min_size=0
+    )
+
+    await put_messages(saver, MESSAGES)
+    await saver.aput_writes(CONFIG, [("messages", MESSAGES[:2])], "task-1")
+
+    # the checkpoint is stored inline as a JSON document
+    assert stored["checkpoint"]["checkpoint"]["type"] == "json"
+    ((_, (type_, _)),) = stored["writes"]
+    assert type_.endswith(f"+{compression}")
+    (key,) = payload_keys(redis)
+    assert redis.values[key].split(b"\n", 1)[0].endswith(f"+{compression}".encode())
+    checkpoint_tuple = await saver.aget_tuple(CONFIG)
+    assert checkpoint_tuple.checkpoint["channel_values"]["messages"] == MESSAGES
+    assert checkpoint_tuple.pending_writes == [("task-1", "messages", MESSAGES[:2])]
+
+
+@pytest.mark.asyncio
+async def test_offloaded_tool_results_are_written_once(stored: dict) -> None:
+    redis = FakeRedis()
+    saver = create_saver(redis)
+
+    await put_messages(saver, MESSAGES)
+    redis.values.clear()
+    await saver.aput_writes(CONFIG, [("messages", MESSAGES[2])], "task-1")
+
+    assert redis.values == {}
+    ((_, value),) = stored["writes"]
+    message = saver.serde.loads_typed(value)
+    assert OFFLOADED_PAYLOAD in message.additional_kwargs
+
+
+@pytest.mark.asyncio
+async def test_offloaded_tool_results_round_trip(stored: dict) -> None:
+    saver = create_saver(FakeRedis())
+
+    await put_messages(saver, MESSAGES)
+    checkpoint_tuple = await saver.aget_tuple(CONFIG)
+
+    assert checkpoint_tuple.checkpoint["channel_values"]["messages"] == MESSAGES
+
+
+@pytest.mark.asyncio
+async def test_missing_offloaded_tool_result(stored: dict) -> None:
+    redis = FakeRedis()
+    saver = create_saver(redis)
+
+    await put_messages(saver, MESSAGES)
+    # expired or evicted, while this process still remembers it's offloaded
+    redis.values.clear()
+    checkpoint_tuple = await saver.aget_tuple(CONFIG)
+
+    messages = checkpoint_tuple.checkpoint["channel_values"]["messages"]
+    assert messages[2].content == MISSING_PAYLOAD_CONTENT
+    assert OFFLOADED_PAYLOAD not in messages[2].additional_kwargs
+
+    redis.values.clear()
+    await put_messages(saver, messages)
+
+    messages = stored_channel_values(saver, stored)["messages"]
+    assert messages[2].content == MISSING_PAYLOAD_CONTENT
+    assert payload_keys(redis) == []
+
+
+@pytest.mark.asyncio
+async def test_stats(stored: dict) -> None:
+    redis = FakeRedis()
+
+    await put_messages(create_saver(redis), MESSAGES)
+    assert redis.hashes == {}
+
+    await put_messages(create_saver(redis, stats=True), MESSAGES)
+    stats = redis.hashes[CompactRedisSaver.stats_key("thread_1")]
+    assert stats["checkpoints"] == 1
+    assert stats["checkpoint_bytes"] > 0
+    assert stats["offloaded_bytes"] > 1000
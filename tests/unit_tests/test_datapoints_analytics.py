@@ -0,0 +1,172 @@
+import numpy as np
+import pytest
+from cognite.client.data_classes.datapoints import DatapointsArray
+
+from talk2powersystemllm.tools.cognite.analytics import (
+    DatapointsAnalytics,
+    add_extrema,
+    add_rolling_statistics,
+    align,
+    downsample,
+    lttb_indexes,
+    minmax_indexes,
+    parse_window,
+    rolling_statistics,
+)
+from talk2powersystemllm.tools.cognite.result_shaping import (
+    SeriesData,
+    shape_datapoints,
+)
+
+START = np.datetime64("2025-06-01T00:00:00", "ns")
+
+
+def series(
+    values: list[float] | np.ndarray,
+    external_id: str = "ts-1",
+    offset_hours: int = 0,
+    is_step: bool = False,
+) -> SeriesData:
+    return SeriesData(
+        external_id=external_id,
+        unit="MW",
+        timestamps=START
+        + (np.arange(len(values)) + offset_hours) * np.timedelta64(1, "h"),
+        columns={"value": np.asarray(values, dtype="float64")},
+        is_step=is_step,
+    )
+
+
+def test_parse_window() -> None:
+    assert parse_window("15m") == np.timedelta64(15, "m")
+    assert parse_window("2d") == np.timedelta64(48, "h")
+    with pytest.raises(ValueError, match="Invalid window 1mo"):
+        parse_window("1mo")
+
+
+def test_lttb_indexes_keep_first_last_and_spikes() -> None:
+    y = np.zeros(1000)
+    y[500] = 100.0
+    y[750] = -100.0
+
+    indexes = lttb_indexes(np.arange(1000, dtype="float64"), y, 20)
+
+    assert len(indexes) == 20
+    assert indexes[0] == 0 and indexes[-1] == 999
+    assert {500, 750} <= set(indexes.tolist())
+    assert np.all(np.diff(indexes) > 0)
+
+
+def test_lttb_indexes_fewer_points_than_requested() -> None:
+    assert lttb_indexes(np.arange(5.0), np.arange(5.0), 10).tolist() == [0, 1, 2, 3, 4]
+
+
+def test_minmax_indexes_keep_extremes_of_each_bucket() -> None:
+    y = np.array([1, 5, 2, 0, 3, 9, 4, 4, 7, 1], dtype="float64")
+
+    indexes = minmax_indexes(y, 6)
+
+    # buckets [0, 5) and [5, 10)
+    assert indexes.tolist() == [0, 1, 3, 5, 9]
+
+
+def test_minmax_indexes_skip_missing_values() -> None:
+    y = np.array([np.nan, 5, 2, np.nan, 3, 9, np.nan, 4, 7, np.nan])
+
+    assert 3 not in minmax_indexes(y, 6).tolist()
+
+
+def test_downsample_adds_stats_of_all_datapoints() -> None:
+    downsampled = downsample(series(np.arange(1000.0)), "minmax", 10)
+
+    assert len(downsampled) <= 10
+    assert downsampled.downsampled_from == 1000
+    assert downsampled.header().endswith(f"datapoints=1000 shown={len(downsampled)}")
+    assert downsampled.annotations[0] == (
+        "stats value: count=1000 min=0 max=999 mean=499.5"
+    )
+    assert downsampled.annotations[1].startswith("downsampled with minmax from 1000")
+
+
+def test_downsample_within_max_points_is_noop() -> None:
+    original = series([1.0, 2.0, 3.0])
+
+    assert downsample(original, "lttb", 10) is original
+
+
+def test_rolling_statistics() -> None:
+    timestamps = START + np.array([0, 1, 2, 4]) * np.timedelta64(1, "h")
+    values = np.array([1.0, 3.0, np.nan, 5.0])
+
+    mean, std = rolling_statistics(timestamps, values, np.timedelta64(2, "h"))
+
+    # windows (t - 2h, t]: [1], [1, 3], [3, nan], [5]
+    assert mean.tolist() == [1.0, 2.0, 3.0, 5.0]
+    assert std.tolist() == [0.0, 1.0, 0.0, 0.0]
+
+
+def test_add_rolling_statistics_columns() -> None:
+    result = add_rolling_statistics(series([1.0, 2.0, 3.0]), "1h")
+
+    assert list(result.columns) == ["value", "rolling_mean_1h", "rolling_std_1h"]
+
+
+def test_add_extrema() -> None:
+    result = add_extrema(series([0, 3, 1, 5, 2, 2, 4, 0]), 2)
+
+    assert result.annotations == [
+        "peaks value: 2025-06-01T03:00:00Z=5, 2025-06-01T06:00:00Z=4",
+        "troughs value: 2025-06-01T02:00:00Z=1, 2025-06-01T04:00:00Z=2",
+    ]
+
+
+def test_align_interpolates_on_the_overlap() -> None:
+    linear = series([0.0, 10.0, 20.0, 30.0], external_id="a")
+    step = series([1.0, 2.0, 3.0], external_id="b", offset_hours=1, is_step=True)
+    step.timestamps = step.timestamps + np.timedelta64(30, "m")
+
+    aligned = align([linear, step])
+
+    assert aligned.external_id == "a,b"
+    assert list(aligned.columns) == ["a", "b"]
+    # the union of the timestamps from 01:30 to 03:00
+    assert aligned.rows(0, len(aligned)) == [
+        "2025-06-01T01:30:00Z,15,1",
+        "2025-06-01T02:00:00Z,20,1",
+        "2025-06-01T02:30:00Z,25,2",
+        "2025-06-01T03:00:00Z,30,2",
+    ]
+    assert aligned.annotations == ["aligned, units: a=MW, b=MW"]
+
+
+def test_align_without_overlap() -> None:
+    with pytest.raises(ValueError, match="don't overlap"):
+        align([series([1.0, 2.0]), series([1.0, 2.0], offset_hours=5)])
+
+
+def test_shape_datapoints_with_analytics() -> None:
+    n = 10_000
+    datapoints = DatapointsArray(
+        id=1,
+        external_id="ts-1",
+        is_string=False,
+        is_step=False,
+        type="numeric",
+        timestamp=START + np.arange(n) * np.timedelta64(1, "m"),
+        value=np.sin(np.arange(n) / 100.0),
+    )
+
+    content, artifact = shape_datapoints(
+        datapoints,
+        max_tokens=4000,
+        analytics=DatapointsAnalytics(downsample="lttb", max_points=50, extrema=1),
+    )
+    lines = content.split("\n")
+
+    assert lines[0] == "external_id=ts-1 datapoints=10000 shown=50"
+    assert lines[1].startswith("peaks value: ")
+    assert lines[3].startswith("stats value: count=10000 ")
+    assert lines[4] == "downsampled with lttb from 10000 to 50 datapoints"
+    assert lines[5] == "timestamp,value"
+    assert len(lines) == 6 + 50
+    assert artifact == [datapoints.dump()]
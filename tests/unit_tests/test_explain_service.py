@@ -0,0 +1,202 @@
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from talk2powersystemllm.app.server.services import ExplainIndex, get_query_methods
+from talk2powersystemllm.app.server.services.explain_service import (
+    get_explain_messages,
+)
+from talk2powersystemllm.tools import SvgArtifact
+
+QUERY_ARTIFACT = {
+    "lc": 1,
+    "type": "constructor",
+    "id": ["ttyg", "tools", "QueryArtifact"],
+    "kwargs": {"type": "query", "query": "SELECT * {}", "query_type": "sparql"},
+}
+TOOL_CALL_MESSAGE = AIMessage(
+    id="ai-1",
+    content="",
+    tool_calls=[
+        {"id": "call-1", "name": "sparql_query", "args": {"query": "SELECT * {}"}},
+        {"id": "call-2", "name": "now", "args": {}},
+    ],
+)
+QUERY_TOOL_MESSAGE = ToolMessage(
+    content="a large SPARQL result",
+    name="sparql_query",
+    tool_call_id="call-1",
+    artifact=QUERY_ARTIFACT,
+)
+ERROR_TOOL_MESSAGE = ToolMessage(
+    content="Error: timeout",
+    name="now",
+    tool_call_id="call-2",
+    status="error",
+)
+ANSWER_MESSAGE = AIMessage(id="ai-2", content="There are 2 substations.")
+
+
+class FakeRedis:
+    def __init__(self):
+        self.hashes: dict[str, dict[str, str]] = {}
+        self.ttls: dict[str, int] = {}
+
+    def pipeline(self, transaction: bool = True) -> "FakePipeline":
+        return FakePipeline(self)
+
+    async def hset(self, key: str, mapping: dict[str, str]) -> None:
+        self.hashes.setdefault(key, {}).update(mapping)
+
+    async def hget(self, key: str, field: str) -> str | None:
+        return self.hashes.get(key, {}).get(field)
+
+    async def expire(self, key: str, ttl: int) -> None:
+        self.ttls[key] = ttl
+
+
+class FakePipeline:
+    def __init__(self, redis: FakeRedis):
+        self.redis = redis
+        self.commands = []
+
+    def hset(self, *args, **kwargs) -> None:
+        self.commands.append(self.redis.hset(*args, **kwargs))
+
+    def expire(self, *args) -> None:
+        self.commands.append(self.redis.expire(*args))
+
+    async def execute(self) -> None:
+        for command in self.commands:
+            await command
+
+
+class FakeCheckpointer:
+    def __init__(self, messages: list):
+        self.messages = messages
+        self.reads = 0
+
+    async def aget(self, config: dict) -> dict:
+        self.reads += 1
+        return {"channel_values": {"messages": self.messages}}
+
+
+@pytest.fixture
+def agent_factory() -> SimpleNamespace:
+    return SimpleNamespace(
+        checkpointer=FakeCheckpointer(
+            [
+                HumanMessage(id="human-1", content="How many substations?"),
+                TOOL_CALL_MESSAGE,
+                QUERY_TOOL_MESSAGE,
+                ERROR_TOOL_MESSAGE,
+                ANSWER_MESSAGE,
+            ]
+        ),
+        advanced_tools={"now"},
+        tool_name_to_gdb_repository={"sparql_query": "cim"},
+    )
+
+
+@pytest.mark.asyncio
+async def test_explain_index_round_trip(agent_factory: SimpleNamespace) -> None:
+    redis = FakeRedis()
+    explain_index = ExplainIndex(redis, agent_factory, ttl=3600, refresh_on_read=True)
+
+    await explain_index.put(
+        "thread_1",
+        {"ai-2": [TOOL_CALL_MESSAGE, QUERY_TOOL_MESSAGE, ERROR_TOOL_MESSAGE]},
+    )
+    query_methods = await explain_index.get("thread_1", "ai-2")
+
+    assert redis.ttls == {"explain:thread_1": 3600}
+    assert [query_method.name for query_method in query_methods] == [
+        "sparql_query",
+        "now",
+    ]
+    assert query_methods[0].query == "SELECT * {}"
+    assert await explain_index.get("thread_1", "ai-1") is None
+
+
+@pytest.mark.asyncio
+async def test_explain_index_serializes_artifacts(
+    agent_factory: SimpleNamespace,
+) -> None:
+    explain_index = ExplainIndex(
+        FakeRedis(), agent_factory, ttl=3600, refresh_on_read=False
+    )
+    tool_message = QUERY_TOOL_MESSAGE.model_copy(
+        update={"artifact": SvgArtifact(link="OSLO.svg", mime_type="image/svg+xml")}
+    )
+
+    await explain_index.put("thread_1", {"ai-2": [TOOL_CALL_MESSAGE, tool_message]})
+    query_methods = await explain_index.get("thread_1", "ai-2")
+
+    assert query_methods[0].query is None
+
+
+@pytest.mark.asyncio
+async def test_get_explain_messages(agent_factory: SimpleNamespace) -> None:
+    messages = await get_explain_messages(agent_factory, "thread_1", "ai-2")
+
+    assert messages == [TOOL_CALL_MESSAGE, QUERY_TOOL_MESSAGE, ERROR_TOOL_MESSAGE]
+
+
+@pytest.mark.asyncio
+async def test_get_query_methods_from_index(agent_factory: SimpleNamespace) -> None:
+    explain_index = ExplainIndex(
+        FakeRedis(), agent_factory, ttl=3600, refresh_on_read=False
+    )
+    await explain_index.put(
+        "thread_1",
+        {"ai-2": [TOOL_CALL_MESSAGE, QUERY_TOOL_MESSAGE, ERROR_TOOL_MESSAGE]},
+    )
+
+    from_index = await get_query_methods(
+        agent_factory, "thread_1", "ai-2", explain_index
+    )
+    assert agent_factory.checkpointer.reads == 0
+
+    from_checkpoint = await get_query_methods(agent_factory, "thread_1", "ai-2")
+    assert agent_factory.checkpointer.reads == 1
+
+    assert from_index == from_checkpoint
+    assert [
+        query_method.model_dump(by_alias=True, exclude_none=True)
+        for query_method in from_index
+    ] == [
+        {
+            "name": "sparql_query",
+            "args": {"query": "SELECT * {}"},
+            "query": "SELECT * {}",
+            "queryType": "sparql",
+            "graphdbRepositoryId": "cim",
+            "hideArgs": True,
+        },
+        {
+            "name": "now",
+            "args": {},
+            "errorOutput": "Error: timeout",
+            "advanced": True,
+        },
+    ]
+
+
+@pytest.mark.asyncio
+async def test_get_query_methods_falls_back_to_checkpoint(
+    agent_factory: SimpleNamespace,
+) -> None:
+    explain_index = ExplainIndex(
+        FakeRedis(), agent_factory, ttl=3600, refresh_on_read=False
+    )
+
+    query_methods = await get_query_methods(
+        agent_factory, "thread_1", "ai-2", explain_index
+    )
+
+    assert agent_factory.checkpointer.reads == 1
+    assert [query_method.name for query_method in query_methods] == [
+        "sparql_query",
+        "now",
+    ]
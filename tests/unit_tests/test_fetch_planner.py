@@ -0,0 +1,195 @@
+import datetime
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+from cognite.client.data_classes.datapoints import DatapointsArray, DatapointsArrayList
+from cognite.client.exceptions import CogniteNotFoundError
+from cognite.client.utils import timestamp_to_ms
+
+from talk2powersystemllm.tools.cognite.fetch_planner import (
+    DatapointsFetchPlanner,
+    FetchLimitExceeded,
+)
+
+START = datetime.datetime(2025, 6, 1, tzinfo=datetime.timezone.utc)
+END = datetime.datetime(2025, 6, 5, tzinfo=datetime.timezone.utc)
+HOUR_MS = 60 * 60 * 1000
+
+
+def hourly_datapoints(external_id: str, start, end, limit: int | None):
+    # on the full hours, so that the requests, which start within an hour,
+    # return the same datapoints
+    first = -(-timestamp_to_ms(start) // HOUR_MS) * HOUR_MS
+    timestamps = np.arange(first, timestamp_to_ms(end), HOUR_MS)
+    timestamps = timestamps[:limit].astype("datetime64[ms]").astype("datetime64[ns]")
+    return DatapointsArray(
+        id=1,
+        external_id=external_id,
+        is_string=False,
+        is_step=False,
+        type="numeric",
+        timestamp=timestamps,
+        value=np.arange(len(timestamps), dtype="float64"),
+    )
+
+
+def fake_client() -> MagicMock:
+    def retrieve_arrays(external_id, limit, start, end, aggregates, granularity):
+        if isinstance(external_id, str):
+            return hourly_datapoints(external_id, start, end, limit)
+        return DatapointsArrayList(
+            [hourly_datapoints(x, start, end, limit) for x in external_id]
+        )
+
+    client = MagicMock()
+    client.time_series.data.retrieve_arrays.side_effect = retrieve_arrays
+    return client
+
+
+def test_plan_splits_by_series() -> None:
+    planner = DatapointsFetchPlanner(max_series_per_request=10)
+    external_ids = [f"ts-{i}" for i in range(25)]
+
+    pieces, budget = planner.plan(
+        external_ids, start=START, end=END, aggregates=["average", "max"]
+    )
+
+    assert [len(piece.external_ids) for piece in pieces] == [10, 10, 5]
+    assert budget == 256 * 1024 * 1024 // (24 * 25)
+    assert {piece.limit for piece in pieces} == {budget + 1}
+
+
+def test_plan_splits_raw_datapoints_by_time() -> None:
+    planner = DatapointsFetchPlanner(max_concurrent_requests=4)
+
+    pieces, _ = planner.plan(["ts-1"], start=START, end=END)
+
+    day_ms = 24 * HOUR_MS
+    start_ms = timestamp_to_ms(START)
+    assert [(piece.start, piece.end) for piece in pieces] == [
+        (start_ms + i * day_ms, start_ms + (i + 1) * day_ms) for i in range(4)
+    ]
+    assert [piece.window for piece in pieces] == [0, 1, 2, 3]
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"start": START, "end": END, "limit": 10},
+        {"start": START, "end": END, "aggregates": "average"},
+        {"start": None, "end": END},
+        {"start": START, "end": START + datetime.timedelta(minutes=90)},
+        {"start": "invalid", "end": END},
+    ],
+)
+def test_plan_doesnt_split_by_time(kwargs: dict) -> None:
+    pieces, _ = DatapointsFetchPlanner().plan(["ts-1"], **kwargs)
+
+    assert len(pieces) == 1
+    assert (pieces[0].start, pieces[0].end) == (kwargs["start"], kwargs["end"])
+
+
+def test_fetch_merges_windows_in_order() -> None:
+    client = fake_client()
+    planner = DatapointsFetchPlanner(max_concurrent_requests=4)
+
+    datapoints = planner.fetch(client, "ts-1", start=START, end=END)
+
+    assert client.time_series.data.retrieve_arrays.call_count == 4
+    assert isinstance(datapoints, DatapointsArray)
+    assert datapoints.external_id == "ts-1"
+    assert len(datapoints) == 4 * 24
+    assert np.all(np.diff(datapoints.timestamp.astype("int64")) > 0)
+
+
+def test_fetch_keeps_the_order_of_the_time_series() -> None:
+    client = fake_client()
+    planner = DatapointsFetchPlanner(
+        max_series_per_request=2, max_concurrent_requests=3
+    )
+    external_ids = ["ts-3", "ts-1", "ts-2", "ts-1", "ts-0"]
+
+    datapoints = planner.fetch(
+        client, external_ids, start=START, end=END, aggregates="average"
+    )
+
+    assert client.time_series.data.retrieve_arrays.call_count == 2
+    assert isinstance(datapoints, DatapointsArrayList)
+    assert [array.external_id for array in datapoints] == external_ids
+
+
+def downloaded_datapoints(client: MagicMock) -> list[int]:
+    """Wraps the fake client to count the datapoints returned by each request."""
+    retrieve_arrays = client.time_series.data.retrieve_arrays.side_effect
+    downloaded = []
+
+    def count(*args, **kwargs):
+        result = retrieve_arrays(*args, **kwargs)
+        downloaded.append(len(result))
+        return result
+
+    client.time_series.data.retrieve_arrays.side_effect = count
+    return downloaded
+
+
+def test_fetch_over_the_memory_ceiling() -> None:
+    client = fake_client()
+    downloaded = downloaded_datapoints(client)
+    # 16 bytes per raw datapoint, so 40 datapoints over the 4 time windows,
+    # while each window has 24 datapoints
+    planner = DatapointsFetchPlanner(max_concurrent_requests=4, max_fetch_bytes=640)
+
+    with pytest.raises(FetchLimitExceeded, match="more than 40 datapoints"):
+        planner.fetch(client, "ts-1", start=START, end=END)
+
+    # the windows start with 10 datapoints each
+    calls = client.time_series.data.retrieve_arrays.call_args_list
+    assert [call.kwargs["limit"] for call in calls[:4]] == [10] * 4
+    # one more datapoint than the budget, to find out it's exceeded
+    assert sum(downloaded) == 41
+
+
+def test_fetch_within_the_memory_ceiling_over_all_windows() -> None:
+    client = fake_client()
+    retrieve_arrays = client.time_series.data.retrieve_arrays.side_effect
+
+    def first_day_only(external_id, limit, start, end, aggregates, granularity):
+        if start >= timestamp_to_ms(START + datetime.timedelta(days=1)):
+            end = start
+        return retrieve_arrays(external_id, limit, start, end, aggregates, granularity)
+
+    client.time_series.data.retrieve_arrays.side_effect = first_day_only
+    downloaded = downloaded_datapoints(client)
+    # 40 datapoints over the 4 time windows, all 24 of them in the first window
+    planner = DatapointsFetchPlanner(max_concurrent_requests=4, max_fetch_bytes=640)
+
+    datapoints = planner.fetch(client, "ts-1", start=START, end=END)
+
+    # the first window is continued with the budget left by the others
+    calls = client.time_series.data.retrieve_arrays.call_args_list
+    assert [call.kwargs["limit"] for call in calls[:4]] == [10] * 4
+    assert calls[4].kwargs["start"] == timestamp_to_ms(START) + 9 * HOUR_MS + 1
+    assert sum(downloaded) == 24
+    assert len(datapoints) == 24
+    assert np.all(np.diff(datapoints.timestamp.astype("int64")) > 0)
+
+
+def test_fetch_with_a_limit_within_the_memory_ceiling() -> None:
+    client = fake_client()
+    planner = DatapointsFetchPlanner(max_fetch_bytes=640)
+
+    datapoints = planner.fetch(client, "ts-1", limit=5, start=START, end=END)
+
+    assert len(datapoints) == 5
+
+
+def test_fetch_raises_the_error_of_a_request() -> None:
+    client = fake_client()
+    client.time_series.data.retrieve_arrays.side_effect = CogniteNotFoundError(
+        message="Not found", code=404, missing=["ts-1"]
+    )
+    planner = DatapointsFetchPlanner(max_series_per_request=1)
+
+    with pytest.raises(CogniteNotFoundError):
+        planner.fetch(client, ["ts-1", "ts-2"], aggregates="average")
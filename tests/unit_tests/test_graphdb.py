@@ -0,0 +1,35 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+from pyparsing import ParseException
+
+from talk2powersystemllm.graphdb import TracingGraphDB
+
+
+def test_parse_query_is_serialized() -> None:
+    lock = threading.Lock()
+    state = {"current": 0, "peak": 0}
+
+    def parse_query(query: str) -> None:
+        with lock:
+            state["current"] += 1
+            state["peak"] = max(state["peak"], state["current"])
+        time.sleep(0.01)
+        with lock:
+            state["current"] -= 1
+        raise ParseException(query)
+
+    def eval_sparql_query(query: str) -> None:
+        with pytest.raises(ValueError):
+            graphdb.eval_sparql_query("cim", query)
+
+    with patch("rdflib.plugins.sparql.parser.parseQuery", parse_query):
+        graphdb = TracingGraphDB.__new__(TracingGraphDB)
+        queries = [f"SELECT * {{ ?s ?p {i} }}" for i in range(8)]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(eval_sparql_query, queries))
+
+    assert state["peak"] == 1
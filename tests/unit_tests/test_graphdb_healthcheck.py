@@ -9,6 +9,7 @@ from ttyg.graphdb import GraphDBAutocompleteStatus, GraphDBRdfRankStatus
 
 from talk2powersystemllm.app.models import HealthStatus
 from talk2powersystemllm.app.server.services import GraphDBHealthchecker
+from talk2powersystemllm.graphdb import AsyncGraphDB
 
 # minimal responses
 green_status = {"status": "green"}
@@ -63,6 +64,7 @@ def mock_agent_factory() -> MagicMock:
     agent_factory = MagicMock()
     # Setup default basic repository info
     agent_factory.graphdb_client = MagicMock()
+    agent_factory.async_graphdb_client = AsyncGraphDB(agent_factory.graphdb_client)
     agent_factory.graphdb_repository_id = "cim"
 
     # Setup default settings (no retrieval tool by default)
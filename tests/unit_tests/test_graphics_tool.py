@@ -1,3 +1,4 @@
+import threading
 from unittest.mock import MagicMock
 
 import httpx
@@ -7,6 +8,7 @@ from rdflib import Literal as RDFLiteral
 from rdflib import Variable
 from ttyg.graphdb import GraphDB
 
+from talk2powersystemllm.graphdb import AsyncGraphDB
 from talk2powersystemllm.tools import (
     GraphDBVisualGraphArtifact,
     GraphicsTool,
@@ -229,3 +231,39 @@ def test_graphics_tool_eval_sparql_query_error(
         )
 
     assert mock_graphdb.eval_sparql_query.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_graphics_tool_arun_uses_graphdb_thread_pool(
+    mock_graphdb: GraphDB,
+) -> None:
+    mock_results = MockBindings(
+        {
+            Variable("name"): RDFLiteral("Diagram of substation OSLO"),
+            Variable("format"): RDFLiteral("image/svg+xml"),
+            Variable("link"): RDFLiteral("PowSyBl-SLD-substation-OSLO.svg"),
+        }
+    )
+    thread_names = []
+
+    def eval_sparql_query(*_args, **_kwargs):
+        thread_names.append(threading.current_thread().name)
+        return mock_results, None
+
+    mock_graphdb.eval_sparql_query.side_effect = eval_sparql_query
+    async_graphdb = AsyncGraphDB(mock_graphdb, max_workers=1)
+    graphics_tool = GraphicsTool(
+        graph=mock_graphdb, async_graph=async_graphdb, graphdb_repository_id="cim"
+    )
+
+    content, artifact = await graphics_tool._arun(
+        diagram_iri="urn:uuid:a53f9c60-189d-4be2-b3af-0320298e529d",
+        diagram_configuration_iri=None,
+        node_iri=None,
+    )
+    async_graphdb.shutdown()
+
+    assert isinstance(artifact, SvgArtifact)
+    assert content == 'Diagram with name "Diagram of substation OSLO"'
+    assert len(thread_names) == 1
+    assert thread_names[0].startswith("graphdb")
@@ -0,0 +1,143 @@
+import json
+import logging
+import logging.handlers
+import queue
+
+from langchain_core.messages import AIMessage, ToolMessage
+
+from talk2powersystemllm.app.server.logging_conf import (
+    JsonFormatter,
+    LazyPreview,
+    NonBlockingQueueHandler,
+    SamplingFilter,
+    preview,
+)
+
+TOOL_CALL_MESSAGE = AIMessage(
+    id="ai-1",
+    content="",
+    tool_calls=[{"id": "call-1", "name": "sparql_query", "args": {"query": "ASK {}"}}],
+)
+TOOL_MESSAGE = ToolMessage(
+    content="x" * 1000,
+    name="sparql_query",
+    tool_call_id="call-1",
+    artifact={"rows": list(range(1000))},
+)
+
+
+def make_record(msg: str, *args, **extra) -> logging.LogRecord:
+    record = logging.makeLogRecord(
+        {"name": "test", "levelno": logging.INFO, "levelname": "INFO", "msg": msg}
+    )
+    record.args = args
+    record.__dict__.update(extra)
+    return record
+
+
+def test_preview_truncates_the_tool_outputs() -> None:
+    summary = preview({"tools": {"messages": [TOOL_MESSAGE]}}, max_chars=10)
+
+    assert summary == {
+        "tools": {
+            "messages": [
+                {
+                    "type": "tool",
+                    "id": None,
+                    "content": "xxxxxxxxxx... (1000 characters)",
+                    "name": "sparql_query",
+                    "status": "success",
+                    "artifact": "dict",
+                }
+            ]
+        }
+    }
+    assert preview(TOOL_CALL_MESSAGE, max_chars=10)["tool_calls"] == [
+        {"name": "sparql_query", "args": '{"query": ... (19 characters)'}
+    ]
+
+
+def test_lazy_preview_is_rendered_only_when_formatted() -> None:
+    class Counting:
+        renders = 0
+
+        def __str__(self) -> str:
+            Counting.renders += 1
+            return "value"
+
+    logger = logging.getLogger("test_lazy_preview")
+    logger.setLevel(logging.WARNING)
+    logger.info("Output %s", LazyPreview(Counting(), max_chars=10))
+    assert Counting.renders == 0
+
+    record = make_record("Output %s", LazyPreview(Counting(), max_chars=10))
+    assert record.getMessage() == 'Output "value"'
+    assert Counting.renders == 1
+
+
+def test_json_formatter() -> None:
+    record = make_record(
+        "Conversation %s: Output %s",
+        "thread_1",
+        LazyPreview({"model": {"messages": [TOOL_CALL_MESSAGE]}}, max_chars=100),
+        x_request_id="request_1",
+        conversation_id="thread_1",
+        output=LazyPreview([TOOL_MESSAGE], max_chars=5),
+    )
+
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "test"
+    assert entry["x_request_id"] == "request_1"
+    assert entry["conversation_id"] == "thread_1"
+    assert entry["message"].startswith('Conversation thread_1: Output {"model"')
+    assert entry["output"][0]["content"] == "xxxxx... (1000 characters)"
+    assert entry["timestamp"].endswith("Z")
+
+
+def test_sampling_filter_samples_the_verbose_records_per_request() -> None:
+    sampling_filter = SamplingFilter(rate=0.5)
+
+    assert sampling_filter.filter(make_record("not verbose", x_request_id="a"))
+    kept = {
+        request_id
+        for request_id in (f"request_{i}" for i in range(1000))
+        if sampling_filter.filter(
+            make_record("verbose", x_request_id=request_id, verbose=True)
+        )
+    }
+    assert 400 < len(kept) < 600
+    # the same decision for all records of a request
+    assert all(
+        sampling_filter.filter(
+            make_record("verbose", x_request_id=request_id, verbose=True)
+        )
+        for request_id in kept
+    )
+    assert SamplingFilter(rate=0).filter(make_record("verbose", verbose=True)) is False
+
+
+def test_non_blocking_queue_handler() -> None:
+    records = []
+
+    class ListHandler(logging.Handler):
+        def emit(self, record: logging.LogRecord) -> None:
+            records.append(record)
+
+    handler = NonBlockingQueueHandler(queue.Queue())
+    listener = logging.handlers.QueueListener(handler.queue, ListHandler())
+    logger = logging.getLogger("test_queue")
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    listener.start()
+    try:
+        logger.info("Output %s", "value")
+    finally:
+        listener.stop()
+        logger.removeHandler(handler)
+
+    (record,) = records
+    # the message is formatted only by the handlers of the listener
+    assert record.args == ("value",)
+    assert record.getMessage() == "Output value"
@@ -0,0 +1,137 @@
+import asyncio
+import sys
+import time
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+from prometheus_client import REGISTRY
+
+from talk2powersystemllm.app.server.metrics import (
+    MetricsCallbackHandler,
+    generate_metrics,
+    monitor_event_loop,
+)
+
+
+def sample_value(name: str, labels: dict[str, str]) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_tool_calls() -> None:
+    handler = MetricsCallbackHandler({"sparql_query": "cim"})
+    labels = {"tool": "sparql_query", "repository": "cim"}
+    success_count = sample_value(
+        "talk2powersystem_tool_call_duration_seconds_count",
+        {**labels, "status": "success"},
+    )
+    error_count = sample_value(
+        "talk2powersystem_tool_call_duration_seconds_count",
+        {**labels, "status": "error"},
+    )
+
+    for fail in (False, True, False):
+        run_id = uuid.uuid4()
+        handler.on_tool_start({"name": "sparql_query"}, "{}", run_id=run_id)
+        if fail:
+            handler.on_tool_error(ValueError("timeout"), run_id=run_id)
+        else:
+            handler.on_tool_end("result", run_id=run_id)
+
+    assert sample_value(
+        "talk2powersystem_tool_call_duration_seconds_count",
+        {**labels, "status": "success"},
+    ) == (success_count + 2)
+    assert sample_value(
+        "talk2powersystem_tool_call_duration_seconds_count",
+        {**labels, "status": "error"},
+    ) == (error_count + 1)
+
+
+def test_agent_steps_only_of_the_nodes() -> None:
+    handler = MetricsCallbackHandler({})
+    name = "talk2powersystem_agent_step_duration_seconds_count"
+    count = sample_value(name, {"node": "model"})
+
+    node_run_id, nested_run_id = uuid.uuid4(), uuid.uuid4()
+    metadata = {"langgraph_node": "model"}
+    handler.on_chain_start({}, {}, run_id=node_run_id, metadata=metadata, name="model")
+    handler.on_chain_start(
+        {}, {}, run_id=nested_run_id, metadata=metadata, name="RunnableSequence"
+    )
+    handler.on_chain_end({}, run_id=nested_run_id)
+    handler.on_chain_end({}, run_id=node_run_id)
+
+    assert sample_value(name, {"node": "model"}) == count + 1
+
+
+def test_llm_calls() -> None:
+    handler = MetricsCallbackHandler({})
+    labels = {"model": "gpt-test"}
+    ttft_count = sample_value(
+        "talk2powersystem_llm_time_to_first_token_seconds_count", labels
+    )
+    input_tokens = sample_value(
+        "talk2powersystem_llm_tokens_sum", {**labels, "type": "input"}
+    )
+
+    run_id = uuid.uuid4()
+    handler.on_chat_model_start(
+        {}, [], run_id=run_id, metadata={"ls_model_name": "gpt-test"}
+    )
+    handler.on_llm_new_token("Hello", run_id=run_id)
+    handler.on_llm_new_token(" world", run_id=run_id)
+    message = AIMessage(
+        "Hello world",
+        usage_metadata={"input_tokens": 120, "output_tokens": 2, "total_tokens": 122},
+    )
+    handler.on_llm_end(
+        LLMResult(generations=[[ChatGeneration(message=message)]]), run_id=run_id
+    )
+
+    assert (
+        sample_value("talk2powersystem_llm_time_to_first_token_seconds_count", labels)
+        == ttft_count + 1
+    )
+    assert (
+        sample_value("talk2powersystem_llm_tokens_sum", {**labels, "type": "input"})
+        == input_tokens + 120
+    )
+
+
+def test_generate_metrics_with_caches() -> None:
+    state = SimpleNamespace(
+        agent_factory=SimpleNamespace(
+            agents_cache=None,
+            sparql_cache=SimpleNamespace(info={"hits": 3, "misses": 1}),
+        ),
+        startup_cache=SimpleNamespace(info={"hits": 2, "misses": 0}),
+    )
+
+    metrics = generate_metrics(state).decode("utf-8")
+
+    assert 'talk2powersystem_cache{cache="sparql",stat="hits"} 3.0' in metrics
+    assert 'talk2powersystem_cache{cache="startup",stat="hits"} 2.0' in metrics
+    assert "talk2powersystem_tool_call_duration_seconds" in metrics
+
+
+@pytest.mark.asyncio
+async def test_monitor_event_loop() -> None:
+    count = sample_value("talk2powersystem_event_loop_lag_seconds_count", {})
+    total = sample_value("talk2powersystem_event_loop_lag_seconds_sum", {})
+
+    monitor = asyncio.create_task(monitor_event_loop(0.01))
+    await asyncio.sleep(0)
+    # blocks the event loop
+    time.sleep(0.1)
+    await asyncio.sleep(0.05)
+    monitor.cancel()
+
+    assert sample_value("talk2powersystem_event_loop_lag_seconds_count", {}) > count
+    assert sample_value("talk2powersystem_event_loop_lag_seconds_sum", {}) >= (
+        total + 0.08
+    )
+    if sys.platform == "linux":
+        assert sample_value("talk2powersystem_worker_resident_memory_bytes", {}) > 0
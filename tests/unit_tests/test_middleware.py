@@ -0,0 +1,230 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from talk2powersystemllm.middleware import (
+    HistoryCompactionMiddleware,
+    RelevantSchemaMiddleware,
+    ToolCallConcurrencyMiddleware,
+)
+
+
+class ConcurrencyCounter:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.current = 0
+        self.peak = 0
+
+    def enter(self) -> None:
+        with self.lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+
+    def exit(self) -> None:
+        with self.lock:
+            self.current -= 1
+
+
+def tool_call_requests(
+    n: int, message_id: str = "ai-1", thread_id: str = "thread_1"
+) -> list[SimpleNamespace]:
+    message = AIMessage(
+        content="",
+        id=message_id,
+        tool_calls=[
+            {"name": "sparql", "args": {}, "id": f"{message_id}-{i}"} for i in range(n)
+        ],
+    )
+    runtime = SimpleNamespace(config={"configurable": {"thread_id": thread_id}})
+    return [
+        SimpleNamespace(
+            tool_call=tool_call, state={"messages": [message]}, runtime=runtime
+        )
+        for tool_call in message.tool_calls
+    ]
+
+
+def test_wrap_tool_call_limits_concurrency() -> None:
+    middleware = ToolCallConcurrencyMiddleware(max_concurrency=2)
+    counter = ConcurrencyCounter()
+
+    def handler(request: SimpleNamespace) -> str:
+        counter.enter()
+        time.sleep(0.05)
+        counter.exit()
+        return request.tool_call["id"]
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        results = list(
+            executor.map(
+                lambda request: middleware.wrap_tool_call(request, handler),
+                tool_call_requests(5),
+            )
+        )
+
+    assert results == [f"ai-1-{i}" for i in range(5)]
+    assert counter.peak == 2
+
+
+@pytest.mark.asyncio
+async def test_awrap_tool_call_limits_concurrency() -> None:
+    middleware = ToolCallConcurrencyMiddleware(max_concurrency=3)
+    counter = ConcurrencyCounter()
+
+    async def handler(request: SimpleNamespace) -> str:
+        counter.enter()
+        await asyncio.sleep(0.05 if int(request.tool_call["id"][-1]) % 2 else 0.01)
+        counter.exit()
+        return request.tool_call["id"]
+
+    results = await asyncio.gather(
+        *(
+            middleware.awrap_tool_call(request, handler)
+            for request in tool_call_requests(7)
+        )
+    )
+
+    assert results == [f"ai-1-{i}" for i in range(7)]
+    assert counter.peak == 3
+
+
+@pytest.mark.asyncio
+async def test_awrap_tool_call_limits_concurrency_by_step() -> None:
+    middleware = ToolCallConcurrencyMiddleware(max_concurrency=2)
+    counter = ConcurrencyCounter()
+
+    async def handler(request: SimpleNamespace) -> str:
+        counter.enter()
+        await asyncio.sleep(0.05)
+        counter.exit()
+        return request.tool_call["id"]
+
+    requests = [
+        *tool_call_requests(3, thread_id="thread_1"),
+        *tool_call_requests(3, thread_id="thread_2"),
+        *tool_call_requests(3, message_id="ai-2", thread_id="thread_1"),
+    ]
+    await asyncio.gather(
+        *(middleware.awrap_tool_call(request, handler) for request in requests)
+    )
+
+    # two tool calls of each of the three steps
+    assert counter.peak == 6
+
+
+class FakeSchemaIndex:
+    def __init__(self):
+        self.texts = []
+
+    def render(self, text: str) -> str:
+        self.texts.append(text)
+        return "cim:Substation a owl:Class ."
+
+
+def test_relevant_schema_system_prompt() -> None:
+    schema_index = FakeSchemaIndex()
+    middleware = RelevantSchemaMiddleware(
+        "Schema:\n{ontology_schema}\nBe concise.", schema_index
+    )
+
+    system_prompt = middleware.system_prompt(
+        [
+            HumanMessage("List the substations"),
+            AIMessage(
+                "",
+                tool_calls=[
+                    {"id": "1", "name": "sparql_query", "args": {"query": "q1"}}
+                ],
+            ),
+            ToolMessage("old result", tool_call_id="1"),
+            AIMessage("There are 2 substations"),
+            HumanMessage("Which lines are connected to them?"),
+            AIMessage(
+                "",
+                tool_calls=[
+                    {"id": "2", "name": "sparql_query", "args": {"query": "q2"}}
+                ],
+            ),
+            ToolMessage("cim:ACLineSegment", tool_call_id="2"),
+        ]
+    )
+
+    assert system_prompt == "Schema:\ncim:Substation a owl:Class .\nBe concise."
+    assert schema_index.texts == [
+        "List the substations\n"
+        "Which lines are connected to them?\n"
+        '{"query": "q2"}\n'
+        "cim:ACLineSegment"
+    ]
+
+
+def sparql_result(rows: int) -> str:
+    return json.dumps(
+        {
+            "head": {"vars": ["s"]},
+            "results": {
+                "bindings": [
+                    {"s": {"type": "uri", "value": f"urn:uuid:{i}"}}
+                    for i in range(rows)
+                ]
+            },
+        }
+    )
+
+
+HISTORY = [
+    HumanMessage("List the substations"),
+    AIMessage(
+        "",
+        tool_calls=[{"id": "1", "name": "sparql_query", "args": {"query": "q1"}}],
+    ),
+    ToolMessage(sparql_result(200), tool_call_id="1"),
+    AIMessage("There are 200 substations"),
+    HumanMessage("Which lines are connected to them?"),
+    AIMessage(
+        "",
+        tool_calls=[{"id": "2", "name": "sparql_query", "args": {"query": "q2"}}],
+    ),
+    ToolMessage(sparql_result(100), tool_call_id="2"),
+]
+
+
+def test_history_compaction() -> None:
+    middleware = HistoryCompactionMiddleware(
+        token_threshold=1000, keep_last_turns=1, preview_chars=50
+    )
+
+    messages, saved_tokens = middleware.compact(HISTORY)
+
+    assert saved_tokens > 0
+    assert messages[2].content.startswith(
+        f"[Compacted result of {len(HISTORY[2].content)} characters, 200 rows."
+    )
+    assert messages[2].content.endswith(HISTORY[2].content[:50])
+    assert messages[2].tool_call_id == "1"
+    assert messages[:2] == HISTORY[:2]
+    assert messages[3:] == HISTORY[3:]
+    # the original messages aren't changed
+    assert HISTORY[2].content == sparql_result(200)
+
+
+def test_history_compaction_below_threshold() -> None:
+    middleware = HistoryCompactionMiddleware(
+        token_threshold=1_000_000, keep_last_turns=1, preview_chars=50
+    )
+
+    assert middleware.compact(HISTORY) == (HISTORY, 0)
+
+
+def test_history_compaction_keeps_last_turns() -> None:
+    middleware = HistoryCompactionMiddleware(
+        token_threshold=1000, keep_last_turns=2, preview_chars=50
+    )
+
+    assert middleware.compact(HISTORY) == (HISTORY, 0)
@@ -0,0 +1,129 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from cryptography.fernet import Fernet
+from fastapi import HTTPException
+from jose import jwt
+from pydantic import SecretStr
+
+from talk2powersystemllm.app.server.services import OboTokenProvider
+
+
+class FakeTimer:
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeConfidentialApp:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = []
+
+    def acquire_token_on_behalf_of(self, user_assertion: str, scopes: list) -> dict:
+        time.sleep(0.05)
+        with self.lock:
+            self.calls.append(user_assertion)
+            return {"access_token": f"token-{len(self.calls)}", "expires_in": 3600}
+
+
+class FailingConfidentialApp:
+    def acquire_token_on_behalf_of(self, user_assertion: str, scopes: list) -> dict:
+        return {"error": "invalid_grant", "error_description": "AADSTS50013"}
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    async def get(self, key: str) -> bytes | None:
+        return self.values.get(key)
+
+    async def set(self, key: str, value: bytes, ex: int) -> None:
+        self.values[key] = value
+
+
+def authorization(oid: str) -> str:
+    token = jwt.encode({"oid": oid, "tid": "tenant", "exp": 10_000}, "secret")
+    return f"Bearer {token}"
+
+
+def obo_token_provider(confidential_app, timer, **kwargs) -> OboTokenProvider:
+    return OboTokenProvider(
+        confidential_app,
+        scopes=["https://cognite/.default"],
+        maxsize=10,
+        expiry_margin=300,
+        timer=timer,
+        **kwargs,
+    )
+
+
+@pytest.mark.asyncio
+async def test_get_token_single_flight_per_user() -> None:
+    confidential_app = FakeConfidentialApp()
+    provider = obo_token_provider(confidential_app, FakeTimer(0))
+
+    tokens = await asyncio.gather(
+        *(provider.get_token(authorization("user-1")) for _ in range(5)),
+        provider.get_token(authorization("user-2")),
+    )
+
+    assert sorted(set(tokens)) == ["token-1", "token-2"]
+    assert tokens[:5] == [tokens[0]] * 5
+    assert len(confidential_app.calls) == 2
+    assert provider.info["obo_requests"] == 2
+
+
+@pytest.mark.asyncio
+async def test_get_token_until_expiry_margin() -> None:
+    confidential_app = FakeConfidentialApp()
+    timer = FakeTimer(0)
+    provider = obo_token_provider(confidential_app, timer)
+
+    assert await provider.get_token(authorization("user-1")) == "token-1"
+    timer.now = 3299
+    assert await provider.get_token(authorization("user-1")) == "token-1"
+    timer.now = 3300
+    assert await provider.get_token(authorization("user-1")) == "token-2"
+    assert (provider.hits, provider.misses) == (1, 2)
+
+
+@pytest.mark.asyncio
+async def test_get_token_shared_through_redis() -> None:
+    redis = FakeRedis()
+    encryption_key = SecretStr(Fernet.generate_key().decode())
+    confidential_app = FakeConfidentialApp()
+    replicas = [
+        obo_token_provider(
+            confidential_app,
+            FakeTimer(0),
+            redis_client=redis,
+            encryption_key=encryption_key,
+        )
+        for _ in range(2)
+    ]
+
+    assert await replicas[0].get_token(authorization("user-1")) == "token-1"
+    assert await replicas[1].get_token(authorization("user-1")) == "token-1"
+
+    assert len(confidential_app.calls) == 1
+    assert replicas[1].redis_hits == 1
+    (encrypted,) = redis.values.values()
+    assert b"token-1" not in encrypted
+
+
+@pytest.mark.asyncio
+async def test_get_token_error() -> None:
+    provider = obo_token_provider(FailingConfidentialApp(), FakeTimer(0))
+
+    with pytest.raises(HTTPException) as exc_info:
+        await provider.get_token(authorization("user-1"))
+
+    assert exc_info.value.status_code == 401
+    assert "AADSTS50013" in exc_info.value.detail
+    assert provider.info["obo_errors"] == 1
@@ -0,0 +1,137 @@
+from rdflib import OWL, RDF, RDFS, Graph, Literal, Namespace, URIRef
+
+from talk2powersystemllm.ontology_schema import (
+    SchemaIndex,
+    get_local_names,
+    minify_schema,
+    tokenize,
+)
+
+CIM = Namespace("https://cim.ucaiug.io/ns#")
+
+
+def test_get_local_names() -> None:
+    assert get_local_names(CIM["ACLineSegment.r"]) == {"ACLineSegment.r", "r"}
+    assert get_local_names(URIRef("http://purl.org/dc/terms/created")) == {"created"}
+
+
+def test_minify_schema() -> None:
+    schema = Graph()
+    schema.bind("cim", CIM)
+    schema.add((CIM.ACLineSegment, RDF.type, OWL.Class))
+    schema.add((CIM.ACLineSegment, RDFS.label, Literal("ACLineSegment")))
+    schema.add((CIM.ACLineSegment, RDFS.comment, Literal("A wire", lang="en")))
+    schema.add((CIM["ACLineSegment.r"], RDF.type, OWL.DatatypeProperty))
+    schema.add((CIM["ACLineSegment.r"], RDFS.label, Literal("r")))
+    schema.add((CIM["ACLineSegment.r"], RDFS.domain, CIM.ACLineSegment))
+    schema.add((CIM.Substation, RDF.type, OWL.Class))
+    schema.add((CIM.Substation, RDFS.label, Literal("Transformer station")))
+
+    minified = minify_schema(schema)
+
+    assert set(minified) == {
+        (CIM.ACLineSegment, RDF.type, OWL.Class),
+        (CIM["ACLineSegment.r"], RDF.type, OWL.DatatypeProperty),
+        (CIM["ACLineSegment.r"], RDFS.domain, CIM.ACLineSegment),
+        (CIM.Substation, RDF.type, OWL.Class),
+        (CIM.Substation, RDFS.label, Literal("Transformer station")),
+    }
+    turtle = minified.serialize(format="turtle")
+    assert "@prefix cim: <https://cim.ucaiug.io/ns#> ." in turtle
+    assert "cim:ACLineSegment.r" in turtle
+    assert len(turtle) < len(schema.serialize(format="turtle"))
+
+
+def test_tokenize() -> None:
+    assert tokenize("ACLineSegment.r") == {"ac", "line", "segment", "r"}
+    assert tokenize("List all substations with PowerTransformers") == {
+        "list",
+        "all",
+        "substation",
+        "with",
+        "power",
+        "transformer",
+    }
+
+
+def build_schema() -> Graph:
+    schema = Graph()
+    schema.bind("cim", CIM)
+    for class_ in (
+        CIM.IdentifiedObject,
+        CIM.Equipment,
+        CIM.ACLineSegment,
+        CIM.Substation,
+        CIM.Terminal,
+        CIM.PhaseCode,
+    ):
+        schema.add((class_, RDF.type, OWL.Class))
+    schema.add((CIM.Equipment, RDFS.subClassOf, CIM.IdentifiedObject))
+    schema.add((CIM.ACLineSegment, RDFS.subClassOf, CIM.Equipment))
+    schema.add((CIM.Substation, RDFS.subClassOf, CIM.IdentifiedObject))
+    schema.add((CIM.Terminal, RDFS.subClassOf, CIM.IdentifiedObject))
+    schema.add((CIM["PhaseCode.ABC"], RDF.type, CIM.PhaseCode))
+    for property_, domain, range_ in (
+        (CIM["IdentifiedObject.name"], CIM.IdentifiedObject, None),
+        (CIM["ACLineSegment.r"], CIM.ACLineSegment, None),
+        (CIM["Equipment.Terminals"], CIM.Equipment, CIM.Terminal),
+        (CIM["Terminal.phases"], CIM.Terminal, CIM.PhaseCode),
+        (CIM["Substation.Region"], CIM.Substation, None),
+    ):
+        schema.add((property_, RDF.type, OWL.ObjectProperty))
+        schema.add((property_, RDFS.domain, domain))
+        if range_:
+            schema.add((property_, RDFS.range, range_))
+    return schema
+
+
+def test_schema_index_select_class() -> None:
+    index = SchemaIndex(build_schema())
+
+    assert index.select("What is the resistance of the AC line segments?") == {
+        CIM.ACLineSegment,
+        CIM.Equipment,
+        CIM.IdentifiedObject,
+        CIM["ACLineSegment.r"],
+        CIM["Equipment.Terminals"],
+        CIM["IdentifiedObject.name"],
+        CIM.Terminal,
+    }
+
+
+def test_schema_index_select_property() -> None:
+    index = SchemaIndex(build_schema())
+
+    assert index.select("?t cim:Terminal.phases ?phases") == {
+        CIM.Terminal,
+        CIM.IdentifiedObject,
+        CIM["Terminal.phases"],
+        CIM["IdentifiedObject.name"],
+        CIM.PhaseCode,
+        CIM["PhaseCode.ABC"],
+        # `terminal` also matches the name `Terminals` of `cim:Equipment.Terminals`
+        CIM["Equipment.Terminals"],
+        CIM.Equipment,
+    }
+
+
+def test_schema_index_core_terms() -> None:
+    index = SchemaIndex(build_schema(), core_terms=["cim:Substation"])
+
+    assert index.select("Hello") == {
+        CIM.Substation,
+        CIM.IdentifiedObject,
+        CIM["Substation.Region"],
+        CIM["IdentifiedObject.name"],
+    }
+
+
+def test_schema_index_render() -> None:
+    index = SchemaIndex(build_schema())
+
+    turtle = index.render("Which substations are there?")
+
+    assert "@prefix cim: <https://cim.ucaiug.io/ns#> ." in turtle
+    assert "cim:Substation.Region" in turtle
+    assert "cim:ACLineSegment" not in turtle
+    assert index.render("Substations?") is turtle
@@ -0,0 +1,123 @@
+import json
+
+import numpy as np
+from cognite.client.data_classes import TimeSeries, TimeSeriesList
+from cognite.client.data_classes.datapoints import DatapointsArray
+
+from talk2powersystemllm.tools.cognite.result_shaping import (
+    SeriesData,
+    shape_datapoints,
+    shape_time_series,
+)
+
+
+def series(n: int, **columns: np.ndarray) -> SeriesData:
+    return SeriesData(
+        external_id="ts-1",
+        unit="MW",
+        timestamps=np.datetime64("2025-06-01T00:00:00", "ns")
+        + np.arange(n) * np.timedelta64(1, "h"),
+        columns=columns or {"value": np.arange(n, dtype="float64") + 0.5},
+    )
+
+
+def test_render_all_rows_within_budget() -> None:
+    assert series(3).render(max_tokens=1000) == (
+        "external_id=ts-1 unit=MW datapoints=3\n"
+        "timestamp,value\n"
+        "2025-06-01T00:00:00Z,0.5\n"
+        "2025-06-01T01:00:00Z,1.5\n"
+        "2025-06-01T02:00:00Z,2.5"
+    )
+
+
+def test_render_head_tail_and_stats_over_budget() -> None:
+    content = series(1000).render(max_tokens=100)
+    lines = content.split("\n")
+
+    assert len(content) <= 100 * 4
+    assert lines[0] == "external_id=ts-1 unit=MW datapoints=1000"
+    assert lines[1] == "stats value: count=1000 min=0.5 max=999.5 mean=500"
+    assert lines[2] == "timestamp,value"
+    assert lines[3] == "2025-06-01T00:00:00Z,0.5"
+    assert lines[-1] == "2025-07-12T15:00:00Z,999.5"
+    omitted = [line for line in lines if line.endswith("rows omitted ...")]
+    assert len(omitted) == 1
+    head = lines.index(omitted[0]) - 3
+    tail = len(lines) - lines.index(omitted[0]) - 1
+    assert head == tail
+    assert omitted[0] == f"... {1000 - 2 * head} rows omitted ..."
+
+
+def test_render_aggregates_ignore_nan_in_stats() -> None:
+    content = series(
+        400,
+        average=np.where(np.arange(400) % 2, np.nan, 2.0),
+        count=np.full(400, 4),
+    ).render(max_tokens=50)
+
+    assert "stats average: count=200 min=2 max=2 mean=2" in content
+    assert "stats count: count=400 min=4 max=4 mean=4" in content
+    assert "timestamp,average,count" in content
+    assert "2025-06-01T00:00:00Z,2,4" in content
+    assert content.endswith("2025-06-17T15:00:00Z,,4")
+
+
+def test_render_empty() -> None:
+    assert series(0).render(max_tokens=100) == "external_id=ts-1 unit=MW datapoints=0"
+
+
+def test_shape_datapoints_keeps_full_result_in_artifact() -> None:
+    datapoints = DatapointsArray(
+        id=1,
+        external_id="ts-1",
+        is_string=False,
+        is_step=False,
+        type="numeric",
+        timestamp=np.array(["2025-06-01T00:00:00"], dtype="datetime64[ns]"),
+        value=np.array([42.0]),
+    )
+
+    content, artifact = shape_datapoints(datapoints, max_tokens=1000)
+
+    assert content == (
+        "external_id=ts-1 datapoints=1\ntimestamp,value\n2025-06-01T00:00:00Z,42"
+    )
+    assert len(artifact) == 1
+    assert artifact[0]["externalId"] == "ts-1"
+
+
+def test_shape_datapoints_none() -> None:
+    assert shape_datapoints(None, max_tokens=1000) == ("No datapoints found", None)
+
+
+def test_shape_time_series_over_budget() -> None:
+    time_series = TimeSeriesList(
+        [
+            TimeSeries(
+                id=i,
+                external_id=f"ts-{i}",
+                name=f"Time series {i}",
+                metadata={"RNDP_mrid": f"mrid-{i}"},
+                created_time=0,
+                last_updated_time=0,
+                is_step=False,
+                is_string=False,
+            )
+            for i in range(100)
+        ]
+    )
+
+    content, artifact = shape_time_series(time_series, max_tokens=100)
+    lines = content.split("\n")
+
+    assert len(artifact) == 100
+    first = json.loads(lines[0])
+    assert first["externalId"] == "ts-0"
+    assert first["metadata"] == {"RNDP_mrid": "mrid-0"}
+    assert "id" not in first
+    assert "createdTime" not in first
+    assert lines[-1] == (
+        f"... {100 - len(lines) + 1} more time series omitted, "
+        f"use a more specific filter ..."
+    )
@@ -52,7 +52,10 @@ def test_correct_format_start(start: str) -> None:
         mock_session = MagicMock(spec=CogniteSession)
         mock_session.client.return_value = c_mock
 
-        tool = RetrieveDataPointsTool(cognite_session=mock_session)
+        # a single request, the period isn't split in time windows
+        tool = RetrieveDataPointsTool(
+            cognite_session=mock_session, max_concurrent_requests=1
+        )
         tool._run(external_id="external_id", start=start)
 
         c_mock.time_series.data.retrieve_arrays.assert_called_once()
@@ -79,7 +82,8 @@ def test_external_id_doesnt_exist() -> None:
 
         c_mock.time_series.data.retrieve_arrays.assert_called_once_with(
             external_id="external_id",
-            limit=None,
+            # the memory ceiling of 256 MiB in 16 bytes per datapoint, plus one
+            limit=16 * 1024 * 1024 + 1,
             start=None,
             end=None,
             aggregates=None,
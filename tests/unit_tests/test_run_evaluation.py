@@ -0,0 +1,97 @@
+import asyncio
+import threading
+import time
+from pathlib import Path
+
+import jsonlines
+import pytest
+
+from talk2powersystemllm.scripts import run_evaluation
+from talk2powersystemllm.scripts.run_evaluation import (
+    answer_questions,
+    load_chat_responses,
+    percentile,
+    summarize_run,
+)
+
+
+def test_load_chat_responses_skips_errors_and_truncated_lines(tmp_path: Path) -> None:
+    chat_responses_file = tmp_path / "chat_responses_dev.jsonl"
+    with jsonlines.open(chat_responses_file, mode="w") as writer:
+        writer.write({"question_id": "q1", "actual_answer": "1"})
+        writer.write({"question_id": "q2", "status": "error", "error": "timeout"})
+        writer.write({"question_id": "q3", "actual_answer": "3"})
+        writer.write({"question_id": "q3", "status": "error", "error": "timeout"})
+    with open(chat_responses_file, "a") as f:
+        f.write('{"question_id": "q4", "actual_')
+
+    assert load_chat_responses(chat_responses_file) == {
+        "q1": {"question_id": "q1", "actual_answer": "1"}
+    }
+    assert load_chat_responses(tmp_path / "missing.jsonl") == {}
+
+
+def test_percentile() -> None:
+    values = [float(i) for i in range(1, 101)]
+
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile([3.0], 95) == 3
+    assert percentile([], 50) is None
+
+
+def test_summarize_run() -> None:
+    summary = summarize_run(
+        [
+            {"question_id": "q1", "wall_time_sec": 2, "input_tokens": 10},
+            {"question_id": "q2", "wall_time_sec": 4, "output_tokens": 5},
+            {"question_id": "q3", "status": "error", "wall_time_sec": 6},
+        ],
+        elapsed_sec=30,
+    )
+
+    assert summary == {
+        "questions": 3,
+        "errors": 1,
+        "elapsed_sec": 30,
+        "questions_per_minute": 6,
+        "wall_time_sec_p50": 4,
+        "wall_time_sec_p95": 6,
+        "input_tokens": 10,
+        "output_tokens": 5,
+    }
+
+
+@pytest.mark.asyncio
+async def test_answer_questions_concurrently(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    lock = threading.Lock()
+    state = {"current": 0, "peak": 0}
+
+    def run_agent_for_evaluation(agent, question_id: str, _input: dict) -> dict:
+        with lock:
+            state["current"] += 1
+            state["peak"] = max(state["peak"], state["current"])
+        time.sleep(0.05)
+        with lock:
+            state["current"] -= 1
+        return {"question_id": question_id, "actual_answer": question_id}
+
+    monkeypatch.setattr(
+        run_evaluation, "run_agent_for_evaluation", run_agent_for_evaluation
+    )
+    questions = [{"id": f"q{i}", "question_text": f"Q{i}?"} for i in range(6)]
+    chat_responses_file = tmp_path / "chat_responses_dev.jsonl"
+
+    with jsonlines.open(chat_responses_file, mode="w", flush=True) as writer:
+        chat_responses = await asyncio.wait_for(
+            answer_questions(None, questions, 3, writer, "dev"), timeout=5
+        )
+
+    assert state["peak"] == 3
+    assert sorted(response["question_id"] for response in chat_responses) == [
+        f"q{i}" for i in range(6)
+    ]
+    assert all(response["wall_time_sec"] >= 0.05 for response in chat_responses)
+    assert set(load_chat_responses(chat_responses_file)) == {f"q{i}" for i in range(6)}
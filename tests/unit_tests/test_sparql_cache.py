@@ -0,0 +1,213 @@
+import io
+import json
+from unittest.mock import MagicMock
+
+import pytest
+from rdflib import Variable
+from rdflib.query import Result
+from redis.exceptions import ConnectionError
+
+from talk2powersystemllm.sparql_cache import (
+    SparqlResultCache,
+    deserialize_result,
+    is_deterministic,
+    normalize_query,
+    serialize_result,
+)
+
+SELECT_RESULT = {
+    "head": {"vars": ["name"]},
+    "results": {
+        "bindings": [{"name": {"type": "literal", "value": "OSLO"}}],
+    },
+}
+
+
+def select_result() -> Result:
+    return Result.parse(
+        io.BytesIO(json.dumps(SELECT_RESULT).encode("utf-8")), format="json"
+    )
+
+
+class Evaluator:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self) -> tuple[Result, str]:
+        self.calls += 1
+        return select_result(), "SELECT ?name { ?s ?p ?name }"
+
+
+@pytest.fixture
+def cache() -> SparqlResultCache:
+    return SparqlResultCache(max_size=10_000, max_entry_size=1_000, redis_ttl=60)
+
+
+def test_normalize_query() -> None:
+    query = """PREFIX cim: <https://cim.ucaiug.io/ns#>
+    # find the substation
+    SELECT ?s   {
+        ?s cim:IdentifiedObject.name   "OSLO  #1" ;  # the name
+           cim:IdentifiedObject.aliasName '''a
+    b''' .
+    }
+    """
+    assert normalize_query(query) == (
+        "PREFIX cim: <https://cim.ucaiug.io/ns#> SELECT ?s { "
+        '?s cim:IdentifiedObject.name "OSLO  #1" ; '
+        "cim:IdentifiedObject.aliasName '''a\n    b''' . }"
+    )
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("SELECT ?name { ?s ?p ?name }", True),
+        ('SELECT ?s { ?s ?p "NOW()" . ?s <urn:rand()> ?o }', True),
+        ("SELECT (now() AS ?now) {}", False),
+        ("SELECT ?s { ?s ?p ?o } ORDER BY RAND()", False),
+        ("SELECT ?s { BIND(STRUUID() AS ?id) ?s ?p ?o }", False),
+        ("CONSTRUCT { ?s ?p ?o } { BIND(BNODE() AS ?s) BIND(UUID() AS ?o) }", False),
+        ("SELECT NOW( {", True),
+    ],
+)
+def test_is_deterministic(query: str, expected: bool) -> None:
+    assert is_deterministic(query) == expected
+
+
+def test_serialize_and_deserialize_select_result() -> None:
+    result = deserialize_result("SELECT", serialize_result(select_result()))
+    assert [row[Variable("name")].value for row in result.bindings] == ["OSLO"]
+
+
+def test_hit_for_the_same_normalized_query(cache: SparqlResultCache) -> None:
+    evaluate = Evaluator()
+
+    cache.get_or_eval("cim", "SELECT ?name { ?s ?p ?name }", True, evaluate)
+    result, query = cache.get_or_eval(
+        "cim", "SELECT ?name {\n  ?s ?p ?name\n}", True, evaluate
+    )
+
+    assert evaluate.calls == 1
+    assert query == "SELECT ?name { ?s ?p ?name }"
+    assert [row[Variable("name")].value for row in result.bindings] == ["OSLO"]
+    info = cache.info
+    assert info["hits"] == 1
+    assert info["misses"] == 1
+    assert info["hit_ratio"] == 0.5
+    assert info["bytes_saved"] == info["size"] > 0
+
+
+def test_non_deterministic_queries_bypass_the_cache(
+    cache: SparqlResultCache,
+) -> None:
+    evaluate = Evaluator()
+
+    cache.get_or_eval("cim", "SELECT ?s { ?s ?p ?o } ORDER BY RAND()", True, evaluate)
+    cache.get_or_eval("cim", "SELECT ?s { ?s ?p ?o } ORDER BY RAND()", True, evaluate)
+
+    assert evaluate.calls == 2
+    assert cache.info["bypasses"] == 2
+    assert cache.info["entries"] == 0
+
+
+def test_miss_for_another_repository(cache: SparqlResultCache) -> None:
+    evaluate = Evaluator()
+
+    cache.get_or_eval("cim", "SELECT ?name { ?s ?p ?name }", True, evaluate)
+    cache.get_or_eval("qa_dataset", "SELECT ?name { ?s ?p ?name }", True, evaluate)
+
+    assert evaluate.calls == 2
+
+
+def test_update_version_invalidates(cache: SparqlResultCache) -> None:
+    evaluate = Evaluator()
+
+    cache.update_version("100|dataset=2025-01-01")
+    cache.get_or_eval("cim", "SELECT ?name { ?s ?p ?name }", True, evaluate)
+    cache.update_version("100|dataset=2025-01-01")
+    cache.get_or_eval("cim", "SELECT ?name { ?s ?p ?name }", True, evaluate)
+    assert evaluate.calls == 1
+
+    cache.update_version("101|dataset=2025-01-01")
+    assert cache.info["entries"] == 0
+    cache.get_or_eval("cim", "SELECT ?name { ?s ?p ?name }", True, evaluate)
+    assert evaluate.calls == 2
+
+
+def test_large_results_are_not_cached() -> None:
+    cache = SparqlResultCache(max_size=10_000, max_entry_size=10, redis_ttl=60)
+    evaluate = Evaluator()
+
+    cache.get_or_eval("cim", "SELECT ?name { ?s ?p ?name }", True, evaluate)
+    cache.get_or_eval("cim", "SELECT ?name { ?s ?p ?name }", True, evaluate)
+
+    assert evaluate.calls == 2
+    assert cache.info["entries"] == 0
+
+
+def test_exceptions_are_not_cached(cache: SparqlResultCache) -> None:
+    evaluate = MagicMock(side_effect=[ValueError("Timeout"), (select_result(), "q")])
+
+    with pytest.raises(ValueError):
+        cache.get_or_eval("cim", "SELECT ?name { ?s ?p ?name }", True, evaluate)
+    cache.get_or_eval("cim", "SELECT ?name { ?s ?p ?name }", True, evaluate)
+
+    assert evaluate.call_count == 2
+
+
+def test_redis_is_shared_between_caches() -> None:
+    store = {}
+    redis_client = MagicMock()
+    redis_client.get.side_effect = store.get
+    redis_client.set.side_effect = lambda key, value, ex: store.__setitem__(key, value)
+    evaluate = Evaluator()
+
+    first = SparqlResultCache(10_000, 1_000, 60, redis_client=redis_client)
+    first.get_or_eval("cim", "SELECT ?name { ?s ?p ?name }", True, evaluate)
+    second = SparqlResultCache(10_000, 1_000, 60, redis_client=redis_client)
+    result, _ = second.get_or_eval(
+        "cim", "SELECT ?name { ?s ?p ?name }", True, evaluate
+    )
+
+    assert evaluate.calls == 1
+    assert redis_client.set.call_args.kwargs == {"ex": 60}
+    assert second.info["redis_hits"] == 1
+    assert [row[Variable("name")].value for row in result.bindings] == ["OSLO"]
+
+
+def test_redis_errors_fall_back_to_graphdb(cache: SparqlResultCache) -> None:
+    cache.redis_client = MagicMock()
+    cache.redis_client.get.side_effect = ConnectionError("Connection refused")
+    cache.redis_client.set.side_effect = ConnectionError("Connection refused")
+    evaluate = Evaluator()
+
+    result, _ = cache.get_or_eval("cim", "SELECT ?name { ?s ?p ?name }", True, evaluate)
+
+    assert evaluate.calls == 1
+    assert [row[Variable("name")].value for row in result.bindings] == ["OSLO"]
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        b"not json",
+        b'{"type": "SELECT"}',
+        b'{"type": "SELECT", "query": "", "data": "x"}',
+    ],
+)
+def test_corrupt_redis_entries_are_misses(cache: SparqlResultCache, value) -> None:
+    store = {}
+    cache.redis_client = MagicMock()
+    cache.redis_client.get.side_effect = lambda key: value
+    cache.redis_client.set.side_effect = lambda key, value, ex: store.update(
+        {key: value}
+    )
+    evaluate = Evaluator()
+
+    result, _ = cache.get_or_eval("cim", "SELECT ?name { ?s ?p ?name }", True, evaluate)
+
+    assert evaluate.calls == 1
+    assert [row[Variable("name")].value for row in result.bindings] == ["OSLO"]
+    # the corrupt entry is overwritten
+    assert json.loads(next(iter(store.values())))["type"] == "SELECT"
@@ -0,0 +1,73 @@
+from pathlib import Path
+
+from talk2powersystemllm.startup_cache import PhaseTimer, StartupCache
+
+
+class Counter:
+    def __init__(self):
+        self.calls = 0
+
+    def create(self) -> str:
+        self.calls += 1
+        return f"value {self.calls}"
+
+
+def test_get_or_create_stores_the_artifacts(tmp_path: Path) -> None:
+    counter = Counter()
+    startup_cache = StartupCache(tmp_path)
+
+    sources = ["a", b"b"]
+
+    assert startup_cache.get_or_create("schema", sources, counter.create) == "value 1"
+    assert startup_cache.get_or_create("schema", sources, counter.create) == "value 1"
+    assert counter.calls == 1
+    assert (startup_cache.hits, startup_cache.misses) == (1, 1)
+
+    # a new process with the same cache directory
+    new_startup_cache = StartupCache(tmp_path)
+    assert new_startup_cache.get_or_create("schema", sources, counter.create) == (
+        "value 1"
+    )
+    assert counter.calls == 1
+
+
+def test_get_or_create_changed_sources(tmp_path: Path) -> None:
+    counter = Counter()
+    startup_cache = StartupCache(tmp_path)
+
+    startup_cache.get_or_create("schema", ["a"], counter.create)
+    assert startup_cache.get_or_create("schema", ["b"], counter.create) == "value 2"
+    assert startup_cache.get_or_create("trouble", ["a"], counter.create) == "value 3"
+    assert len(list(tmp_path.iterdir())) == 3
+
+
+def test_get_or_create_without_cache_dir() -> None:
+    counter = Counter()
+    startup_cache = StartupCache()
+
+    startup_cache.get_or_create("schema", ["a"], counter.create)
+    startup_cache.get_or_create("schema", ["a"], counter.create)
+
+    assert counter.calls == 2
+
+
+def test_key_separates_the_sources() -> None:
+    assert StartupCache.key("schema", ["ab", "c"]) != StartupCache.key(
+        "schema", ["a", "bc"]
+    )
+    assert StartupCache.key("schema", ["a"]).startswith("schema-")
+
+
+def test_phase_timer_report() -> None:
+    timer = PhaseTimer("Startup")
+    with timer.phase("model"):
+        pass
+    with timer.phase("tools"):
+        pass
+
+    report = timer.report()
+
+    assert report.startswith("Startup took ")
+    assert "model=" in report
+    assert "tools=" in report
+    assert list(timer.phases) == ["model", "tools"]
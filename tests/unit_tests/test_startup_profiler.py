@@ -0,0 +1,50 @@
+import builtins
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+from talk2powersystemllm.app.server.startup_profiler import StartupProfiler
+
+
+@pytest.fixture
+def modules_path(tmp_path: Path):
+    (tmp_path / "profiled_outer.py").write_text(
+        "import time\nimport profiled_inner\ntime.sleep(0.02)\n"
+    )
+    (tmp_path / "profiled_inner.py").write_text("import time\ntime.sleep(0.05)\n")
+    sys.path.insert(0, str(tmp_path))
+    yield tmp_path
+    sys.path.remove(str(tmp_path))
+    sys.modules.pop("profiled_outer", None)
+    sys.modules.pop("profiled_inner", None)
+
+
+def test_startup_profiler_records_self_times(modules_path: Path) -> None:
+    original_import = builtins.__import__
+    startup_profiler = StartupProfiler()
+
+    startup_profiler.start()
+    import profiled_outer  # noqa: F401
+
+    startup_profiler.stop()
+
+    assert builtins.__import__ is original_import
+    assert 0.02 <= startup_profiler.import_times["profiled_outer"] < 0.05
+    assert startup_profiler.import_times["profiled_inner"] >= 0.05
+    assert startup_profiler.imports_duration >= 0.07
+
+
+def test_startup_profiler_finish(modules_path: Path) -> None:
+    startup_profiler = StartupProfiler()
+    startup_profiler.start()
+    import profiled_inner  # noqa: F401
+
+    startup_profiler.add_phases("Application startup", {"redis": 0.0125})
+    startup_profiler.finish(modules_path / "profile.json")
+
+    profile = json.loads((modules_path / "profile.json").read_text())
+    assert profile["import_self_times_ms"]["profiled_inner"] >= 50
+    assert profile["phases_ms"] == {"Application startup": {"redis": 12.5}}
+    assert "profiled_inner" in startup_profiler.report()
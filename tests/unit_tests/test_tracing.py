@@ -0,0 +1,112 @@
+import json
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from langchain_core.messages import AIMessage, ToolMessage
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+    InMemorySpanExporter,
+)
+from ttyg.graphdb import GraphDB
+
+from talk2powersystemllm.graphdb import TracingGraphDB
+from talk2powersystemllm.middleware import TracingMiddleware
+from talk2powersystemllm.tracing import (
+    configure_tracing,
+    disable_tracing,
+    is_tracing_enabled,
+    span,
+)
+
+
+@pytest.fixture
+def exporter():
+    exporter = InMemorySpanExporter()
+    configure_tracing(exporter)
+    yield exporter
+    disable_tracing()
+
+
+def test_span_is_noop_if_tracing_is_disabled() -> None:
+    assert not is_tracing_enabled()
+    with span("noop", {"key": "value"}) as current_span:
+        assert current_span is None
+
+
+def test_nested_spans(exporter: InMemorySpanExporter) -> None:
+    with span("parent", {"request.id": "1", "ignored": None}):
+        with span("child", {"args": {"query": "SELECT * {}"}}):
+            pass
+
+    child, parent = exporter.get_finished_spans()
+    assert child.parent.span_id == parent.context.span_id
+    assert dict(parent.attributes) == {"request.id": "1"}
+    assert dict(child.attributes) == {"args": '{"query": "SELECT * {}"}'}
+
+
+def test_sparql_query_span(exporter: InMemorySpanExporter) -> None:
+    def eval_sparql_query(_self, repository_id, query, validation=True):
+        return [{"s": 1}, {"s": 2}], query + " LIMIT 10"
+
+    with patch.object(GraphDB, "eval_sparql_query", eval_sparql_query):
+        graphdb = TracingGraphDB.__new__(TracingGraphDB)
+        graphdb.eval_sparql_query("cim", "SELECT * {}")
+
+    (sparql_span,) = exporter.get_finished_spans()
+    assert sparql_span.name == "graphdb.sparql"
+    assert sparql_span.attributes["db.namespace"] == "cim"
+    assert sparql_span.attributes["db.query.text"] == "SELECT * {} LIMIT 10"
+    assert sparql_span.attributes["db.response.returned_rows"] == 2
+
+
+def test_tracing_middleware(exporter: InMemorySpanExporter) -> None:
+    middleware = TracingMiddleware()
+    tool_call = {"id": "call-1", "name": "sparql_query", "args": {"query": "ASK {}"}}
+
+    middleware.wrap_model_call(
+        SimpleNamespace(model=SimpleNamespace(model_name="gpt-4.1"), messages=[]),
+        lambda request: SimpleNamespace(
+            result=[
+                AIMessage(
+                    content="",
+                    tool_calls=[tool_call],
+                    usage_metadata={
+                        "input_tokens": 100,
+                        "output_tokens": 20,
+                        "total_tokens": 120,
+                    },
+                )
+            ]
+        ),
+    )
+    middleware.wrap_tool_call(
+        SimpleNamespace(tool_call=tool_call),
+        lambda request: ToolMessage(content="true", tool_call_id="call-1"),
+    )
+
+    model_span, tool_span = exporter.get_finished_spans()
+    assert model_span.attributes["gen_ai.request.model"] == "gpt-4.1"
+    assert model_span.attributes["gen_ai.usage.input_tokens"] == 100
+    assert model_span.attributes["gen_ai.usage.output_tokens"] == 20
+    assert model_span.attributes["gen_ai.response.tool_calls"] == 1
+    assert tool_span.name == "agent.tool sparql_query"
+    assert tool_span.attributes["gen_ai.tool.call.arguments"] == '{"query": "ASK {}"}'
+    assert tool_span.attributes["gen_ai.tool.status"] == "success"
+
+
+def test_file_exporter(tmp_path: Path) -> None:
+    file_path = tmp_path / "spans.jsonl"
+    provider = configure_tracing("file", file_path)
+    try:
+        with span("first"):
+            pass
+        with span("second", {"rows": 3}):
+            pass
+        provider.shutdown()
+    finally:
+        disable_tracing()
+
+    spans = [json.loads(line) for line in file_path.read_text().splitlines()]
+    assert [s["name"] for s in spans] == ["first", "second"]
+    assert spans[1]["attributes"] == {"rows": 3}